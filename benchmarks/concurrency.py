@@ -0,0 +1,137 @@
+"""
+compara requests/s e latencia entre o modo sincrono e o async
+(DATABASE_ASYNC) com muitos clientes simultaneos
+
+sobe um uvicorn para cada modo apontando para DATABASE_URL (postgres),
+cria um usuario e alguns livros e dispara GET /books em paralelo
+
+uso: python -m benchmarks.concurrency --clients 100 250 500 1000
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from statistics import quantiles
+from time import perf_counter
+
+from httpx import AsyncClient, Limits
+
+HOST = '127.0.0.1'
+PASSWORD = 'benchmark'
+
+
+def start_server(port: int, async_mode: bool):
+    env = {**os.environ, 'DATABASE_ASYNC': str(async_mode).lower()}
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'uvicorn',
+            '--host',
+            HOST,
+            '--port',
+            str(port),
+            '--log-level',
+            'warning',
+            'estante_digital.app:app',
+        ],
+        env=env,
+    )
+    time.sleep(3)
+    return process
+
+
+async def seed(client: AsyncClient):
+    user = {
+        'username': 'bench',
+        'email': 'bench@bench.com',
+        'password': PASSWORD,
+    }
+    await client.post('/user/', json=user)
+    response = await client.post(
+        '/auth/token',
+        data={'username': user['email'], 'password': PASSWORD},
+    )
+    headers = {'Authorization': f'Bearer {response.json()["access_token"]}'}
+
+    response = await client.post(
+        '/authors/', json={'name': 'bench author'}, headers=headers
+    )
+    author = response.json()
+    for i in range(50):
+        await client.post(
+            '/books/',
+            json={
+                'title': f'bench book {i}',
+                'year': 2000,
+                'author_id': author.get('id', 1),
+            },
+            headers=headers,
+        )
+
+    return headers
+
+
+async def run(port: int, clients: int, duration: float):
+    base_url = f'http://{HOST}:{port}'
+    limits = Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        headers = await seed(client)
+        latencies = []
+        errors = 0
+        deadline = perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while perf_counter() < deadline:
+                start = perf_counter()
+                response = await client.get(
+                    '/books/?limit=20', headers=headers
+                )
+                latencies.append(perf_counter() - start)
+                if response.is_error:
+                    errors += 1
+
+        await asyncio.gather(*[worker() for _ in range(clients)])
+
+    p50, p95, p99 = (
+        quantiles(latencies, n=100)[i] * 1000 for i in (49, 94, 98)
+    )
+    return len(latencies) / duration, p50, p95, p99, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--clients', type=int, nargs='+', default=[100, 250, 500, 1000]
+    )
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    print('mode   clients   req/s    p50ms    p95ms    p99ms  errors')
+    for async_mode in (False, True):
+        server = start_server(args.port, async_mode)
+        try:
+            for clients in args.clients:
+                rps, p50, p95, p99, errors = asyncio.run(
+                    run(args.port, clients, args.duration)
+                )
+                mode = 'async' if async_mode else 'sync'
+                print(
+                    f'{mode:<6} {clients:>7} {rps:>7.0f} {p50:>8.1f} '
+                    f'{p95:>8.1f} {p99:>8.1f} {errors:>7}'
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
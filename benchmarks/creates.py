@@ -0,0 +1,125 @@
+"""
+latencia das rotas de criacao (POST /user, /authors e /books)
+
+roda o app em processo (httpx ASGITransport) sobre um SQLite em arquivo,
+ou sobre DATABASE_URL com --database-url; as requisicoes sao sequenciais
+para medir o custo de cada uma, sem disputa por conexoes
+(o POST /user inclui o hash bcrypt da senha, que domina o tempo)
+
+uso: python -m benchmarks.creates --requests 500
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+from http import HTTPStatus
+from statistics import quantiles
+from time import perf_counter
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from estante_digital.app import app
+from estante_digital.database import SyncSession, get_session
+from estante_digital.models import table_registry
+from estante_digital.replicas import get_read_session
+
+PASSWORD = 'benchmark'
+
+
+def percentiles(samples: list):
+    cuts = quantiles(samples, n=100)
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+async def timed(requests: int, call):
+    samples = []
+    for index in range(requests):
+        start = perf_counter()
+        response = await call(index)
+        samples.append((perf_counter() - start) * 1000)
+        assert response.status_code == HTTPStatus.CREATED, response.text
+
+    return percentiles(samples)
+
+
+async def run(engine, requests: int):
+    async def get_session_override():
+        async with SyncSession(Session(engine)) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url='http://t') as c:
+        user = {'username': 'bench', 'email': 'b@b.com', 'password': PASSWORD}
+        await c.post('/user/', json=user)
+        token = (
+            await c.post(
+                '/auth/token',
+                data={'username': 'b@b.com', 'password': PASSWORD},
+            )
+        ).json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        results = {
+            'POST /user': await timed(
+                requests,
+                lambda i: c.post(
+                    '/user/',
+                    json={
+                        'username': f'user{i}',
+                        'email': f'user{i}@b.com',
+                        'password': PASSWORD,
+                    },
+                ),
+            ),
+            'POST /authors': await timed(
+                requests,
+                lambda i: c.post(
+                    '/authors/', json={'name': f'author {i}'}, headers=headers
+                ),
+            ),
+            'POST /books': await timed(
+                requests,
+                lambda i: c.post(
+                    '/books/',
+                    json={'title': f'book {i}', 'year': 2000, 'author_id': 1},
+                    headers=headers,
+                ),
+            ),
+        }
+
+    app.dependency_overrides.clear()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f'sqlite:///{os.path.join(tmp, "b.db")}'
+        engine = create_engine(url)
+        table_registry.metadata.drop_all(engine)
+        table_registry.metadata.create_all(engine)
+
+        results = asyncio.run(run(engine, args.requests))
+        engine.dispose()
+
+    print(f'requests: {args.requests}')
+    print('route            p50 ms   p95 ms   p99 ms')
+    for route, cuts in results.items():
+        print(
+            f'{route:<15}'
+            f'{cuts["p50"]:>8.2f} {cuts["p95"]:>8.2f} {cuts["p99"]:>8.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+gera um conjunto de dados sintetico do tamanho da producao
+
+usuarios, autores, livros e colecoes com distribuicao de cauda longa:
+o tamanho das colecoes segue uma lei de potencia (poucos usuarios com
+colecoes enormes, a maioria com poucos livros) e a escolha dos livros
+tambem, para alguns titulos serem muito mais colecionados que o resto
+
+os registros sao gravados em lotes (INSERT de varias linhas), com ids
+explicitos; o banco e recriado com --reset. todos os usuarios tem a
+senha PASSWORD, com um unico hash bcrypt calculado uma vez. os
+contadores sao mantidos pelos triggers e os rankings recalculados no fim
+
+uso:
+python -m benchmarks.dataset --database-url sqlite:///bench.db --reset
+python -m benchmarks.dataset --books 1000000 --authors 100000 \\
+    --users 500000 --reset  (DATABASE_URL do .env)
+"""
+
+import argparse
+import json
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+from time import perf_counter
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+from estante_digital.database import enable_foreign_keys, settings
+from estante_digital.models import (
+    Author,
+    Book,
+    User,
+    table_registry,
+    user_collection_table,
+)
+from estante_digital.rankings import refresh_rankings, utcnow
+from estante_digital.security import get_password_hash
+
+PASSWORD = 'benchmark'
+
+# vocabulario dos titulos e nomes, usado tambem nas buscas do benchmark
+WORDS = [
+    'amor', 'casa', 'noite', 'mar', 'tempo', 'cidade', 'sombra', 'vento',
+    'rio', 'guerra', 'jardim', 'segredo', 'viagem', 'memoria', 'silencio',
+    'estrela', 'caminho', 'fogo', 'terra', 'sonho', 'lua', 'sol', 'ilha',
+    'montanha', 'livro', 'carta', 'janela', 'porto', 'floresta', 'deserto',
+]  # fmt: skip
+FIRST_NAMES = [
+    'Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fabio', 'Gabriela',
+    'Heitor', 'Iara', 'Joao', 'Lara', 'Marcos', 'Nina', 'Otavio', 'Paula',
+    'Rafael', 'Sofia', 'Tiago', 'Vera', 'Yuri',
+]  # fmt: skip
+LAST_NAMES = [
+    'Almeida', 'Barros', 'Costa', 'Dias', 'Esteves', 'Ferreira', 'Gomes',
+    'Lima', 'Moura', 'Nunes', 'Oliveira', 'Pereira', 'Queiroz', 'Rocha',
+    'Santos', 'Teixeira', 'Vieira',
+]  # fmt: skip
+
+
+def batched(rows, size: int):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def user_rows(count: int, password: str):
+    for index in range(1, count + 1):
+        yield {
+            'id': index,
+            'username': f'user{index}',
+            'email': f'user{index}@example.com',
+            'password': password,
+        }
+
+
+def author_rows(count: int, rng: random.Random, users: int):
+    for index in range(1, count + 1):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}'
+        yield {
+            'id': index,
+            'name': name,
+            'created_by_id': rng.randint(1, users),
+        }
+
+
+def book_rows(count: int, rng: random.Random, authors: int, users: int):
+    for index in range(1, count + 1):
+        words = ' '.join(rng.sample(WORDS, rng.randint(1, 3)))
+        yield {
+            'id': index,
+            'title': f'{words.capitalize()} {index}',
+            'year': rng.randint(1900, 2024),
+            # autores com ids menores tem mais livros
+            'author_id': int(authors * rng.random() ** 2) + 1,
+            'created_by_id': rng.randint(1, users),
+        }
+
+
+def collection_rows(  # noqa: PLR0913, PLR0917
+    users: int,
+    books: int,
+    rng: random.Random,
+    alpha: float,
+    max_size: int,
+    days: int,
+):
+    """
+    tamanho de cada colecao ~ pareto(alpha) - 1, limitado a max_size;
+    o livro escolhido segue zipf (peso 1/posicao) sobre os ids
+    """
+    cum_weights = list(accumulate(1 / rank for rank in range(1, books + 1)))
+    book_ids = range(1, books + 1)
+    now = utcnow()
+
+    for user_id in range(1, users + 1):
+        size = min(int(rng.paretovariate(alpha)) - 1, max_size, books)
+        chosen = set()
+        while len(chosen) < size:
+            chosen.update(
+                rng.choices(book_ids, cum_weights=cum_weights, k=size)
+            )
+        for book_id in islice(chosen, size):
+            age = timedelta(seconds=rng.uniform(0, days * 86400))
+            yield {
+                'user_id': user_id,
+                'book_id': book_id,
+                'added_at': now - age,
+            }
+
+
+def load(session: Session, table, rows, batch_size: int, label: str):
+    start = perf_counter()
+    total = 0
+    for batch in batched(rows, batch_size):
+        session.execute(insert(table), batch)
+        session.commit()
+        total += len(batch)
+        print(f'\r{label}: {total}', end='', flush=True)
+
+    print(f' ({perf_counter() - start:.1f}s)')
+    return total
+
+
+def reset_sequences(session: Session):
+    """os ids foram explicitos; o postgres precisa avancar as sequencias"""
+    if session.bind.dialect.name != 'postgresql':
+        return
+
+    for table in ('users', 'authors', 'books'):
+        session.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f'COALESCE(MAX(id), 0) + 1, false) FROM {table}'
+            )
+        )
+    session.commit()
+
+
+def generate(session: Session, args):
+    rng = random.Random(args.seed)
+    password = get_password_hash(PASSWORD)
+
+    summary = {
+        'users': load(
+            session,
+            User.__table__,
+            user_rows(args.users, password),
+            args.batch_size,
+            'users',
+        ),
+        'authors': load(
+            session,
+            Author.__table__,
+            author_rows(args.authors, rng, args.users),
+            args.batch_size,
+            'authors',
+        ),
+        'books': load(
+            session,
+            Book.__table__,
+            book_rows(args.books, rng, args.authors, args.users),
+            args.batch_size,
+            'books',
+        ),
+        'collection': load(
+            session,
+            user_collection_table,
+            collection_rows(
+                args.users,
+                args.books,
+                rng,
+                args.alpha,
+                args.max_collection,
+                args.days,
+            ),
+            args.batch_size,
+            'collection',
+        ),
+    }
+    reset_sequences(session)
+    summary['rankings'] = refresh_rankings(session)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', default=settings.DATABASE_URL)
+    parser.add_argument('--users', type=int, default=500_000)
+    parser.add_argument('--authors', type=int, default=100_000)
+    parser.add_argument('--books', type=int, default=1_000_000)
+    parser.add_argument(
+        '--alpha',
+        type=float,
+        default=1.2,
+        help='expoente da lei de potencia do tamanho das colecoes',
+    )
+    parser.add_argument('--max-collection', type=int, default=20_000)
+    parser.add_argument(
+        '--days', type=int, default=90, help='janela das datas de adicao'
+    )
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument(
+        '--reset', action='store_true', help='apaga e recria as tabelas'
+    )
+    args = parser.parse_args()
+
+    # o generate grava com uma Session sincrona (sqlite ou psycopg)
+    engine = enable_foreign_keys(create_engine(args.database_url))
+    if args.reset:
+        table_registry.metadata.drop_all(engine)
+    table_registry.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        summary = generate(session, args)
+
+    engine.dispose()
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
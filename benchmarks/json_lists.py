@@ -0,0 +1,103 @@
+"""
+CPU do app por requisicao nas listas: JSON do python x JSON do postgres
+
+roda o app em processo (httpx ASGITransport) sobre DATABASE_URL, que
+deve ser um postgres populado por benchmarks.dataset, e pede paginas de
+GET /books e GET /authors com DATABASE_JSON_LISTS desligado e ligado.
+o cache de respostas fica desligado para toda requisicao chegar ao banco
+
+mede o tempo de CPU do processo (time.process_time): o trabalho do
+postgres fica em outro processo e nao entra na conta. imprime CPU e
+tempo de relogio medios por requisicao de cada modo
+
+uso: python -m benchmarks.json_lists --requests 200 --limit 200
+"""
+
+import argparse
+import asyncio
+from http import HTTPStatus
+from time import perf_counter, process_time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from estante_digital.app import app
+from estante_digital.database import settings
+from estante_digital.models import User
+from estante_digital.response_cache import response_cache
+from estante_digital.security import create_access_token, user_claims
+
+ROUTES = ['/books/', '/authors/']
+MODES = {'python': False, 'postgres': True}
+
+
+def bench_token():
+    engine = create_engine(settings.DATABASE_URL)
+    with Session(engine) as session:
+        user = session.scalar(select(User).order_by(User.id).limit(1))
+        if user is None:
+            raise SystemExit(
+                'banco vazio: rode antes python -m benchmarks.dataset'
+            )
+        token = create_access_token(user_claims(user))
+
+    engine.dispose()
+    return token
+
+
+async def measure(client: AsyncClient, route: str, requests: int, params):
+    # as paginas seguem o cursor, como um cliente percorrendo a lista
+    cursor = None
+    cpu = process_time()
+    wall = perf_counter()
+    for _ in range(requests):
+        response = await client.get(
+            route, params={**params, **({'cursor': cursor} if cursor else {})}
+        )
+        assert response.status_code == HTTPStatus.OK, response.text
+        cursor = response.json()['next_cursor']
+
+    return (
+        (process_time() - cpu) / requests * 1000,
+        (perf_counter() - wall) / requests * 1000,
+    )
+
+
+async def run(requests: int, limit: int):
+    headers = {'Authorization': f'Bearer {bench_token()}'}
+    transport = ASGITransport(app=app)
+    results = {}
+
+    async with AsyncClient(
+        transport=transport, base_url='http://bench', headers=headers
+    ) as client:
+        for route in ROUTES:
+            for mode, enabled in MODES.items():
+                settings.DATABASE_JSON_LISTS = enabled
+                results[route, mode] = await measure(
+                    client, route, requests, {'limit': limit}
+                )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=200)
+    args = parser.parse_args()
+
+    if not settings.DATABASE_URL.startswith('postgresql'):
+        raise SystemExit('DATABASE_URL precisa ser um postgres')
+
+    response_cache.backend = None
+    results = asyncio.run(run(args.requests, args.limit))
+
+    print('route       mode        cpu ms/req   wall ms/req')
+    for (route, mode), (cpu, wall) in results.items():
+        print(f'{route:<12}{mode:<12}{cpu:>10.2f}{wall:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+benchmark de throughput do login em funcao do numero de processos
+do pool de hash
+
+uso: python -m benchmarks.login --requests 200 --workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+from http import HTTPStatus
+from time import perf_counter
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from estante_digital import security
+from estante_digital.app import app
+from estante_digital.database import get_session, session_for
+from estante_digital.models import User, table_registry
+
+PASSWORD = 'benchmark'
+
+
+def setup_database(path: str):
+    engine = create_engine(
+        f'sqlite:///{path}', connect_args={'check_same_thread': False}
+    )
+    table_registry.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add(
+            User(
+                username='bench',
+                email='bench@bench.com',
+                password=security.get_password_hash(PASSWORD),
+            )
+        )
+        session.commit()
+
+    return engine
+
+
+async def run(engine, workers: int, requests: int):
+    pool = security.HashPool(
+        workers=workers, max_pending=requests, retry_after=1
+    )
+    security.hash_pool = pool
+
+    # as rotas sao async: a sessao precisa da mesma interface do app
+    async def get_session_override():
+        async with session_for(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url='http://t') as c:
+        # aquece o pool (sobe os processos) antes de medir
+        await asyncio.gather(*[
+            security.get_password_hash_async(PASSWORD) for _ in range(workers)
+        ])
+
+        start = perf_counter()
+        responses = await asyncio.gather(*[
+            c.post(
+                '/auth/token',
+                data={'username': 'bench', 'password': PASSWORD},
+            )
+            for _ in range(requests)
+        ])
+        elapsed = perf_counter() - start
+
+    pool.shutdown()
+    app.dependency_overrides.clear()
+
+    assert all(r.status_code == HTTPStatus.OK for r in responses)
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        nargs='+',
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = setup_database(os.path.join(tmp, 'bench.db'))
+
+        print(f'cpus: {os.cpu_count()}  requests: {args.requests}')
+        print('workers  logins/s')
+        for workers in args.workers:
+            rate = asyncio.run(run(engine, workers, args.requests))
+            print(f'{workers:>7}  {rate:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+custo de montar uma pagina de livros: objetos do ORM x linhas do Core
+
+popula um SQLite em memoria com --books livros e le uma pagina de
+--page linhas dos dois jeitos, serializando com o schema BookList:
+- orm: select(Book) com joinedload(Book.author), como as rotas faziam
+- rows: estante_digital.reads.select_books (so as colunas do schema)
+
+imprime o tempo por linha (consulta + serializacao, melhor de --repeat)
+e o pico de memoria alocada por pagina (tracemalloc)
+
+uso: python -m benchmarks.reads --books 5000 --page 1000
+"""
+
+import argparse
+import tracemalloc
+from timeit import Timer
+
+from sqlalchemy import StaticPool, create_engine, insert, select
+from sqlalchemy.orm import Session, joinedload
+
+from estante_digital.models import Author, Book, User, table_registry
+from estante_digital.reads import select_books
+from estante_digital.schemas import BookList
+from estante_digital.serialization import dump_json
+
+
+def populate(session: Session, books: int):
+    session.execute(
+        insert(User),
+        [{'username': 'bench', 'email': 'bench@example.com', 'password': 'x'}],
+    )
+    session.execute(
+        insert(Author),
+        [
+            {'name': f'Autor {index}', 'created_by_id': 1}
+            for index in range(100)
+        ],
+    )
+    session.execute(
+        insert(Book),
+        [
+            {
+                'title': f'Livro {index}',
+                'year': 1900 + index % 125,
+                'author_id': index % 100 + 1,
+                'created_by_id': 1,
+            }
+            for index in range(books)
+        ],
+    )
+    session.commit()
+
+
+def orm_page(session: Session, size: int):
+    books = session.scalars(
+        select(Book)
+        .options(joinedload(Book.author))
+        .order_by(Book.id)
+        .limit(size)
+    ).all()
+    body = dump_json(BookList, {'books': books, 'next_cursor': None})
+    # a rota terminava a requisicao com a sessao fechada
+    session.expunge_all()
+    return body
+
+
+def rows_page(session: Session, size: int):
+    books = session.execute(select_books().order_by(Book.id).limit(size)).all()
+    return dump_json(BookList, {'books': books, 'next_cursor': None})
+
+
+PATHS = {'orm': orm_page, 'rows': rows_page}
+
+
+def peak_memory(call, session: Session, size: int):
+    tracemalloc.start()
+    call(session, size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--page', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    table_registry.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        populate(session, args.books)
+        # as duas formas precisam produzir o mesmo JSON
+        assert orm_page(session, args.page) == rows_page(session, args.page)
+
+        print('path      us/row   peak KiB/page')
+        for name, call in PATHS.items():
+            timer = Timer(lambda call=call: call(session, args.page))
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat=args.repeat, number=number))
+            per_row = best / number / args.page * 1_000_000
+            peak = peak_memory(call, session, args.page) / 1024
+            print(f'{name:<8}{per_row:>8.2f}{peak:>16.0f}')
+
+
+if __name__ == '__main__':
+    main()
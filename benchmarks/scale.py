@@ -0,0 +1,301 @@
+"""
+benchmark das rotas de leitura sobre um conjunto de dados grande
+
+roda o app (estante_digital.app:app) em processo, via httpx
+ASGITransport, sobre o banco de DATABASE_URL, que deve ter sido
+populado por benchmarks.dataset. cada cenario dispara requisicoes
+com --concurrency clientes simultaneos durante --duration segundos:
+
+- list: GET /books, seguindo o cursor por LIST_PAGES paginas (a
+  latencia e a da sequencia inteira)
+- search: GET /books?q=<palavra do vocabulario>
+- detail: GET /books/{id} de um livro aleatorio
+- collection: GET /collection dos usuarios com as maiores colecoes
+- login: POST /auth/token (inclui o bcrypt)
+
+grava p50/p95/p99 (ms), throughput (req/s) e erros de cada cenario em
+JSON, junto com o commit atual, para comparar execucoes
+
+o cache de respostas (estante_digital.response_cache) fica desligado:
+list e detail repetem as mesmas urls e, com ele, mediriam o cache e nao
+as consultas. --response-cache liga o backend de RESPONSE_CACHE_BACKEND;
+o relatorio guarda qual foi usado
+
+uso:
+python -m benchmarks.scale --output bench.json
+python -m benchmarks.scale --compare antes.json depois.json
+(SQLite: DATABASE_ASYNC=false)
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+from datetime import UTC, datetime
+from http import HTTPStatus
+from statistics import quantiles
+from time import perf_counter
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from benchmarks.dataset import PASSWORD, WORDS
+from estante_digital.app import app
+from estante_digital.database import settings
+from estante_digital.models import Book, User, user_collection_table
+from estante_digital.response_cache import response_cache
+from estante_digital.security import create_access_token, user_claims
+
+SCENARIOS = ['list', 'search', 'detail', 'collection', 'login']
+LIST_PAGES = 5
+HEAVY_USERS = 100
+
+
+def percentiles(samples: list):
+    if len(samples) < 2:  # noqa: PLR2004
+        value = samples[0] if samples else 0.0
+        return {'p50': value, 'p95': value, 'p99': value}
+
+    cuts = quantiles(samples, n=100)
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+def current_commit():
+    result = subprocess.run(
+        ['git', 'rev-parse', '--short', 'HEAD'],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() or None
+
+
+def dataset_info():
+    """ids e usuarios usados pelos cenarios, lidos uma vez do banco"""
+    engine = create_engine(settings.DATABASE_URL)
+    collection = user_collection_table.c
+
+    with Session(engine) as session:
+        max_book_id = session.scalar(select(func.max(Book.id))) or 0
+        heavy_ids = session.scalars(
+            select(collection.user_id)
+            .group_by(collection.user_id)
+            .order_by(func.count().desc())
+            .limit(HEAVY_USERS)
+        ).all()
+        heavy_users = session.scalars(
+            select(User).where(User.id.in_(heavy_ids))
+        ).all()
+        login_user = session.scalar(select(User).order_by(User.id).limit(1))
+        info = {
+            'books': session.scalar(select(func.count(Book.id))),
+            'users': session.scalar(select(func.count(User.id))),
+            'collection': session.scalar(
+                select(func.count()).select_from(user_collection_table)
+            ),
+            'max_book_id': max_book_id,
+            'login': login_user.email if login_user else None,
+            # tokens sem passar pelo login, que tem o seu proprio cenario
+            'tokens': [
+                create_access_token(user_claims(user)) for user in heavy_users
+            ],
+        }
+
+    engine.dispose()
+    return info
+
+
+def scenario_calls(client: AsyncClient, info: dict, rng: random.Random):
+    """cenario -> funcao async que faz uma iteracao e retorna as respostas"""
+    if not info['tokens'] or not info['login']:
+        raise SystemExit(
+            'banco vazio: rode antes python -m benchmarks.dataset'
+        )
+
+    def headers():
+        return {'Authorization': f'Bearer {rng.choice(info["tokens"])}'}
+
+    async def list_books():
+        auth = headers()
+        responses = [await client.get('/books/', headers=auth)]
+        for _ in range(LIST_PAGES - 1):
+            cursor = responses[-1].json().get('next_cursor')
+            if not cursor:
+                break
+            responses.append(
+                await client.get(
+                    '/books/', params={'cursor': cursor}, headers=auth
+                )
+            )
+        return responses
+
+    async def search_books():
+        words = ' '.join(rng.sample(WORDS, rng.randint(1, 2)))
+        return [
+            await client.get('/books/', params={'q': words}, headers=headers())
+        ]
+
+    async def book_detail():
+        book_id = rng.randint(1, info['max_book_id'])
+        return [await client.get(f'/books/{book_id}', headers=headers())]
+
+    async def collection():
+        return [await client.get('/collection/', headers=headers())]
+
+    async def login():
+        return [
+            await client.post(
+                '/auth/token',
+                data={'username': info['login'], 'password': PASSWORD},
+            )
+        ]
+
+    return {
+        'list': list_books,
+        'search': search_books,
+        'detail': book_detail,
+        'collection': collection,
+        'login': login,
+    }
+
+
+async def run_scenario(call, concurrency: int, duration: float):
+    samples = []
+    requests = 0
+    errors = 0
+    deadline = perf_counter() + duration
+
+    async def worker():
+        nonlocal requests, errors
+        while perf_counter() < deadline:
+            start = perf_counter()
+            responses = await call()
+            samples.append((perf_counter() - start) * 1000)
+            requests += len(responses)
+            errors += sum(
+                response.status_code != HTTPStatus.OK for response in responses
+            )
+
+    started = perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = perf_counter() - started
+
+    return {
+        'iterations': len(samples),
+        'requests': requests,
+        'errors': errors,
+        'throughput': requests / elapsed,
+        **percentiles(samples),
+    }
+
+
+async def run(scenarios: list, concurrency: int, duration: float, seed: int):
+    info = dataset_info()
+    rng = random.Random(seed)
+    transport = ASGITransport(app=app)
+    results = {}
+
+    async with AsyncClient(
+        transport=transport, base_url='http://bench', timeout=None
+    ) as client:
+        calls = scenario_calls(client, info, rng)
+        for name in scenarios:
+            results[name] = await run_scenario(
+                calls[name], concurrency, duration
+            )
+            print(format_row(name, results[name]))
+
+    dataset = {key: info[key] for key in ('books', 'users', 'collection')}
+    return dataset, results
+
+
+def format_row(name: str, result: dict):
+    return (
+        f'{name:<11}{result["throughput"]:>9.1f}'
+        f'{result["p50"]:>9.2f}{result["p95"]:>9.2f}{result["p99"]:>9.2f}'
+        f'{result["errors"]:>8}'
+    )
+
+
+def compare(before_path: str, after_path: str):
+    """variacao percentual de cada metrica entre duas execucoes"""
+    with open(before_path, encoding='utf-8') as file:
+        before = json.load(file)
+    with open(after_path, encoding='utf-8') as file:
+        after = json.load(file)
+
+    print(f'{before["commit"]} -> {after["commit"]}')
+    caches = (before.get('response_cache'), after.get('response_cache'))
+    if caches[0] != caches[1]:
+        print(
+            f'aviso: cache de respostas diferente ({caches[0]} -> {caches[1]})'
+        )
+    print('scenario       req/s      p50      p95      p99')
+    for name, result in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if old is None:
+            continue
+        deltas = [
+            (result[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            for key in ('throughput', 'p50', 'p95', 'p99')
+        ]
+        print(f'{name:<11}' + ''.join(f'{delta:>+8.1f}%' for delta in deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS
+    )
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='arquivo JSON com os resultados')
+    parser.add_argument(
+        '--response-cache',
+        action='store_true',
+        help='usa o cache de respostas (RESPONSE_CACHE_BACKEND)',
+    )
+    parser.add_argument(
+        '--compare',
+        nargs=2,
+        metavar=('BEFORE', 'AFTER'),
+        help='compara dois arquivos gerados com --output',
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    cache = 'none'
+    if args.response_cache:
+        cache = settings.RESPONSE_CACHE_BACKEND
+    else:
+        response_cache.backend = None
+
+    print('scenario     req/s   p50 ms   p95 ms   p99 ms  errors')
+    dataset, results = asyncio.run(
+        run(args.scenarios, args.concurrency, args.duration, args.seed)
+    )
+
+    report = {
+        'commit': current_commit(),
+        'created_at': datetime.now(UTC).isoformat(),
+        'database': settings.DATABASE_URL.split(':', 1)[0],
+        'async': settings.DATABASE_ASYNC,
+        'response_cache': cache,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'dataset': dataset,
+        'scenarios': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
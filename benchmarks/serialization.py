@@ -0,0 +1,98 @@
+"""
+custo por item da serializacao de uma pagina de livros (GET /books)
+
+compara, sobre objetos Book/Author em memoria (sem banco):
+- response_model: o que o FastAPI faz com o retorno da rota (valida
+  com from_attributes, model_dump em modo json e json.dumps)
+- schema: estante_digital.serialization com FAST_JSON desligado
+  (valida e model_dump_json)
+- fast: FAST_JSON ligado (dicts simples e pydantic_core.to_json)
+
+imprime microssegundos por item de cada caminho para cada tamanho de
+pagina
+
+uso: python -m benchmarks.serialization --sizes 50 200 1000
+"""
+
+import argparse
+import json
+from timeit import Timer
+
+from estante_digital.database import settings
+from estante_digital.models import Author, Book
+from estante_digital.schemas import BookList
+from estante_digital.serialization import dump_json
+
+
+def make_page(size: int):
+    authors = []
+    for index in range(1, 21):
+        author = Author(name=f'Autor {index}')
+        author.id = index
+        authors.append(author)
+
+    books = []
+    for index in range(1, size + 1):
+        book = Book(title=f'Livro número {index}', year=1900 + index % 125)
+        book.id = index
+        book.collector_count = index * 7 % 1000
+        book.author = authors[index % len(authors)]
+        books.append(book)
+
+    return {'books': books, 'next_cursor': 'eyJpZCI6IDEwMDB9'}
+
+
+def response_model(content):
+    validated = BookList.model_validate(content, from_attributes=True)
+    return json.dumps(
+        validated.model_dump(mode='json'),
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def schema(content):
+    settings.FAST_JSON = False
+    return dump_json(BookList, content)
+
+
+def fast(content):
+    settings.FAST_JSON = True
+    return dump_json(BookList, content)
+
+
+PATHS = {'response_model': response_model, 'schema': schema, 'fast': fast}
+
+
+def per_item(call, content, size: int, repeat: int):
+    timer = Timer(lambda: call(content))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return best / size * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    fast_json = settings.FAST_JSON
+    print('items  ' + ''.join(f'{name:>16}' for name in PATHS) + '  (us/item)')
+    for size in args.sizes:
+        content = make_page(size)
+        # os tres caminhos produzem o mesmo JSON
+        outputs = {call(content) for call in PATHS.values()}
+        assert len(outputs) == 1, 'serializacoes diferentes'
+
+        row = [
+            per_item(call, content, size, args.repeat)
+            for call in PATHS.values()
+        ]
+        print(f'{size:<7}' + ''.join(f'{cost:>16.2f}' for cost in row))
+
+    settings.FAST_JSON = fast_json
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,18 @@
 from fastapi import FastAPI
 
-from estante_digital.routers import auth, authors, books, collection, users
+from estante_digital.compression import CompressionMiddleware
+from estante_digital.routers import (
+    auth,
+    authors,
+    books,
+    collection,
+    internal,
+    rankings,
+    users,
+)
 
 app = FastAPI()
+app.add_middleware(CompressionMiddleware)
 app.include_router(users.router, prefix='/user', tags=['users'])
 app.include_router(auth.router, prefix='/auth', tags=['auth'])
 app.include_router(authors.router, prefix='/authors', tags=['authors'])
@@ -10,6 +20,13 @@ app.include_router(books.router, prefix='/books', tags=['books'])
 app.include_router(
     collection.router, prefix='/collection', tags=['collection']
 )
+app.include_router(rankings.router, prefix='/rankings', tags=['rankings'])
+app.include_router(
+    internal.router,
+    prefix='/internal',
+    tags=['internal'],
+    include_in_schema=False,
+)
 
 
 @app.get('/')
@@ -0,0 +1,154 @@
+"""
+compressao das respostas, negociada pelo Accept-Encoding
+
+gzip sempre; brotli (br) e zstd quando os modulos brotli e zstandard
+estao instalados, e nesse caso tem preferencia. so corpos JSON ou de
+texto com pelo menos COMPRESSION_MINIMUM_SIZE bytes sao comprimidos,
+com o nivel COMPRESSION_LEVEL (o mesmo numero para os tres algoritmos)
+
+o CompressionMiddleware (app.py) comprime as respostas na saida; o
+cache de respostas (estante_digital.response_cache) guarda tambem o
+corpo ja comprimido, e o middleware deixa passar o que ja vem com
+Content-Encoding
+
+corpos a partir de COMPRESSION_THREADPOOL_MIN_SIZE bytes sao comprimidos
+no threadpool (compress_async), para nao parar o event loop
+"""
+
+import gzip
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from estante_digital.database import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def _gzip(body: bytes, level: int):
+    # mtime fixo: o mesmo corpo sempre gera os mesmos bytes
+    return gzip.compress(body, compresslevel=min(level, 9), mtime=0)
+
+
+def _brotli(body: bytes, level: int):
+    return brotli.compress(body, quality=min(level, 11))
+
+
+def _zstd(body: bytes, level: int):
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+# em ordem de preferencia do servidor
+ENCODINGS = {}
+if brotli is not None:
+    ENCODINGS['br'] = _brotli
+if zstandard is not None:
+    ENCODINGS['zstd'] = _zstd
+ENCODINGS['gzip'] = _gzip
+
+
+def negotiate(accept_encoding: str | None):
+    """encoding escolhido para o Accept-Encoding, ou None (identity)"""
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    candidates = [
+        name for name in ENCODINGS if accepted.get(name, wildcard) > 0
+    ]
+    if not candidates:
+        return None
+
+    # maior q; no empate, a preferencia do servidor
+    return max(candidates, key=lambda name: accepted.get(name, wildcard))
+
+
+def compressible(headers: Headers, size: int):
+    content_type = headers.get('content-type', '')
+    return (
+        'content-encoding' not in headers
+        and size >= settings.COMPRESSION_MINIMUM_SIZE
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def compress(body: bytes, encoding: str):
+    return ENCODINGS[encoding](body, settings.COMPRESSION_LEVEL)
+
+
+async def compress_async(body: bytes, encoding: str):
+    """compress, no threadpool quando o corpo e grande"""
+    if len(body) >= settings.COMPRESSION_THREADPOOL_MIN_SIZE:
+        return await run_in_threadpool(compress, body, encoding)
+    return compress(body, encoding)
+
+
+class CompressionMiddleware:
+    """
+    middleware ASGI: comprime a resposta inteira (um unico body);
+    respostas em varias partes (streaming) passam sem compressao
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+
+            if start is None:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            headers = MutableHeaders(raw=start['headers'])
+            if not message.get('more_body') and compressible(
+                headers, len(body)
+            ):
+                body = await compress_async(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+                headers.add_vary_header('Accept-Encoding')
+                message = {**message, 'body': body}
+
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
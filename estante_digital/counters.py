@@ -0,0 +1,287 @@
+"""
+contadores denormalizados (authors.book_count, books.collector_count)
+e versoes das representacoes (authors.version, books.version,
+users.collection_version), usadas nos ETags
+
+cada contador e mantido por triggers no banco, entao vale para qualquer
+caminho de escrita (rotas, importacao, cascatas); reconcile_counters
+recalcula os valores a partir das linhas, para corrigir desvios. as
+versoes so aumentam e guardam o momento da ultima mudanca: a de um livro
+ou autor muda com tudo o que a representacao dele mostra, inclusive os
+campos de outra tabela (o nome do autor no livro, os livros no autor)
+
+uso: python -m estante_digital.counters
+"""
+
+import json
+
+from sqlalchemy import (
+    DDL,
+    column,
+    create_engine,
+    event,
+    func,
+    select,
+    table,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from estante_digital.database import settings
+
+# tabela contada, fk para o dono do contador, tabela e coluna do contador
+COUNTERS = [
+    ('books', 'author_id', 'authors', 'book_count'),
+    ('user_collection_table', 'book_id', 'books', 'collector_count'),
+]
+
+# tabela alterada, fk para o dono, tabela, coluna da versao e da data
+VERSIONS = [
+    ('books', 'author_id', 'authors', 'version', 'updated_at'),
+    ('user_collection_table', 'book_id', 'books', 'version', 'updated_at'),
+    (
+        'user_collection_table',
+        'user_id',
+        'users',
+        'collection_version',
+        'collection_updated_at',
+    ),
+]
+
+# versoes que mudam com o UPDATE de uma linha: tabela alterada, colunas
+# que aparecem nas representacoes, tabela da versao (version, updated_at)
+# e as colunas que ligam as duas (na tabela da versao e na alterada)
+ROW_VERSIONS = [
+    ('books', ('title', 'year', 'author_id'), 'books', 'id', 'id'),
+    ('books', ('title', 'year'), 'authors', 'id', 'author_id'),
+    ('authors', ('name',), 'authors', 'id', 'id'),
+    ('authors', ('name',), 'books', 'author_id', 'id'),
+]
+
+
+def register_counters(metadata):
+    """
+    cria os triggers dos contadores e das versoes junto com as tabelas
+    alteradas
+    """
+    for dialect in ('postgresql', 'sqlite'):
+        for table_name, statements in all_trigger_ddl(dialect):
+            for statement in statements:
+                event.listen(
+                    metadata.tables[table_name],
+                    'after_create',
+                    DDL(statement).execute_if(dialect=dialect),
+                )
+
+    functions = [
+        (counted, f'{counted}_{counter}')
+        for counted, _, _, counter in COUNTERS
+    ]
+    functions += [
+        (changed, f'{changed}_{version}')
+        for changed, _, _, version, _ in VERSIONS
+    ]
+    functions += [
+        (changed, row_version_name(changed, target))
+        for changed, _, target, _, _ in ROW_VERSIONS
+    ]
+    for table_name, function in functions:
+        event.listen(
+            metadata.tables[table_name],
+            'before_drop',
+            DDL(f'DROP FUNCTION IF EXISTS {function}() CASCADE').execute_if(
+                dialect='postgresql'
+            ),
+        )
+
+
+def all_trigger_ddl(dialect: str):
+    """(tabela alterada, comandos) de cada contador e versao"""
+    for counted, foreign_key, target, counter in COUNTERS:
+        yield (
+            counted,
+            counter_ddl(dialect, counted, foreign_key, target, counter),
+        )
+    for changed, foreign_key, target, version, stamp in VERSIONS:
+        yield (
+            changed,
+            version_ddl(dialect, changed, foreign_key, target, version, stamp),
+        )
+    for changed, columns, target, target_key, row_key in ROW_VERSIONS:
+        yield (
+            changed,
+            row_version_ddl(
+                dialect, changed, columns, target, target_key, row_key
+            ),
+        )
+
+
+def counter_ddl(  # noqa: PLR0913, PLR0917
+    dialect: str, counted: str, foreign_key: str, target: str, counter: str
+):
+    increment = (
+        f'UPDATE {target} SET {counter} = {counter} + 1 '
+        f'WHERE id = new.{foreign_key};'
+    )
+    decrement = (
+        f'UPDATE {target} SET {counter} = {counter} - 1 '
+        f'WHERE id = old.{foreign_key};'
+    )
+    return trigger_ddl(
+        dialect,
+        counted,
+        foreign_key,
+        f'{counted}_{counter}',
+        on_new=increment,
+        on_old=decrement,
+    )
+
+
+def version_ddl(  # noqa: PLR0913, PLR0917
+    dialect: str,
+    changed: str,
+    foreign_key: str,
+    target: str,
+    version: str,
+    stamp: str,
+):
+    """a versao do dono aumenta tanto na linha nova quanto na antiga"""
+
+    def bump(row):
+        return (
+            f'UPDATE {target} SET {version} = {version} + 1, '
+            f'{stamp} = CURRENT_TIMESTAMP WHERE id = {row}.{foreign_key};'
+        )
+
+    return trigger_ddl(
+        dialect,
+        changed,
+        foreign_key,
+        f'{changed}_{version}',
+        on_new=bump('new'),
+        on_old=bump('old'),
+    )
+
+
+def row_version_name(changed: str, target: str):
+    return f'{changed}_{target}_version'
+
+
+def row_version_ddl(  # noqa: PLR0913, PLR0917
+    dialect: str,
+    changed: str,
+    columns: tuple,
+    target: str,
+    target_key: str,
+    row_key: str,
+):
+    """
+    trigger que aumenta a versao quando um UPDATE muda de fato alguma das
+    colunas; a propria versao fica fora delas, entao o UPDATE do trigger
+    nao dispara outro
+    """
+    name = row_version_name(changed, target)
+    watched = ', '.join(columns)
+    bump = (
+        f'UPDATE {target} SET version = version + 1, '
+        f'updated_at = CURRENT_TIMESTAMP '
+        f'WHERE {target_key} = new.{row_key};'
+    )
+
+    if dialect == 'postgresql':
+        modified = ' OR '.join(
+            f'old.{column} IS DISTINCT FROM new.{column}' for column in columns
+        )
+        return [
+            f'CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$ '
+            f'BEGIN {bump} RETURN NULL; END $$ LANGUAGE plpgsql',
+            f'CREATE OR REPLACE TRIGGER {name} AFTER UPDATE OF {watched} '
+            f'ON {changed} FOR EACH ROW WHEN ({modified}) '
+            f'EXECUTE FUNCTION {name}()',
+        ]
+
+    modified = ' OR '.join(
+        f'old.{column} IS NOT new.{column}' for column in columns
+    )
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {name}_au '
+        f'AFTER UPDATE OF {watched} ON {changed} '
+        f'FOR EACH ROW WHEN {modified} BEGIN {bump} END',
+    ]
+
+
+def trigger_ddl(  # noqa: PLR0913, PLR0917
+    dialect: str,
+    table_name: str,
+    foreign_key: str,
+    name: str,
+    on_new: str,
+    on_old: str,
+):
+    """
+    triggers que rodam on_new para a linha inserida e on_old para a
+    removida; mudar a fk conta como as duas coisas
+    """
+    if dialect == 'postgresql':
+        return [
+            f'CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$ '
+            f"BEGIN IF TG_OP IN ('DELETE', 'UPDATE') THEN {on_old} END IF; "
+            f"IF TG_OP IN ('INSERT', 'UPDATE') THEN {on_new} END IF; "
+            'RETURN NULL; END $$ LANGUAGE plpgsql',
+            f'CREATE OR REPLACE TRIGGER {name} AFTER INSERT OR DELETE '
+            f'OR UPDATE OF {foreign_key} ON {table_name} '
+            f'FOR EACH ROW EXECUTE FUNCTION {name}()',
+        ]
+
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {name}_ai '
+        f'AFTER INSERT ON {table_name} BEGIN {on_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {name}_ad '
+        f'AFTER DELETE ON {table_name} BEGIN {on_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {name}_au '
+        f'AFTER UPDATE OF {foreign_key} ON {table_name} '
+        f'BEGIN {on_old} {on_new} END',
+    ]
+
+
+def reconcile_statements():
+    """(nome do contador, UPDATE que corrige os valores divergentes)"""
+    for counted, foreign_key, target, counter in COUNTERS:
+        counted_table = table(counted, column(foreign_key))
+        target_table = table(target, column('id'), column(counter))
+
+        actual = (
+            select(func.count())
+            .select_from(counted_table)
+            .where(counted_table.c[foreign_key] == target_table.c.id)
+            .scalar_subquery()
+        )
+        yield (
+            f'{target}.{counter}',
+            update(target_table)
+            .where(target_table.c[counter] != actual)
+            .values({counter: actual}),
+        )
+
+
+def reconcile_counters(session: Session):
+    """
+    recalcula os contadores a partir das linhas e corrige os que
+    divergem; retorna quantos registros foram corrigidos por contador
+    """
+    fixed = {}
+    for name, statement in reconcile_statements():
+        fixed[name] = session.execute(statement).rowcount
+
+    session.commit()
+    return fixed
+
+
+def main():
+    engine = create_engine(settings.DATABASE_URL)
+    with Session(engine) as session:
+        print(json.dumps(reconcile_counters(session)))
+
+
+if __name__ == '__main__':
+    main()
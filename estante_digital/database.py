@@ -1,11 +1,198 @@
-from sqlalchemy import create_engine
+from functools import cache
+
+from sqlalchemy import NullPool, create_engine, event, exc, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from estante_digital.metrics import (
+    TimedAsyncQueuePool,
+    TimedQueuePool,
+    instrument_engine,
+)
 from estante_digital.settings import Settings
 
-engine = create_engine(Settings().DATABASE_URL)
+settings = Settings()
+
+
+def engine_options(url: str):
+    """
+    parametros do pool de conexoes a partir das settings
+    o SQLite mantem o pool padrao do SQLAlchemy
+    """
+    options = {'pool_pre_ping': settings.DATABASE_POOL_PRE_PING}
+    backend = make_url(url).get_backend_name()
+
+    if backend == 'sqlite':
+        return options
+
+    options.update(
+        poolclass=(
+            TimedAsyncQueuePool if settings.DATABASE_ASYNC else TimedQueuePool
+        ),
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    )
+
+    if backend == 'postgresql' and settings.DATABASE_STATEMENT_TIMEOUT:
+        options['connect_args'] = {
+            'options': (
+                f'-c statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}'
+            )
+        }
+
+    return options
+
+
+def enable_foreign_keys(engine):
+    """
+    o SQLite so aplica as fks (e o ON DELETE CASCADE) com o pragma
+    ligado em cada conexao; nos outros bancos nao faz nada
+    """
+    sync_engine = getattr(engine, 'sync_engine', engine)
+    if sync_engine.dialect.name != 'sqlite':
+        return engine
+
+    @event.listens_for(sync_engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+    return engine
+
+
+def build_engine(url: str):
+    if settings.DATABASE_ASYNC:
+        engine = create_async_engine(url, **engine_options(url))
+    else:
+        engine = create_engine(url, **engine_options(url))
+    return enable_foreign_keys(engine)
+
+
+engine = build_engine(settings.DATABASE_URL)
+instrument_engine('primary', engine)
+
+
+class SyncSession:
+    """
+    adapta uma Session sincrona para a interface da AsyncSession usada
+    pelos routers; as operacoes que acessam o banco rodam no threadpool
+    usada com DATABASE_ASYNC desligado (SQLite, testes)
+    """
+
+    _io_methods = frozenset({
+        'close',
+        'commit',
+        'connection',
+        'delete',
+        'execute',
+        'flush',
+        'get',
+        'merge',
+        'refresh',
+        'rollback',
+        'scalar',
+        'scalars',
+    })
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.sync_session, name)
 
+        if name not in self._io_methods:
+            return attr
 
-def get_session():
-    with Session(engine) as session:  # no cover
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(attr, *args, **kwargs)
+
+        return call
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def insert_ignoring_conflicts(table, dialect: str):
+    """
+    insert na tabela que ignora linhas que violariam uma restricao unica
+    (ON CONFLICT DO NOTHING); use RETURNING para saber quais entraram, o
+    rowcount do psycopg e -1
+    """
+    dialects = {'postgresql': postgresql, 'sqlite': sqlite}
+    return dialects[dialect].insert(table).on_conflict_do_nothing()
+
+
+def unique_violation(error: exc.IntegrityError, table):
+    """
+    nome da coluna unica da tabela que causou o IntegrityError, ou None
+    postgres: constraint '<tabela>_<coluna>_key'
+    sqlite: mensagem 'UNIQUE constraint failed: <tabela>.<coluna>'
+    """
+    diag = getattr(error.orig, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None)
+    message = str(error.orig)
+
+    for column in table.columns:
+        if not column.unique:
+            continue
+        if constraint == f'{table.name}_{column.name}_key':
+            return column.name
+        if f'UNIQUE constraint failed: {table.name}.{column.name}' in message:
+            return column.name
+
+    return None
+
+
+def session_for(engine):
+    if isinstance(engine, AsyncEngine):
+        return AsyncSession(engine, expire_on_commit=False)
+    return SyncSession(Session(engine))
+
+
+async def get_session():
+    async with session_for(engine) as session:
         yield session
+
+
+# drivers so async e o equivalente sincrono; o psycopg atende aos dois
+SYNC_DRIVERS = {'aiosqlite': 'pysqlite', 'asyncpg': 'psycopg'}
+
+
+@cache
+def sync_engine_for(async_engine: AsyncEngine):
+    """
+    engine sincrono no mesmo banco, para o trabalho que roda no
+    threadpool; sem pool, cada tarefa abre e fecha a propria conexao
+    """
+    url = async_engine.url
+    driver = SYNC_DRIVERS.get(url.get_driver_name())
+    if driver:
+        url = url.set(drivername=f'{url.get_backend_name()}+{driver}')
+    return enable_foreign_keys(create_engine(url, poolclass=NullPool))
+
+
+async def get_session_factory():
+    """
+    abre Sessions sincronas fora da requisicao, para tarefas em segundo
+    plano que rodam no threadpool
+    """
+    if isinstance(engine, AsyncEngine):
+        bind = sync_engine_for(engine)
+    else:
+        bind = engine
+    return lambda: Session(bind)
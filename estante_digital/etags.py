@@ -0,0 +1,97 @@
+"""
+validadores HTTP (ETag fraco e Last-Modified) das rotas GET
+
+o ETag vem de uma versao mantida por trigger (estante_digital.counters),
+entao a rota consegue responder 304 lendo so a versao, sem montar nem
+serializar a resposta; na colecao do usuario, a versao dela e as linhas
+da propria pagina
+"""
+
+from datetime import UTC, datetime
+from email.utils import format_datetime
+from hashlib import blake2b
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from sqlalchemy import func
+
+from estante_digital.database import settings
+from estante_digital.models import User
+
+
+def make_etag(*parts):
+    return 'W/"{}"'.format('-'.join(str(part) for part in parts))
+
+
+def query_digest(request: Request):
+    """resumo dos query params, na mesma ordem qualquer que seja a url"""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return blake2b(query.encode(), digest_size=8).hexdigest()
+
+
+def etag_matches(request: Request, etag: str):
+    """If-None-Match com comparacao fraca (ignora o prefixo W/)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag.removeprefix('W/') in candidates
+
+
+def cache_headers(etag: str, last_modified: datetime | None):
+    headers = {'ETag': etag, 'Cache-Control': settings.ETAG_CACHE_CONTROL}
+    if last_modified is not None:
+        # as datas do banco sao UTC sem fuso
+        headers['Last-Modified'] = format_datetime(
+            last_modified.replace(tzinfo=UTC), usegmt=True
+        )
+    return headers
+
+
+def version_columns(model):
+    """colunas que identificam a versao de um livro ou autor"""
+    return model.id, model.version, model.updated_at, model.created_at
+
+
+def collection_version_columns():
+    """
+    colunas da versao da colecao de um usuario (livros adicionados e
+    removidos); as versoes dos livros entram por page_digest
+    """
+    return (
+        User.collection_version,
+        func.coalesce(User.collection_updated_at, User.created_at).label(
+            'collection_updated_at'
+        ),
+    )
+
+
+def page_digest(rows):
+    """
+    resumo dos ids e versoes das linhas de uma pagina (com BOOK_VERSION);
+    o custo acompanha o limit, nao o tamanho da colecao
+    """
+    versions = ','.join(f'{row.id}:{row.version}' for row in rows)
+    return blake2b(versions.encode(), digest_size=8).hexdigest()
+
+
+def page_updated_at(rows, since: datetime):
+    """ultima mudanca entre since e as linhas da pagina"""
+    return max([since, *(row.updated_at or row.created_at for row in rows)])
+
+
+def entity_headers(name: str, entity):
+    """
+    (etag, headers) de uma linha de version_columns ou de um objeto
+    sem updated_at, a ultima mudanca e a criacao
+    """
+    etag = make_etag(name, entity.id, entity.version)
+    return etag, cache_headers(etag, entity.updated_at or entity.created_at)
+
+
+def not_modified(headers: dict):
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
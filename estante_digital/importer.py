@@ -0,0 +1,286 @@
+"""
+importacao em massa de autores e livros a partir de CSV ou JSONL
+
+cada registro tem as chaves title, year e author (nome do autor);
+sem title, o registro cria apenas o autor. a entrada e lida em fluxo e
+gravada em lotes: os nomes de autor viram ids por um mapa em memoria e
+cada lote e um INSERT de varias linhas, com uma transacao por lote
+
+uso: python -m estante_digital.importer livros.csv --user admin@x.com
+"""
+
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from estante_digital.database import insert_ignoring_conflicts, settings
+from estante_digital.models import Author, Book, User
+from estante_digital.utils import sanitize_input
+
+authors_table = Author.__table__
+books_table = Book.__table__
+
+
+def read_records(lines, format: str):
+    """gera (numero da linha, registro) a partir de linhas de texto"""
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record
+
+
+class ImportSummary:
+    def __init__(self):
+        self.read = 0
+        self.authors_created = 0
+        self.books_created = 0
+        self.errors = 0
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'authors_created': self.authors_created,
+            'books_created': self.books_created,
+            'errors': self.errors,
+        }
+
+
+class Importer:
+    """
+    grava os registros em lotes de chunk_size usando uma Session
+    sincrona; on_error(linha, registro, mensagem) recebe os
+    registros rejeitados e on_progress(summary) e chamado a cada lote
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        session: Session,
+        created_by_id: int,
+        chunk_size: int = 5000,
+        on_error=None,
+        on_progress=None,
+    ):
+        self.session = session
+        self.created_by_id = created_by_id
+        self.chunk_size = chunk_size
+        self.on_error = on_error or (lambda *args: None)
+        self.on_progress = on_progress or (lambda summary: None)
+        self.dialect = session.bind.dialect.name
+        self.author_ids = {}
+        self.summary = ImportSummary()
+
+    def run(self, records):
+        records = iter(records)
+        while (prepared := self.next_chunk(records)) is not None:
+            self.write_chunk(prepared)
+
+        return self.summary
+
+    def reject(self, number: int, record, message: str):
+        self.summary.errors += 1
+        self.on_error(number, record, message)
+
+    def next_chunk(self, records):
+        """
+        le e valida o proximo lote do iterador, sem acessar o banco;
+        None quando a entrada acabou
+        """
+        chunk = list(islice(records, self.chunk_size))
+        if not chunk:
+            return None
+
+        return self.prepare_chunk(chunk)
+
+    def write_chunk(self, prepared):
+        """grava um lote de next_chunk numa transacao propria"""
+        author_names, books = prepared
+        self.resolve_authors(author_names)
+        self.insert_books(books)
+        self.session.commit()
+        self.on_progress(self.summary)
+
+    def prepare_chunk(self, chunk):
+        books = []
+        titles = set()
+        author_names = set()
+
+        for number, record in chunk:
+            self.summary.read += 1
+            try:
+                author, book = self.clean(record)
+            except ValueError as error:
+                self.reject(number, record, str(error))
+                continue
+
+            author_names.add(author)
+            if book is None:
+                continue
+            if book['title'] in titles:
+                self.reject(number, record, 'Book already exists')
+                continue
+
+            titles.add(book['title'])
+            books.append((number, record, author, book))
+
+        return author_names, books
+
+    @staticmethod
+    def clean(record):
+        if not isinstance(record, dict):
+            raise ValueError('Invalid record')
+
+        author = sanitize_input(str(record.get('author') or ''))
+        if not author:
+            raise ValueError('Author is required')
+
+        title = sanitize_input(str(record.get('title') or ''))
+        if not title:
+            return author, None
+
+        try:
+            year = int(record.get('year'))
+        except (TypeError, ValueError):
+            raise ValueError('Invalid year') from None
+
+        return author, {'title': title, 'year': year}
+
+    def resolve_authors(self, names: set):
+        """completa o mapa nome -> id, criando os autores que faltam"""
+        missing = names - self.author_ids.keys()
+        if not missing:
+            return
+
+        self.load_author_ids(missing)
+        new = missing - self.author_ids.keys()
+        if not new:
+            return
+
+        insert = insert_ignoring_conflicts(authors_table, self.dialect)
+        result = self.session.execute(
+            insert.returning(authors_table.c.id, authors_table.c.name),
+            [
+                {'name': name, 'created_by_id': self.created_by_id}
+                for name in sorted(new)
+            ],
+        )
+        for id, name in result:
+            self.author_ids[name] = id
+            self.summary.authors_created += 1
+
+        # criados por outra transacao entre o SELECT e o INSERT
+        self.load_author_ids(new - self.author_ids.keys())
+
+    def load_author_ids(self, names: set):
+        if not names:
+            return
+
+        result = self.session.execute(
+            select(authors_table.c.id, authors_table.c.name).where(
+                authors_table.c.name.in_(names)
+            )
+        )
+        for id, name in result:
+            self.author_ids[name] = id
+
+    def insert_books(self, books: list):
+        if not books:
+            return
+
+        insert = insert_ignoring_conflicts(books_table, self.dialect)
+        result = self.session.execute(
+            insert.returning(books_table.c.title),
+            [
+                {
+                    **book,
+                    'author_id': self.author_ids[author],
+                    'created_by_id': self.created_by_id,
+                }
+                for _, _, author, book in books
+            ],
+        )
+        created = set(result.scalars())
+        self.summary.books_created += len(created)
+
+        for number, record, _, book in books:
+            if book['title'] not in created:
+                self.reject(number, record, 'Book already exists')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m estante_digital.importer',
+        description='importa autores e livros de um arquivo CSV ou JSONL',
+    )
+    parser.add_argument('path', help="arquivo de entrada, '-' para stdin")
+    parser.add_argument(
+        '--user', required=True, help='email do usuario dono dos registros'
+    )
+    parser.add_argument('--format', choices=['csv', 'jsonl'])
+    parser.add_argument(
+        '--chunk-size', type=int, default=settings.IMPORT_CHUNK_SIZE
+    )
+    parser.add_argument('--errors', help='arquivo JSONL com as rejeicoes')
+    args = parser.parse_args(argv)
+
+    format = args.format or ('csv' if args.path.endswith('.csv') else 'jsonl')
+    engine = create_engine(settings.DATABASE_URL)
+
+    with Session(engine) as session:
+        user_id = session.scalar(
+            select(User.id).where(User.email == sanitize_input(args.user))
+        )
+        if user_id is None:
+            parser.error(f'user not found: {args.user}')
+
+        source = (
+            sys.stdin
+            if args.path == '-'
+            else open(args.path, encoding='utf-8', newline='')
+        )
+        errors = (
+            open(args.errors, 'w', encoding='utf-8') if args.errors else None
+        )
+
+        def on_error(number, record, message):
+            if errors:
+                line = {'line': number, 'record': record, 'error': message}
+                errors.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+        def on_progress(summary):
+            print(json.dumps(summary.as_dict()), file=sys.stderr)
+
+        try:
+            importer = Importer(
+                session,
+                user_id,
+                chunk_size=args.chunk_size,
+                on_error=on_error,
+                on_progress=on_progress,
+            )
+            summary = importer.run(read_records(source, format))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if errors:
+                errors.close()
+
+    print(json.dumps(summary.as_dict()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+listas montadas em JSON pelo postgres (DATABASE_JSON_LISTS)
+
+em vez de trazer as linhas e serializar no python, cada linha da pagina
+vira um json_build_object (estante_digital.reads) e a pagina inteira um
+json_agg; o texto que o banco devolve entra direto no corpo da resposta.
+a mesma consulta traz quantas linhas vieram (a linha a mais diz se ha
+proxima pagina) e as colunas da ordenacao da ultima, para o cursor
+
+a ordem de uma subconsulta nao chega a consulta de fora, entao a
+pagina (estante_digital.pagination) leva a propria posicao: um
+row_number() com o mesmo ORDER BY dela. de fora, as linhas sao
+renumeradas a partir de 1 (com offset a posicao nao comeca em 1) e o
+json_agg segue essa numeracao. nos outros bancos as rotas seguem pelo
+caminho em python
+
+CPU do app por requisicao nos dois modos: python -m benchmarks.json_lists
+"""
+
+import json
+
+from pydantic_core import to_json
+from sqlalchemy import Text, cast, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from estante_digital.database import settings
+from estante_digital.pagination import page_query
+
+
+def json_lists_enabled(session):
+    return (
+        settings.DATABASE_JSON_LISTS
+        and session.bind.dialect.name == 'postgresql'
+    )
+
+
+def json_page_query(query, item, columns: list, *page_args, **page_kwargs):
+    """
+    (consulta, size, next_cursor) da pagina agregada em uma linha:
+    items (texto JSON), rows (linhas lidas) e last (colunas da
+    ordenacao da ultima linha da pagina)
+    page_args e page_kwargs sao os de page_query
+    """
+    keys = [
+        column.label(f'key_{index}') for index, column in enumerate(columns)
+    ]
+    selected = query.with_only_columns(
+        item.label('item'), *keys, maintain_column_froms=True
+    )
+    statement, size, next_cursor = page_query(
+        selected, columns, *page_args, **page_kwargs
+    )
+
+    ordinal = func.row_number().over(order_by=statement._order_by_clauses)
+    page = statement.add_columns(ordinal.label('ordinal')).subquery('page')
+    numbered = select(
+        page, func.row_number().over(order_by=page.c.ordinal).label('position')
+    ).subquery('numbered')
+    position = numbered.c.position
+
+    aggregate = select(
+        cast(
+            func.json_agg(
+                aggregate_order_by(numbered.c.item, position)
+            ).filter(position <= size),
+            Text,
+        ).label('items'),
+        func.count().label('rows'),
+        cast(
+            func.json_agg(
+                func.json_build_array(*(numbered.c[key.name] for key in keys))
+            ).filter(position == size),
+            Text,
+        ).label('last'),
+    ).select_from(numbered)
+    return aggregate, size, next_cursor
+
+
+async def json_page(session, query, item, columns: list, *page_args, **kw):
+    """(texto JSON da lista, next_cursor) da pagina montada no banco"""
+    statement, size, next_cursor = json_page_query(
+        query, item, columns, *page_args, **kw
+    )
+    page = (await session.execute(statement)).one()
+
+    if page.rows <= size:
+        return page.items or '[]', None
+
+    # last traz so a linha de numero size: [[coluna, ...]]
+    return page.items, next_cursor(json.loads(page.last)[0])
+
+
+def page_body(key: str, items: str, next_cursor: str | None):
+    """corpo de BookList/AuthorList com a lista ja em JSON"""
+    return b''.join([
+        b'{"',
+        key.encode(),
+        b'":',
+        items.encode(),
+        b',"next_cursor":',
+        to_json(next_cursor),
+        b'}',
+    ])
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class Histogram:
+    """histograma de tempos em milissegundos, com buckets fixos"""
+
+    buckets = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = Lock()
+
+    def observe(self, milliseconds: float):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, milliseconds)] += 1
+            self.count += 1
+            self.total += milliseconds
+            self.max = max(self.max, milliseconds)
+
+    def snapshot(self):
+        with self._lock:
+            labels = [str(b) for b in self.buckets] + ['+Inf']
+            return {
+                'buckets': dict(zip(labels, self.counts)),
+                'count': self.count,
+                'sum_ms': round(self.total, 3),
+                'max_ms': round(self.max, 3),
+            }
+
+
+class PoolMetrics:
+    """
+    contadores de um pool de conexoes, alimentados pelos eventos do pool
+    os valores sao por processo (por worker do uvicorn)
+    """
+
+    def __init__(self, engine):
+        self.engine = getattr(engine, 'sync_engine', engine)
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_time = Histogram()
+
+        pool = self.engine.pool
+        event.listen(pool, 'connect', self.on_connect)
+        event.listen(pool, 'checkout', self.on_checkout)
+        event.listen(pool, 'checkin', self.on_checkin)
+        if isinstance(pool, TimedPoolMixin):
+            pool.metrics = self
+
+    def on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, proxy):
+        self.checkouts += 1
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        self.checkins += 1
+
+    def observe_wait(self, seconds: float):
+        self.wait_time.observe(seconds * 1000)
+
+    def snapshot(self):
+        pool = self.engine.pool
+        data = {
+            'pool': type(pool).__name__,
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'checkins': self.checkins,
+            'timeouts': self.timeouts,
+            'wait_time': self.wait_time.snapshot(),
+        }
+
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+
+        return data
+
+
+class TimedPoolMixin:
+    """mede quanto tempo cada checkout levou para obter uma conexao"""
+
+    metrics = None
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeouts += 1
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_wait(perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# metricas de cada engine, pelo nome ('primary', ...)
+pool_metrics: dict[str, PoolMetrics] = {}
+
+
+def instrument_engine(name: str, engine):
+    pool_metrics[name] = PoolMetrics(engine)
+    return pool_metrics[name]
@@ -1,6 +1,16 @@
 from datetime import datetime
 
-from sqlalchemy import Column, ForeignKey, Table, func
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    func,
+)
 from sqlalchemy.orm import (
     Mapped,
     mapped_column,
@@ -8,14 +18,70 @@ from sqlalchemy.orm import (
     relationship,
 )
 
+from estante_digital.counters import register_counters
+from estante_digital.search import register_search_index
+
 table_registry = registry()
 
+# os relacionamentos nunca carregam sob demanda: cada rota declara o que
+# precisa (selectinload/joinedload) e um acesso esquecido falha em vez de
+# virar uma consulta por linha. ficam fora do repr e da comparacao dos
+# dataclasses, que acessariam todos eles
+#
+# as remocoes em cascata ficam com o banco (ON DELETE CASCADE): o ORM
+# nao carrega os filhos para apagar um por um (passive_deletes)
+
 
 user_collection_table = Table(
     'user_collection_table',
     table_registry.metadata,
-    Column('user_id', ForeignKey('users.id'), primary_key=True),
-    Column('book_id', ForeignKey('books.id'), primary_key=True),
+    Column(
+        'user_id', ForeignKey('users.id', ondelete='CASCADE'), primary_key=True
+    ),
+    Column(
+        'book_id',
+        ForeignKey('books.id', ondelete='CASCADE'),
+        primary_key=True,
+        index=True,
+    ),
+    Column(
+        'added_at',
+        DateTime,
+        server_default=func.now(),
+        nullable=False,
+        index=True,
+    ),
+)
+
+# rankings pre-calculados (estante_digital.rankings), trocados a cada
+# refresh; sem fk para nao travar nem impedir a remocao de livros
+book_rankings_table = Table(
+    'book_rankings',
+    table_registry.metadata,
+    Column('kind', String, primary_key=True),
+    Column('position', Integer, primary_key=True),
+    Column('book_id', Integer, nullable=False),
+    Column('score', Integer, nullable=False),
+    Column('refreshed_at', DateTime, nullable=False),
+)
+
+# andamento das remocoes de conta (estante_digital.purge), visivel para
+# todos os workers; sem fk, o job sobrevive ao usuario que ele apaga
+purge_jobs_table = Table(
+    'purge_jobs',
+    table_registry.metadata,
+    Column('id', String, primary_key=True),
+    Column('user_id', Integer, nullable=False),
+    Column('status', String, nullable=False),
+    Column('deleted', JSON, nullable=True),
+    Column('created_at', DateTime, server_default=func.now(), nullable=False),
+    Column(
+        'updated_at',
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    ),
 )
 
 
@@ -30,66 +96,156 @@ class User:
     created_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now()
     )
+    token_version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
+    # mantidos por trigger (estante_digital.counters); sem mudancas na
+    # colecao, collection_updated_at fica nulo
+    collection_version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
+    collection_updated_at: Mapped[datetime | None] = mapped_column(
+        init=False, default=None
+    )
+    # conta removida, aguardando a limpeza (estante_digital.purge)
+    deleted_at: Mapped[datetime | None] = mapped_column(
+        init=False, default=None
+    )
 
     collection: Mapped[list['Book']] = relationship(
         init=False,
         secondary=user_collection_table,
         back_populates='users',
+        lazy='raise',
+        passive_deletes=True,
+        repr=False,
+        compare=False,
     )
     books_created: Mapped[list['Book']] = relationship(
-        init=False, back_populates='created_by', cascade='all, delete-orphan'
+        init=False,
+        back_populates='created_by',
+        cascade='all, delete-orphan',
+        lazy='raise',
+        passive_deletes=True,
+        repr=False,
+        compare=False,
     )
     authors_created: Mapped[list['Author']] = relationship(
-        init=False, back_populates='created_by', cascade='all, delete-orphan'
+        init=False,
+        back_populates='created_by',
+        cascade='all, delete-orphan',
+        lazy='raise',
+        passive_deletes=True,
+        repr=False,
+        compare=False,
     )
 
 
 @table_registry.mapped_as_dataclass
 class Author:
     __tablename__ = 'authors'
+    __table_args__ = (Index('ix_authors_book_count_id', 'book_count', 'id'),)
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     name: Mapped[str] = mapped_column(unique=True)
+    # mantidos por trigger (estante_digital.counters); updated_at fica
+    # nulo enquanto o autor nao muda depois de criado
+    book_count: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
+    version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
+    updated_at: Mapped[datetime | None] = mapped_column(
+        init=False, default=None
+    )
     created_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now()
     )
     created_by_id: Mapped[int] = mapped_column(
-        ForeignKey('users.id'), init=False
+        ForeignKey('users.id', ondelete='CASCADE'), init=False, index=True
     )
 
     created_by: Mapped[User] = relationship(
-        back_populates='authors_created', init=False
+        back_populates='authors_created',
+        init=False,
+        lazy='raise',
+        repr=False,
+        compare=False,
     )
 
     books: Mapped[list['Book']] = relationship(
-        init=False, back_populates='author', cascade='all, delete-orphan'
+        init=False,
+        back_populates='author',
+        cascade='all, delete-orphan',
+        lazy='raise',
+        passive_deletes=True,
+        repr=False,
+        compare=False,
     )
 
 
 @table_registry.mapped_as_dataclass
 class Book:
     __tablename__ = 'books'
+    # author_id sozinho e coberto pelo prefixo do indice composto;
+    # (year, id) serve o filtro por ano e a paginacao por cursor
+    __table_args__ = (
+        Index('ix_books_author_id_year', 'author_id', 'year'),
+        Index('ix_books_year_id', 'year', 'id'),
+        Index('ix_books_collector_count_id', 'collector_count', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     title: Mapped[str] = mapped_column(unique=True)
     year: Mapped[int]
+    # mantidos por trigger (estante_digital.counters); updated_at fica
+    # nulo enquanto o livro nao muda depois de criado
+    collector_count: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
+    version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
+    updated_at: Mapped[datetime | None] = mapped_column(
+        init=False, default=None
+    )
     created_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now()
     )
     author_id: Mapped[int] = mapped_column(
-        ForeignKey('authors.id'), init=False
+        ForeignKey('authors.id', ondelete='CASCADE'), init=False
     )
     created_by_id: Mapped[int] = mapped_column(
-        ForeignKey('users.id'), init=False
+        ForeignKey('users.id', ondelete='CASCADE'), init=False, index=True
     )
 
-    author: Mapped[Author] = relationship(back_populates='books', init=False)
+    author: Mapped[Author] = relationship(
+        back_populates='books',
+        init=False,
+        lazy='raise',
+        repr=False,
+        compare=False,
+    )
     created_by: Mapped[User] = relationship(
-        back_populates='books_created', init=False
+        back_populates='books_created',
+        init=False,
+        lazy='raise',
+        repr=False,
+        compare=False,
     )
 
     users: Mapped[list['User']] = relationship(
         init=False,
         secondary=user_collection_table,
         back_populates='collection',
+        lazy='raise',
+        passive_deletes=True,
+        repr=False,
+        compare=False,
     )
+
+
+register_search_index(Book.__table__.c.title)
+register_search_index(Author.__table__.c.name)
+register_counters(table_registry.metadata)
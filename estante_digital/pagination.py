@@ -0,0 +1,146 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+from estante_digital.database import settings
+
+
+def page_size(limit: int | None):
+    """tamanho da pagina: padrao do servidor, limitado ao maximo"""
+    if limit is None:
+        return settings.PAGE_SIZE_DEFAULT
+    return min(limit, settings.PAGE_SIZE_MAX)
+
+
+def encode_cursor(payload: dict):
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        payload = json.loads(urlsafe_b64decode(cursor + padding))
+    except (Base64Error, UnicodeDecodeError, ValueError):
+        payload = None
+
+    if not isinstance(payload, dict):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+        )
+
+    return payload
+
+
+def valid_after(after, columns: list):
+    """
+    os valores do cursor sao escalares do tipo de cada coluna; o tipo
+    exato recusa bool (subclasse de int) e listas ou objetos do JSON
+    """
+    return (
+        isinstance(after, list)
+        and len(after) == len(columns)
+        and all(
+            type(value) is column.type.python_type
+            for value, column in zip(after, columns)
+        )
+    )
+
+
+def page_query(  # noqa
+    query,
+    columns: list,
+    cursor: str | None,
+    limit: int | None,
+    offset: int | None = None,
+    ordered: bool = False,
+    descending: bool = False,
+):
+    """
+    aplica a ordem, a posicao e o limite da pagina a consulta
+    retorna (consulta, size, next_cursor): a consulta traz uma linha a
+    mais, que diz se existe proxima pagina, e next_cursor(last) monta o
+    cursor a partir dos valores de columns na ultima linha da pagina
+    por padrao usa keyset: ordena por columns (a ultima deve ser unica)
+    e continua depois dos valores guardados no cursor
+    consultas ja ordenadas (ordered, ex: relevancia da busca textual) e o
+    modo offset, obsoleto, guardam o deslocamento no cursor
+    descending inverte a ordem de todas as colunas
+    """
+    if cursor is not None and offset is not None:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Use either cursor or offset',
+        )
+
+    size = page_size(limit)
+    payload = decode_cursor(cursor) if cursor is not None else {}
+    keyset = not ordered and offset is None and 'offset' not in payload
+
+    keys = [column.key for column in columns]
+    order = [column.desc() if descending else column for column in columns]
+
+    if keyset:
+        query = query.order_by(*order)
+        if 'after' in payload:
+            after = payload['after']
+            if payload.get('by') != keys or not valid_after(after, columns):
+                raise HTTPException(
+                    status_code=HTTPStatus.BAD_REQUEST,
+                    detail='Invalid cursor',
+                )
+            position = tuple_(*columns)
+            query = query.where(
+                position < tuple_(*after)
+                if descending
+                else position > tuple_(*after)
+            )
+    else:
+        if not ordered:
+            query = query.order_by(*order)
+        offset = offset or payload.get('offset', 0)
+        if type(offset) is not int or offset < 0:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+            )
+        query = query.offset(offset)
+
+    def next_cursor(last: list):
+        if keyset:
+            return encode_cursor({'by': keys, 'after': last})
+        return encode_cursor({'offset': offset + size})
+
+    return query.limit(size + 1), size, next_cursor
+
+
+async def paginate(  # noqa
+    session,
+    query,
+    columns: list,
+    cursor: str | None,
+    limit: int | None,
+    offset: int | None = None,
+    ordered: bool = False,
+    descending: bool = False,
+):
+    """
+    executa a consulta paginada (page_query) e retorna
+    (linhas, next_cursor)
+    query seleciona colunas (estante_digital.reads); as linhas vem como
+    Row e as colunas da ordenacao devem estar entre as selecionadas
+    """
+    query, size, next_cursor = page_query(
+        query, columns, cursor, limit, offset, ordered, descending
+    )
+
+    rows = (await session.execute(query)).all()
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, next_cursor([getattr(last, column.key) for column in columns])
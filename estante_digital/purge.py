@@ -0,0 +1,186 @@
+"""
+remocao de contas em segundo plano
+
+DELETE /user/{id} so marca a conta (users.deleted_at) e agenda a limpeza;
+purge_user apaga em lotes de PURGE_BATCH_SIZE, cada um na sua transacao,
+para nenhuma delas segurar travas por muito tempo. o que sai junto com
+a conta:
+- as entradas da colecao do usuario
+- os livros que ele cadastrou
+- os autores que ele cadastrou, com todos os livros desses autores
+  (inclusive os cadastrados por outros usuarios)
+- as entradas de colecao de qualquer usuario que apontem para esses livros
+
+o andamento de cada remocao fica na tabela purge_jobs, entao qualquer
+worker responde por ele; jobs mais velhos que PURGE_JOB_TTL sao apagados
+ao fim de cada limpeza
+
+contas marcadas cuja limpeza nao terminou (ex: o worker caiu) sao
+retomadas com: python -m estante_digital.purge
+"""
+
+import json
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import create_engine, delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from estante_digital.database import settings
+from estante_digital.models import (
+    Author,
+    Book,
+    User,
+    purge_jobs_table,
+    user_collection_table,
+)
+from estante_digital.response_cache import response_cache
+
+
+async def new_purge_job(session, user_id: int):
+    """registra o job na transacao da sessao; quem chama faz o commit"""
+    job_id = uuid4().hex
+    await session.execute(
+        insert(purge_jobs_table).values(
+            id=job_id, user_id=user_id, status='pending'
+        )
+    )
+    return job_id
+
+
+def select_purge_job(job_id: str):
+    """consulta (status, user_id, deleted) de um job"""
+    job = purge_jobs_table.c
+    return select(job.status, job.user_id, job.deleted).where(job.id == job_id)
+
+
+def _set_status(session: Session, job_id: str, status: str, deleted=None):
+    session.execute(
+        update(purge_jobs_table)
+        .where(purge_jobs_table.c.id == job_id)
+        .values(status=status, deleted=deleted)
+    )
+    session.commit()
+
+
+def _delete_old_jobs(session: Session):
+    # mesmo referencial do server_default func.now() de created_at
+    now = datetime.now(UTC).replace(tzinfo=None)
+    cutoff = now - timedelta(seconds=settings.PURGE_JOB_TTL)
+    session.execute(
+        delete(purge_jobs_table).where(purge_jobs_table.c.created_at < cutoff)
+    )
+    session.commit()
+
+
+def _delete_in_batches(session: Session, ids_query, delete_batch):
+    """
+    apaga ids_query em lotes; delete_batch(ids) monta os comandos do lote
+    retorna quantas linhas da consulta foram apagadas
+    """
+    deleted = 0
+    while True:
+        ids = session.scalars(ids_query.limit(settings.PURGE_BATCH_SIZE)).all()
+        if not ids:
+            return deleted
+
+        for statement in delete_batch(ids):
+            session.execute(statement)
+        session.commit()
+        deleted += len(ids)
+
+
+def _delete_books(ids):
+    return [
+        delete(user_collection_table).where(
+            user_collection_table.c.book_id.in_(ids)
+        ),
+        delete(Book).where(Book.id.in_(ids)),
+    ]
+
+
+def purge_user(session: Session, user_id: int):
+    """apaga a conta e o catalogo dela; retorna o total por tabela"""
+    collection = user_collection_table.c
+    own_authors = select(Author.id).where(Author.created_by_id == user_id)
+
+    summary = {
+        'collection': _delete_in_batches(
+            session,
+            select(collection.book_id).where(collection.user_id == user_id),
+            lambda ids: [
+                delete(user_collection_table).where(
+                    collection.user_id == user_id,
+                    collection.book_id.in_(ids),
+                )
+            ],
+        ),
+        'books': _delete_in_batches(
+            session,
+            select(Book.id).where(
+                or_(
+                    Book.created_by_id == user_id,
+                    Book.author_id.in_(own_authors),
+                )
+            ),
+            _delete_books,
+        ),
+        'authors': _delete_in_batches(
+            session,
+            own_authors,
+            lambda ids: [delete(Author).where(Author.id.in_(ids))],
+        ),
+    }
+
+    session.execute(delete(User).where(User.id == user_id))
+    session.commit()
+
+    return summary
+
+
+def run_purge_job(session: Session, job_id: str, user_id: int):
+    _set_status(session, job_id, 'running')
+    try:
+        summary = purge_user(session, user_id)
+    except Exception:
+        session.rollback()
+        _set_status(session, job_id, 'failed')
+        raise
+
+    _set_status(session, job_id, 'done', summary)
+    _delete_old_jobs(session)
+
+
+def _purge(open_session, job_id: str, user_id: int):
+    with open_session() as session:
+        run_purge_job(session, job_id, user_id)
+
+
+async def purge_in_background(open_session, job_id: str, user_id: int):
+    """
+    tarefa agendada pelo DELETE /user/{id}; a limpeza roda no threadpool
+    com uma Session sincrona propria (get_session_factory), fora do loop
+    """
+    await run_in_threadpool(_purge, open_session, job_id, user_id)
+
+    # livros e autores do usuario sairam do catalogo
+    await response_cache.invalidate('books', 'authors')
+
+
+def purge_pending(session: Session):
+    """termina a limpeza de todas as contas marcadas como removidas"""
+    user_ids = session.scalars(
+        select(User.id).where(User.deleted_at.is_not(None))
+    ).all()
+    return {user_id: purge_user(session, user_id) for user_id in user_ids}
+
+
+def main():
+    engine = create_engine(settings.DATABASE_URL)
+    with Session(engine) as session:
+        print(json.dumps(purge_pending(session)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+rankings de livros pre-calculados na tabela book_rankings
+
+popular: os mais colecionados (books.collector_count)
+trending: os mais adicionados a colecoes nos ultimos
+RANKINGS_TRENDING_DAYS dias (user_collection_table.added_at)
+
+refresh_rankings troca as linhas de cada ranking numa transacao, entao
+as leituras veem sempre um ranking completo; as rotas servem a tabela
+com cache em memoria (estante_digital.routers.rankings)
+
+uso (agendado, ex: cron a cada poucos minutos):
+python -m estante_digital.rankings
+"""
+
+import json
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import (
+    create_engine,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+)
+from sqlalchemy.orm import Session
+
+from estante_digital.cache import TTLCache
+from estante_digital.database import settings
+from estante_digital.models import (
+    Book,
+    book_rankings_table,
+    user_collection_table,
+)
+
+KINDS = ('popular', 'trending')
+
+# respostas das rotas por ranking; cada worker reconsulta a tabela no
+# maximo uma vez por RANKINGS_CACHE_TTL segundos
+ranking_cache = TTLCache(maxsize=len(KINDS), ttl=settings.RANKINGS_CACHE_TTL)
+
+
+def utcnow():
+    # mesmo referencial do server_default func.now() das colunas
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def ranking_scores(kind: str, now: datetime):
+    """consulta (book_id, score) do ranking, sem ordem nem limite"""
+    if kind == 'popular':
+        return select(
+            Book.id.label('book_id'), Book.collector_count.label('score')
+        ).where(Book.collector_count > 0)
+
+    cutoff = now - timedelta(days=settings.RANKINGS_TRENDING_DAYS)
+    added = user_collection_table.c
+    return (
+        select(added.book_id, func.count().label('score'))
+        .where(added.added_at >= cutoff)
+        .group_by(added.book_id)
+    )
+
+
+def refresh_statement(kind: str, now: datetime):
+    """INSERT ... SELECT com as RANKINGS_SIZE primeiras posicoes"""
+    scores = ranking_scores(kind, now).subquery()
+    position = func.row_number().over(
+        order_by=(scores.c.score.desc(), scores.c.book_id)
+    )
+    ranked = (
+        select(
+            literal(kind),
+            position,
+            scores.c.book_id,
+            scores.c.score,
+            literal(now),
+        )
+        .order_by(scores.c.score.desc(), scores.c.book_id)
+        .limit(settings.RANKINGS_SIZE)
+    )
+
+    return insert(book_rankings_table).from_select(
+        ['kind', 'position', 'book_id', 'score', 'refreshed_at'], ranked
+    )
+
+
+def refresh_rankings(session: Session, now: datetime | None = None):
+    """
+    recalcula todos os rankings; retorna quantas posicoes cada um tem
+    """
+    now = now or utcnow()
+    sizes = {}
+
+    for kind in KINDS:
+        session.execute(
+            delete(book_rankings_table).where(
+                book_rankings_table.c.kind == kind
+            )
+        )
+        # sem preserve_rowcount o psycopg devolve -1 no INSERT ... SELECT
+        sizes[kind] = session.execute(
+            refresh_statement(kind, now),
+            execution_options={'preserve_rowcount': True},
+        ).rowcount
+
+    session.commit()
+    return sizes
+
+
+def main():
+    engine = create_engine(settings.DATABASE_URL)
+    with Session(engine) as session:
+        print(json.dumps(refresh_rankings(session)))
+
+
+if __name__ == '__main__':
+    main()
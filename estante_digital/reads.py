@@ -0,0 +1,96 @@
+"""
+consultas das rotas GET
+
+selecionam so as colunas que os schemas de resposta usam e devolvem
+linhas (Row), sem instanciar objetos do ORM: nada de identity map,
+estado de instancia nem instrumentacao dos relacionamentos. o autor do
+livro vem num Bundle, entao row.author.id e row.author.name funcionam
+como no objeto e a serializacao (estante_digital.serialization) aceita
+as duas formas
+
+book_json e author_json montam os mesmos itens no postgres, para as
+listas em JSON do banco (estante_digital.json_lists)
+
+comparacao com os objetos do ORM: python -m benchmarks.reads
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Bundle
+
+from estante_digital.models import Author, Book, User, user_collection_table
+
+# colunas da versao (ETag e Last-Modified, estante_digital.etags)
+BOOK_VERSION = (Book.version, Book.updated_at, Book.created_at)
+AUTHOR_VERSION = (Author.version, Author.updated_at, Author.created_at)
+
+
+def select_books(*extra):
+    """colunas de BookPublic, com o autor (id, name) pelo join"""
+    return select(
+        Book.id,
+        Book.title,
+        Book.year,
+        Book.collector_count,
+        Bundle('author', Author.id, Author.name),
+        *extra,
+    ).join(Author, Author.id == Book.author_id)
+
+
+def book_json():
+    """item de BookPublic como json do postgres, na ordem do schema"""
+    return func.json_build_object(
+        'id',
+        Book.id,
+        'title',
+        Book.title,
+        'year',
+        Book.year,
+        'collector_count',
+        Book.collector_count,
+        'author',
+        func.json_build_object('id', Author.id, 'name', Author.name),
+    )
+
+
+def select_book(book_id: int):
+    return select_books(*BOOK_VERSION).where(Book.id == book_id)
+
+
+def select_collection(user_id: int, *extra):
+    collection = user_collection_table.c
+    return (
+        select_books(*extra)
+        .join(user_collection_table, collection.book_id == Book.id)
+        .where(collection.user_id == user_id)
+    )
+
+
+def select_authors():
+    """colunas de AuthorSummary"""
+    return select(Author.id, Author.name, Author.book_count)
+
+
+def author_json():
+    """item de AuthorSummary como json do postgres"""
+    return func.json_build_object(
+        'id', Author.id, 'name', Author.name, 'book_count', Author.book_count
+    )
+
+
+def select_author(author_id: int):
+    return select(
+        Author.id, Author.name, Author.book_count, *AUTHOR_VERSION
+    ).where(Author.id == author_id)
+
+
+def select_author_books(author_id: int):
+    """colunas de BookPublicWithoutAuthor"""
+    return (
+        select(Book.id, Book.title, Book.year)
+        .where(Book.author_id == author_id)
+        .order_by(Book.id)
+    )
+
+
+def select_user(user_id: int):
+    return select(User.id, User.username, User.email).where(User.id == user_id)
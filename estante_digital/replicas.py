@@ -0,0 +1,134 @@
+from itertools import count
+from threading import Lock
+from time import monotonic, time
+
+from fastapi import Depends, Request, Response
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from estante_digital.database import (
+    build_engine,
+    get_session,
+    session_for,
+    settings,
+)
+from estante_digital.metrics import instrument_engine
+from estante_digital.schemas import Principal
+from estante_digital.security import get_current_principal
+
+
+class ReplicaSet:
+    """
+    distribui as leituras entre as replicas em round-robin
+    uma replica que falha ao conectar fica fora por retry_after segundos
+    """
+
+    def __init__(self, engines: list, retry_after: float):
+        self.engines = engines
+        self.retry_after = retry_after
+        self._counter = count()
+        self._down_until = {}
+        self._lock = Lock()
+
+    def candidates(self):
+        """replicas saudaveis, comecando pela proxima da vez"""
+        if not self.engines:
+            return []
+
+        with self._lock:
+            start = next(self._counter) % len(self.engines)
+            now = monotonic()
+            ordered = self.engines[start:] + self.engines[:start]
+            return [
+                engine
+                for engine in ordered
+                if self._down_until.get(engine, 0) <= now
+            ]
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down_until[engine] = monotonic() + self.retry_after
+
+
+def _build_replica_set():
+    engines = []
+    for index, url in enumerate(settings.DATABASE_REPLICA_URLS):
+        engine = build_engine(url)
+        instrument_engine(f'replica-{index}', engine)
+        engines.append(engine)
+
+    return ReplicaSet(engines, settings.DATABASE_REPLICA_RETRY_SECONDS)
+
+
+replica_set = _build_replica_set()
+
+# clientes que escreveram ha pouco leem do primario (read-your-writes);
+# o prazo vai num cookie para valer em qualquer worker
+PRIMARY_PIN_COOKIE = 'primary_until'
+
+
+def pin_to_primary(response: Response):
+    """marca a resposta de uma escrita com o cookie do pin"""
+    seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+    if seconds <= 0:
+        return
+
+    response.set_cookie(
+        PRIMARY_PIN_COOKIE,
+        str(int(time()) + seconds),
+        max_age=seconds,
+        httponly=True,
+        samesite='lax',
+    )
+
+
+def is_pinned(request: Request):
+    """
+    o cliente escreveu nos ultimos DATABASE_REPLICA_PIN_SECONDS segundos
+    um prazo alem disso (cookie forjado) e ignorado
+    """
+    try:
+        until = int(request.cookies.get(PRIMARY_PIN_COOKIE, 0))
+    except ValueError:
+        return False
+
+    now = time()
+    return now < until <= now + settings.DATABASE_REPLICA_PIN_SECONDS
+
+
+async def _connect_to_replica():
+    for engine in replica_set.candidates():
+        session = session_for(engine)
+        try:
+            await session.connection()
+        except (exc.DBAPIError, exc.TimeoutError):
+            await session.close()
+            replica_set.mark_down(engine)
+            continue
+
+        return session
+
+    return None
+
+
+async def get_read_session(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    principal: Principal = Depends(get_current_principal),
+):
+    """
+    sessao somente leitura para as rotas GET
+    usa uma replica saudavel, ou o primario quando nao ha replicas,
+    todas estao fora ou o cliente escreveu nos ultimos segundos
+    """
+    if not is_pinned(request):
+        replica = await _connect_to_replica()
+        if replica is not None:
+            # o cache de respostas so guarda o que veio de uma replica
+            # quando nao houve escrita recente nas mesmas tags
+            request.state.read_from_replica = True
+            async with replica:
+                yield replica
+            return
+
+    yield session
@@ -0,0 +1,436 @@
+"""
+cache das respostas do catalogo (listas e detalhes de livros e autores)
+
+guarda o corpo ja serializado e os headers, pela rota e pelos query
+params normalizados; cada entrada tem etiquetas (tags) e as rotas de
+escrita invalidam as etiquetas que afetam:
+- 'books': listas e detalhes de livros
+- 'book:<id>': detalhe de um livro (muda com a colecao dos usuarios)
+- 'book_lists': listas de livros, que tambem mudam com a colecao dos
+  usuarios (collector_count e sort=collectors)
+- 'authors': listas e detalhes de autores
+
+o corpo comprimido (estante_digital.compression) fica numa entrada
+propria por encoding e pelo digest do corpo, com as mesmas tags, e
+listas quentes nao sao comprimidas a cada requisicao; como a chave muda
+com o corpo, uma variante que sobreviva a invalidacao (outro worker,
+corrida com uma leitura antiga) nunca e servida para o corpo novo
+
+backends (RESPONSE_CACHE_BACKEND):
+- memory: LRU por processo, limitado pelo tamanho em bytes; cada worker
+  invalida so o proprio cache, o TTL limita o atraso dos outros
+- redis: compartilhado entre os workers, qualquer servidor que fale o
+  protocolo do Redis (RESP) em RESPONSE_CACHE_URL
+- none: desligado
+
+leituras das replicas (estante_digital.replicas) e read-your-writes:
+- o cliente com o pin de uma escrita recente nao consulta o cache, le
+  do primario; assim ele ve a propria escrita em qualquer worker, mesmo
+  nos que ainda guardam a entrada antiga (backend memory)
+- a invalidacao segura as tags por DATABASE_REPLICA_PIN_SECONDS: nesse
+  prazo uma resposta montada numa replica com essas tags nao e guardada,
+  porque a replica atrasada ainda pode nao ter a escrita
+"""
+
+import hashlib
+import json
+import socket
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlencode, urlparse
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from estante_digital.compression import compress_async, negotiate
+from estante_digital.database import settings
+from estante_digital.etags import etag_matches, not_modified
+from estante_digital.replicas import is_pinned
+from estante_digital.serialization import dump_json
+
+
+def cache_key(request: Request):
+    """rota e query params em ordem, para urls equivalentes coincidirem"""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f'{request.method} {request.url.path}?{query}'
+
+
+def body_digest(body: bytes):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def encode_entry(body: bytes, headers: dict, tags: list, digest: str):
+    meta = json.dumps({'headers': headers, 'tags': tags, 'digest': digest})
+    return meta.encode() + b'\n' + body
+
+
+def decode_entry(entry: bytes):
+    meta, body = entry.split(b'\n', 1)
+    meta = json.loads(meta)
+    return body, meta['headers'], meta['tags'], meta['digest']
+
+
+class MemoryBackend:
+    """LRU limitado pela soma dos tamanhos das entradas (max_bytes)"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()  # chave -> (expira em, valor, tags)
+        self._tags = {}  # tag -> chaves
+        self._holds = {}  # tag -> seguras ate
+        self._lock = Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value, _ = entry
+            if expires_at <= monotonic():
+                self._remove(key)
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float, tags: list):
+        if len(value) > self.max_bytes or ttl <= 0:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (monotonic() + ttl, value, tags)
+            self.size += len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, tags: list, hold: float = 0):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, set()):
+                    self._remove(key)
+                if hold > 0:
+                    self._holds[tag] = monotonic() + hold
+
+    def held(self, tags: list):
+        """alguma das tags foi invalidada ha menos de hold segundos"""
+        with self._lock:
+            now = monotonic()
+            self._holds = {
+                tag: until for tag, until in self._holds.items() if until > now
+            }
+            return any(tag in self._holds for tag in tags)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._holds.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+
+        _, value, tags = entry
+        self.size -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RespError(Exception):
+    pass
+
+
+class RedisBackend:
+    """
+    cliente minimo do protocolo do Redis (RESP), sem dependencias
+    uma conexao por processo, usada com uma trava; as tags sao sets com
+    as chaves que as usam
+    """
+
+    def __init__(self, url: str, prefix: str = 'estante:', timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+        self._lock = Lock()
+
+    def get(self, key: str):
+        return self._call('GET', self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float, tags: list):
+        if ttl <= 0:
+            return
+
+        key = self.prefix + key
+        self._call('SET', key, value, 'PX', int(ttl * 1000))
+        for tag in tags:
+            tag_key = f'{self.prefix}tag:{tag}'
+            self._call('SADD', tag_key, key)
+            # o set da tag vive pelo menos tanto quanto as entradas
+            self._call('PEXPIRE', tag_key, int(ttl * 1000))
+
+    def invalidate(self, tags: list, hold: float = 0):
+        for tag in tags:
+            tag_key = f'{self.prefix}tag:{tag}'
+            keys = self._call('SMEMBERS', tag_key) or []
+            self._call('DEL', tag_key, *keys)
+            if hold > 0:
+                hold_key = f'{self.prefix}hold:{tag}'
+                self._call('SET', hold_key, 1, 'PX', int(hold * 1000))
+
+    def held(self, tags: list):
+        if not tags:
+            return False
+        keys = [f'{self.prefix}hold:{tag}' for tag in tags]
+        return self._call('EXISTS', *keys) > 0
+
+    def clear(self):
+        keys = self._call('KEYS', f'{self.prefix}*') or []
+        if keys:
+            self._call('DEL', *keys)
+
+    def stats(self):
+        return {'url': f'redis://{self.host}:{self.port}/{self.db}'}
+
+    def _call(self, *args):
+        with self._lock:
+            try:
+                return self._execute(args)
+            except (OSError, RespError):
+                self._close()
+                raise
+
+    def _execute(self, args):
+        if self._socket is None:
+            self._connect()
+
+        self._send(args)
+        return self._read()
+
+    def _connect(self):
+        self._socket = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout
+        )
+        self._file = self._socket.makefile('rb')
+        if self.password:
+            self._send(('AUTH', self.password))
+            self._read()
+        if self.db:
+            self._send(('SELECT', self.db))
+            self._read()
+
+    def _close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+        self._socket = self._file = None
+
+    def _send(self, args):
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f'${len(data)}\r\n'.encode() + data + b'\r\n')
+        self._socket.sendall(b''.join(parts))
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise RespError('connection closed')
+
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RespError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+
+        raise RespError(f'unexpected reply {line!r}')
+
+
+class ResponseCache:
+    """
+    fachada usada pelas rotas: hits, misses e erros do backend
+    um backend fora do ar vira miss (e a invalidacao e ignorada); o TTL
+    limita o que fica velho
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def _run(self, method: str, *args):
+        """chama o backend fora do event loop (o redis bloqueia)"""
+        if self.backend is None:
+            return None
+        try:
+            method = getattr(self.backend, method)
+            return await run_in_threadpool(method, *args)
+        except (OSError, RespError):
+            self.errors += 1
+            return None
+
+    async def get(self, request: Request):
+        """resposta guardada para a requisicao, ou None"""
+        if self.backend is None:
+            return None
+        # escreveu ha pouco: le do primario, nao de uma entrada que outro
+        # worker ou uma replica atrasada possa ter guardado
+        if is_pinned(request):
+            return None
+
+        key = cache_key(request)
+        entry = await self._run('get', key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        body, headers, tags, digest = decode_entry(entry)
+        if 'ETag' in headers and etag_matches(request, headers['ETag']):
+            return not_modified(headers)
+
+        return await self._respond(request, key, body, headers, tags, digest)
+
+    async def store(  # noqa: PLR0913, PLR0917
+        self, request: Request, model, content, tags: list, headers=None
+    ):
+        """serializa content com o schema de resposta, guarda e responde"""
+        return await self.store_body(
+            request, dump_json(model, content), tags, headers
+        )
+
+    async def store_body(
+        self, request: Request, body: bytes, tags: list, headers=None
+    ):
+        """guarda e responde um corpo JSON ja serializado"""
+        key = cache_key(request)
+        headers = dict(headers or {})
+        digest = body_digest(body)
+
+        cacheable = not await self._from_lagging_replica(request, tags)
+        if cacheable:
+            entry = encode_entry(body, headers, tags, digest)
+            await self._run('set', key, entry, self.ttl, tags)
+
+        return await self._respond(
+            request, key, body, headers, tags, digest, cacheable=cacheable
+        )
+
+    async def _from_lagging_replica(self, request: Request, tags: list):
+        """
+        a resposta veio de uma replica e alguma das tags foi invalidada
+        ha pouco; com o backend fora do ar, na duvida, tambem
+        """
+        if not getattr(request.state, 'read_from_replica', False):
+            return False
+        return await self._run('held', tags) is not False
+
+    async def _respond(  # noqa: PLR0913, PLR0917
+        self,
+        request: Request,
+        key: str,
+        body: bytes,
+        headers: dict,
+        tags,
+        digest: str,
+        *,
+        cacheable: bool = True,
+    ):
+        """resposta com o corpo comprimido, se o cliente aceitar"""
+        encoding = negotiate(request.headers.get('accept-encoding'))
+        if encoding is None or len(body) < settings.COMPRESSION_MINIMUM_SIZE:
+            return Response(
+                body, media_type='application/json', headers=headers
+            )
+
+        # a variante e do corpo, nao so da chave: nunca fica velha
+        variant = f'{key}|{encoding}|{digest}'
+        compressed = await self._run('get', variant) if cacheable else None
+        if compressed is None:
+            compressed = await compress_async(body, encoding)
+            if cacheable:
+                await self._run('set', variant, compressed, self.ttl, tags)
+
+        headers = {
+            **headers,
+            'Content-Encoding': encoding,
+            'Vary': 'Accept-Encoding',
+        }
+        return Response(
+            compressed, media_type='application/json', headers=headers
+        )
+
+    async def invalidate(self, *tags: str):
+        await self._run(
+            'invalidate', list(tags), settings.DATABASE_REPLICA_PIN_SECONDS
+        )
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits = self.misses = self.errors = 0
+
+    def stats(self):
+        requests = self.hits + self.misses
+        backend = self.backend.stats() if self.backend is not None else {}
+        return {
+            'backend': settings.RESPONSE_CACHE_BACKEND,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+            'ttl': self.ttl,
+            **backend,
+        }
+
+
+def _build_backend():
+    if settings.RESPONSE_CACHE_BACKEND == 'memory':
+        return MemoryBackend(settings.RESPONSE_CACHE_MAX_BYTES)
+    if settings.RESPONSE_CACHE_BACKEND == 'redis':
+        return RedisBackend(settings.RESPONSE_CACHE_URL)
+    return None
+
+
+response_cache = ResponseCache(_build_backend(), settings.RESPONSE_CACHE_TTL)
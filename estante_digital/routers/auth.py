@@ -4,7 +4,7 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from estante_digital.database import get_session
 from estante_digital.models import User
@@ -12,25 +12,27 @@ from estante_digital.schemas import Token
 from estante_digital.security import (
     create_access_token,
     get_current_user,
-    verify_password,
+    user_claims,
+    verify_password_async,
 )
 
 OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
-Session_ = Annotated[Session, Depends(get_session)]
+Session_ = Annotated[AsyncSession, Depends(get_session)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 router = APIRouter()
 
 
 @router.post('/token', response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2Form,
     session: Session_,
 ):
-    user = session.scalar(
+    user = await session.scalar(
         select(User).where(
             (User.username == form_data.username)
-            | (User.email == form_data.username)
+            | (User.email == form_data.username),
+            User.deleted_at.is_(None),
         )
     )
 
@@ -40,19 +42,25 @@ def login_for_access_token(
             detail='Incorrect email or password',
         )
 
-    if not verify_password(form_data.password, user.password):
+    claims, hashed_password = user_claims(user), user.password
+
+    # encerra a transacao de leitura para nao segurar a conexao do pool
+    # enquanto o bcrypt roda
+    await session.commit()
+
+    if not await verify_password_async(form_data.password, hashed_password):
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail='Incorrect email or password',
         )
 
-    access_token = create_access_token(data={'sub': user.email})
+    access_token = create_access_token(data=claims)
 
     return {'access_token': access_token, 'token_type': 'bearer'}
 
 
 @router.post('/refresh_token', response_model=Token)
-def refresh_access_token(user: CurrentUser):
-    new_access_token = create_access_token(data={'sub': user.email})
+async def refresh_access_token(user: CurrentUser):
+    new_access_token = create_access_token(data=user_claims(user))
 
     return {'access_token': new_access_token, 'token_type': 'bearer'}
@@ -1,24 +1,66 @@
 from http import HTTPStatus
-from typing import Annotated
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-
-from estante_digital.database import get_session
+from typing import Annotated, Literal
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from estante_digital.database import get_session, unique_violation
+from estante_digital.etags import (
+    entity_headers,
+    etag_matches,
+    not_modified,
+    version_columns,
+)
+from estante_digital.json_lists import json_lists_enabled, json_page, page_body
 from estante_digital.models import Author, User
-from estante_digital.schemas import AuthorList, AuthorPublic, AuthorSchema
-from estante_digital.security import get_current_user
+from estante_digital.pagination import paginate
+from estante_digital.reads import (
+    author_json,
+    select_author,
+    select_author_books,
+    select_authors,
+)
+from estante_digital.replicas import get_read_session, pin_to_primary
+from estante_digital.response_cache import response_cache
+from estante_digital.schemas import (
+    AuthorList,
+    AuthorPublic,
+    AuthorSchema,
+    Principal,
+)
+from estante_digital.search import apply_search
+from estante_digital.security import get_current_principal, get_current_user
 
 router = APIRouter()
 
-Session_ = Annotated[Session, Depends(get_session)]
+Session_ = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+SORT_COLUMNS = {
+    'id': [Author.id],
+    'name': [Author.name, Author.id],
+    'books': [Author.book_count, Author.id],
+}
 
 
 @router.post('/', status_code=HTTPStatus.CREATED, response_model=AuthorPublic)
-def create_author(
-    author: AuthorSchema, session: Session_, current_user: CurrentUser
+async def create_author(
+    author: AuthorSchema,
+    session: Session_,
+    current_user: CurrentUser,
+    response: Response,
 ):
     """
     cria um autor
@@ -26,59 +68,139 @@ def create_author(
     o usuario deve estar logado
     schema de retorno: id, name, books
     """
-    db_author = session.scalar(
-        select(Author).where(Author.name == author.name)
-    )
-    if db_author:
-        raise HTTPException(
-            status_code=HTTPStatus.BAD_REQUEST,
-            detail='Author already exists',
+    user_id = current_user.id
+    try:
+        author_id = await session.scalar(
+            insert(Author)
+            .values(name=author.name, created_by_id=user_id)
+            .returning(Author.id)
         )
-
-    db_author = Author(name=author.name)
-    db_author.created_by = current_user
-
-    session.add(db_author)
-    session.commit()
-
-    return db_author
+        await session.commit()
+    except IntegrityError as error:
+        await session.rollback()
+        if unique_violation(error, Author.__table__) == 'name':
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail='Author already exists',
+            )
+        raise
+
+    pin_to_primary(response)
+    await response_cache.invalidate('authors')
+
+    return {
+        'id': author_id,
+        'name': author.name,
+        'book_count': 0,
+        'books': [],
+    }
 
 
 @router.get('/', status_code=HTTPStatus.OK, response_model=AuthorList)
-def get_authors(
-    session: Session_,
-    current_user: CurrentUser,
+async def get_authors(  # noqa
+    request: Request,
+    session: ReadSession,
+    principal: CurrentPrincipal,
+    q: str = Query(None),
     name: str = Query(None),
-    offset: int = Query(None),
-    limit: int = Query(None),
+    sort: Literal['id', 'name', 'books'] = Query('id'),
+    cursor: str = Query(None),
+    limit: int = Query(None, ge=1),
+    offset: int = Query(None, ge=0, deprecated=True),
 ):
     """
     retorna uma lista de autores
     recebe query parameters '/author?name=xxxx'
-    paginado
+    busca textual com '/author?q=xxxx', ordenada por relevancia
+    paginado por cursor: ordena por id, (name, id) ou pelos que tem mais
+    livros (books) com sort e a proxima pagina vem de
+    '/author?cursor=<next_cursor>'
+    com DATABASE_JSON_LISTS no postgres a lista vem em JSON do banco
+    a resposta serializada fica no cache (estante_digital.response_cache)
     o usuario deve estar logado
     schema de retorno: id, name
     """
-    query = select(Author)
+    cached = await response_cache.get(request)
+    if cached is not None:
+        return cached
+
+    query = select_authors()
+
+    if q:
+        query = apply_search(query, Author.name, q, session.bind.dialect.name)
 
     if name:
         query = query.filter(Author.name.contains(name))
 
-    authors = session.scalars(query.offset(offset).limit(limit)).all()
+    if json_lists_enabled(session):
+        items, next_cursor = await json_page(
+            session,
+            query,
+            author_json(),
+            SORT_COLUMNS[sort],
+            cursor,
+            limit,
+            offset,
+            ordered=bool(q),
+            descending=sort == 'books',
+        )
+        return await response_cache.store_body(
+            request,
+            page_body('authors', items, next_cursor),
+            tags=['authors'],
+        )
 
-    return {'authors': authors}
+    authors, next_cursor = await paginate(
+        session,
+        query,
+        SORT_COLUMNS[sort],
+        cursor,
+        limit,
+        offset,
+        ordered=bool(q),
+        descending=sort == 'books',
+    )
+
+    return await response_cache.store(
+        request,
+        AuthorList,
+        {'authors': authors, 'next_cursor': next_cursor},
+        tags=['authors'],
+    )
 
 
 @router.get(
     '/{author_id}', status_code=HTTPStatus.OK, response_model=AuthorPublic
 )
-def get_author(author_id: int, session: Session_, current_user: CurrentUser):
+async def get_author(
+    author_id: int,
+    request: Request,
+    session: ReadSession,
+    principal: CurrentPrincipal,
+):
     """
     retorna os dados de um autor
+    com If-None-Match igual ao ETag responde 304, sem carregar os livros
+    a resposta serializada fica no cache (estante_digital.response_cache)
     o usuario deve estar logado
     schema de retorno: id, name, books
     """
-    author = session.scalar(select(Author).where(Author.id == author_id))
+    cached = await response_cache.get(request)
+    if cached is not None:
+        return cached
+
+    if request.headers.get('if-none-match'):
+        version = (
+            await session.execute(
+                select(*version_columns(Author)).where(Author.id == author_id)
+            )
+        ).first()
+        if version is not None:
+            etag, headers = entity_headers('author', version)
+            if etag_matches(request, etag):
+                return not_modified(headers)
+
+    author = (await session.execute(select_author(author_id))).first()
 
     if not author:
         raise HTTPException(
@@ -86,4 +208,12 @@ def get_author(author_id: int, session: Session_, current_user: CurrentUser):
             detail='Author not found',
         )
 
-    return author
+    books = (await session.execute(select_author_books(author_id))).all()
+
+    return await response_cache.store(
+        request,
+        AuthorPublic,
+        {**author._asdict(), 'books': books},
+        tags=['authors'],
+        headers=entity_headers('author', author)[1],
+    )
@@ -1,24 +1,66 @@
 from http import HTTPStatus
-from typing import Annotated
+from io import TextIOWrapper
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from estante_digital.database import get_session
+from estante_digital.database import get_session, settings, unique_violation
+from estante_digital.etags import (
+    entity_headers,
+    etag_matches,
+    not_modified,
+    version_columns,
+)
+from estante_digital.importer import Importer, read_records
+from estante_digital.json_lists import json_lists_enabled, json_page, page_body
 from estante_digital.models import Author, Book, User
-from estante_digital.schemas import BookList, BookPublic, BookSchema
-from estante_digital.security import get_current_user
+from estante_digital.pagination import paginate
+from estante_digital.reads import book_json, select_book, select_books
+from estante_digital.replicas import get_read_session, pin_to_primary
+from estante_digital.response_cache import response_cache
+from estante_digital.schemas import (
+    BookList,
+    BookPublic,
+    BookSchema,
+    ImportResult,
+    Principal,
+)
+from estante_digital.search import apply_search
+from estante_digital.security import get_current_principal, get_current_user
 
 router = APIRouter()
 
-Session_ = Annotated[Session, Depends(get_session)]
+Session_ = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+SORT_COLUMNS = {
+    'id': [Book.id],
+    'year': [Book.year, Book.id],
+    'collectors': [Book.collector_count, Book.id],
+}
 
 
 @router.post('/', status_code=HTTPStatus.CREATED, response_model=BookPublic)
-def create_book(
-    book: BookSchema, session: Session_, current_user: CurrentUser
+async def create_book(
+    book: BookSchema,
+    session: Session_,
+    current_user: CurrentUser,
+    response: Response,
 ):
     """
     cria um livro
@@ -26,50 +68,132 @@ def create_book(
     o usuario deve estar logado
     schema de retorno: id, title, {author.id, author.name}
     """
-    db_book = session.scalar(select(Book).where(Book.title == book.title))
-    if db_book:
-        raise HTTPException(
-            status_code=HTTPStatus.BAD_REQUEST, detail='Book already exists'
-        )
-
-    db_author = session.scalar(
-        select(Author).where(Author.id == book.author_id)
+    user_id = current_user.id
+    author_name = await session.scalar(
+        select(Author.name).where(Author.id == book.author_id)
     )
-    if not db_author:
+    if author_name is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Author not found'
         )
 
-    db_book = Book(title=book.title, year=book.year)
-    db_book.created_by = current_user
-    db_book.author = db_author
+    try:
+        book_id = await session.scalar(
+            insert(Book)
+            .values(
+                title=book.title,
+                year=book.year,
+                author_id=book.author_id,
+                created_by_id=user_id,
+            )
+            .returning(Book.id)
+        )
+        await session.commit()
+    except IntegrityError as error:
+        await session.rollback()
+        if unique_violation(error, Book.__table__) == 'title':
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail='Book already exists',
+            )
+        raise
 
-    session.add(db_book)
-    session.commit()
-    session.refresh(db_book)
+    pin_to_primary(response)
+    # o book_count das listas e dos detalhes de autores tambem muda
+    await response_cache.invalidate('books', 'authors')
 
-    return db_book
+    return {
+        'id': book_id,
+        'title': book.title,
+        'year': book.year,
+        'collector_count': 0,
+        'author': {'id': book.author_id, 'name': author_name},
+    }
 
 
-@router.get('/', status_code=HTTPStatus.OK, response_model=BookList)
-def get_books(  # noqa
+@router.post('/import', status_code=HTTPStatus.OK, response_model=ImportResult)
+async def import_books(
+    file: UploadFile,
     session: Session_,
     current_user: CurrentUser,
+    response: Response,
+    format: Literal['csv', 'jsonl'] = Query(None),
+):
+    """
+    importa autores e livros de um arquivo CSV ou JSONL
+    (colunas title, year, author), em lotes de IMPORT_CHUNK_SIZE
+    registros invalidos ou repetidos sao ignorados e listados em rejected
+    para cargas muito grandes use 'python -m estante_digital.importer'
+    o usuario deve estar logado
+    """
+    user_id = current_user.id
+    if format is None:
+        is_csv = (file.filename or '').endswith('.csv')
+        format = 'csv' if is_csv else 'jsonl'
+
+    rejected = []
+
+    def on_error(number, record, message):
+        if len(rejected) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            rejected.append({'line': number, 'error': message})
+
+    lines = TextIOWrapper(file.file, encoding='utf-8', newline='')
+    records = read_records(lines, format)
+    importer = Importer(
+        session.sync_session,
+        user_id,
+        chunk_size=settings.IMPORT_CHUNK_SIZE,
+        on_error=on_error,
+    )
+
+    # a leitura e o parse do arquivo rodam no threadpool; a sessao so
+    # faz as gravacoes de cada lote
+    while (
+        prepared := await run_in_threadpool(importer.next_chunk, records)
+    ) is not None:
+        await session.run_sync(lambda _: importer.write_chunk(prepared))
+    summary = importer.summary
+    pin_to_primary(response)
+    await response_cache.invalidate('books', 'authors')
+
+    return {**summary.as_dict(), 'rejected': rejected}
+
+
+@router.get('/', status_code=HTTPStatus.OK, response_model=BookList)
+async def get_books(  # noqa
+    request: Request,
+    session: ReadSession,
+    principal: CurrentPrincipal,
     # author_name: str = Query(None),
     author_id: int = Query(None),
+    q: str = Query(None),
     title: str = Query(None),
     year: int = Query(None),
-    offset: int = Query(None),
-    limit: int = Query(None),
+    sort: Literal['id', 'year', 'collectors'] = Query('id'),
+    cursor: str = Query(None),
+    limit: int = Query(None, ge=1),
+    offset: int = Query(None, ge=0, deprecated=True),
 ):
     """
     retorna uma lista de livros
     recebe query parameters '/book?name=xxxx&year=xxxx'
-    paginado
+    busca textual com '/book?q=xxxx', ordenada por relevancia
+    paginado por cursor: ordena por id, (year, id) ou pelos mais
+    colecionados (collectors) com sort e a proxima pagina vem de
+    '/book?cursor=<next_cursor>'
+    com DATABASE_JSON_LISTS no postgres a lista vem em JSON do banco
+    a resposta serializada fica no cache (estante_digital.response_cache)
     o usuario deve estar logado
     schema de retorno: id, name, {author.id, author.name}
     """
-    query = select(Book)
+    cached = await response_cache.get(request)
+    if cached is not None:
+        return cached
+
+    query = select_books()
+
+    if q:
+        query = apply_search(query, Book.title, q, session.bind.dialect.name)
 
     if title:
         query = query.filter(Book.title.contains(title))
@@ -80,22 +204,82 @@ def get_books(  # noqa
     if author_id:
         query = query.filter(Book.author_id == author_id)
 
-    books = session.scalars(query.offset(offset).limit(limit)).all()
+    if json_lists_enabled(session):
+        items, next_cursor = await json_page(
+            session,
+            query,
+            book_json(),
+            SORT_COLUMNS[sort],
+            cursor,
+            limit,
+            offset,
+            ordered=bool(q),
+            descending=sort == 'collectors',
+        )
+        return await response_cache.store_body(
+            request,
+            page_body('books', items, next_cursor),
+            tags=['books', 'book_lists'],
+        )
+
+    books, next_cursor = await paginate(
+        session,
+        query,
+        SORT_COLUMNS[sort],
+        cursor,
+        limit,
+        offset,
+        ordered=bool(q),
+        descending=sort == 'collectors',
+    )
 
-    return {'books': books}
+    return await response_cache.store(
+        request,
+        BookList,
+        {'books': books, 'next_cursor': next_cursor},
+        tags=['books', 'book_lists'],
+    )
 
 
 @router.get('/{book_id}', status_code=HTTPStatus.OK, response_model=BookPublic)
-def get_book(book_id: int, session: Session_, current_user: CurrentUser):
+async def get_book(
+    book_id: int,
+    request: Request,
+    session: ReadSession,
+    principal: CurrentPrincipal,
+):
     """
     retorna os dados de um livro
+    com If-None-Match igual ao ETag responde 304, lendo so a versao
+    a resposta serializada fica no cache (estante_digital.response_cache)
     o usuario deve estar logado
     schema de retorno: id, name, {author.id, author.name}
     """
-    book = session.scalar(select(Book).where(Book.id == book_id))
+    cached = await response_cache.get(request)
+    if cached is not None:
+        return cached
+
+    if request.headers.get('if-none-match'):
+        version = (
+            await session.execute(
+                select(*version_columns(Book)).where(Book.id == book_id)
+            )
+        ).first()
+        if version is not None:
+            etag, headers = entity_headers('book', version)
+            if etag_matches(request, etag):
+                return not_modified(headers)
+
+    book = (await session.execute(select_book(book_id))).first()
     if not book:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Book not found'
         )
 
-    return book
+    return await response_cache.store(
+        request,
+        BookPublic,
+        book,
+        tags=['books', f'book:{book_id}'],
+        headers=entity_headers('book', book)[1],
+    )
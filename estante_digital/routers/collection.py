@@ -1,31 +1,130 @@
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from estante_digital.database import get_session
-from estante_digital.models import Book, User
-from estante_digital.schemas import Message, UserCollection
-from estante_digital.security import get_current_user
+from estante_digital.database import get_session, insert_ignoring_conflicts
+from estante_digital.etags import (
+    cache_headers,
+    collection_version_columns,
+    etag_matches,
+    make_etag,
+    not_modified,
+    page_digest,
+    page_updated_at,
+    query_digest,
+)
+from estante_digital.models import Book, User, user_collection_table
+from estante_digital.pagination import paginate
+from estante_digital.reads import BOOK_VERSION, select_collection
+from estante_digital.replicas import get_read_session, pin_to_primary
+from estante_digital.response_cache import response_cache
+from estante_digital.schemas import (
+    CollectionBatch,
+    CollectionBatchResult,
+    Message,
+    Principal,
+    UserCollection,
+)
+from estante_digital.search import apply_search
+from estante_digital.security import get_current_principal, get_current_user
+from estante_digital.serialization import json_response
 
 router = APIRouter()
 
-Session_ = Annotated[Session, Depends(get_session)]
+Session_ = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+SORT_COLUMNS = {
+    'id': [Book.id],
+    'year': [Book.year, Book.id],
+    'title': [Book.title, Book.id],
+}
 
 
 @router.get('/', status_code=HTTPStatus.OK, response_model=UserCollection)
-def get_my_collection(current_user: CurrentUser):
+async def get_my_collection(  # noqa
+    request: Request,
+    session: ReadSession,
+    principal: CurrentPrincipal,
+    author_id: int = Query(None),
+    q: str = Query(None),
+    title: str = Query(None),
+    year: int = Query(None),
+    sort: Literal['id', 'year', 'title'] = Query('id'),
+    cursor: str = Query(None),
+    limit: int = Query(None, ge=1),
+):
     """
-    retorna todos os livros da colecao do usuario
+    retorna os livros da colecao do usuario
+    mesmos filtros de '/book' (author_id, q, title, year)
+    paginado por cursor, ordenado por id, (year, id) ou (title, id)
+    o ETag acompanha a versao da colecao (livros adicionados e
+    removidos), os ids e versoes dos livros da pagina e os query params;
+    com If-None-Match igual responde 304 sem serializar a pagina
     o usuario deve estar logado
     schema de retorno: id, name, {author.id, author.name}
     """
-    books = current_user.collection
+    version = (
+        await session.execute(
+            select(*collection_version_columns()).where(
+                User.id == principal.id
+            )
+        )
+    ).first()
+
+    query = select_collection(principal.id, *BOOK_VERSION)
+
+    if q:
+        query = apply_search(query, Book.title, q, session.bind.dialect.name)
+
+    if title:
+        query = query.filter(Book.title.contains(title))
+
+    if year:
+        query = query.filter(Book.year == year)
 
-    return {'collection': books}
+    if author_id:
+        query = query.filter(Book.author_id == author_id)
+
+    books, next_cursor = await paginate(
+        session, query, SORT_COLUMNS[sort], cursor, limit, ordered=bool(q)
+    )
+
+    # o validador le so as linhas da pagina (limitadas pelo limit), sem
+    # agregar a colecao inteira
+    headers = {}
+    if version is not None:
+        etag = make_etag(
+            'collection',
+            principal.id,
+            version.collection_version,
+            page_digest(books),
+            query_digest(request),
+        )
+        headers = cache_headers(
+            etag, page_updated_at(books, version.collection_updated_at)
+        )
+        if etag_matches(request, etag):
+            return not_modified(headers)
+
+    return json_response(
+        UserCollection,
+        {'collection': books, 'next_cursor': next_cursor},
+        headers,
+    )
 
 
 @router.post(
@@ -33,29 +132,47 @@ def get_my_collection(current_user: CurrentUser):
     status_code=HTTPStatus.OK,
     response_model=Message,
 )
-def add_to_collection(
-    book_id: int, session: Session_, current_user: CurrentUser
+async def add_to_collection(
+    book_id: int,
+    session: Session_,
+    current_user: CurrentUser,
+    response: Response,
 ):
     """
     aciciona um livro à colecao do usuario
     o usuario deve estar logado
     """
-    book = session.scalar(select(Book).where(Book.id == book_id))
+    user_id = current_user.id
+    title = await session.scalar(select(Book.title).where(Book.id == book_id))
 
-    if not book:
+    if title is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Book not found'
         )
 
-    if book in current_user.collection:
+    # um unico INSERT, sem carregar a colecao: a chave primaria
+    # (user_id, book_id) decide se o livro ja estava la; o RETURNING diz
+    # se a linha entrou (o rowcount do psycopg e -1 no ON CONFLICT)
+    insert = insert_ignoring_conflicts(
+        user_collection_table, session.bind.dialect.name
+    )
+    inserted = await session.scalar(
+        insert.values(user_id=user_id, book_id=book_id).returning(
+            user_collection_table.c.book_id
+        )
+    )
+
+    if inserted is None:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail='Book already on collection',
         )
 
-    current_user.collection.append(book)
-    session.commit()
-    return {'message': f'Book {book.title} added to collection'}
+    await session.commit()
+    pin_to_primary(response)
+    # o detalhe e as listas de livros trazem o collector_count
+    await response_cache.invalidate(f'book:{book_id}', 'book_lists')
+    return {'message': f'Book {title} added to collection'}
 
 
 @router.delete(
@@ -63,26 +180,145 @@ def add_to_collection(
     status_code=HTTPStatus.OK,
     response_model=Message,
 )
-def remove_to_collection(
-    book_id: int, session: Session_, current_user: CurrentUser
+async def remove_to_collection(
+    book_id: int,
+    session: Session_,
+    current_user: CurrentUser,
+    response: Response,
 ):
     """
     remove um livro da colecao do usuario
     o usuario deve estar logado
     """
-    book = session.scalar(select(Book).where(Book.id == book_id))
+    user_id = current_user.id
+    title = await session.scalar(select(Book.title).where(Book.id == book_id))
 
-    if not book:
+    if title is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Book not found'
         )
 
-    if book not in current_user.collection:
+    result = await session.execute(
+        delete(user_collection_table).where(
+            user_collection_table.c.user_id == user_id,
+            user_collection_table.c.book_id == book_id,
+        )
+    )
+
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Book not in collection',
         )
 
-    current_user.collection.remove(book)
-    session.commit()
-    return {'message': f'Book {book.title} removed from collection'}
+    await session.commit()
+    pin_to_primary(response)
+    await response_cache.invalidate(f'book:{book_id}', 'book_lists')
+    return {'message': f'Book {title} removed from collection'}
+
+
+@router.post(
+    '/batch',
+    status_code=HTTPStatus.OK,
+    response_model=CollectionBatchResult,
+)
+async def batch_collection(
+    batch: CollectionBatch,
+    session: Session_,
+    current_user: CurrentUser,
+    response: Response,
+):
+    """
+    aplica varias operacoes de add/remove na colecao do usuario, em ordem,
+    numa unica transacao
+    cada item recebe o status e a mensagem que a rota individual daria
+    o usuario deve estar logado; lotes acima de COLLECTION_BATCH_MAX
+    operacoes sao recusados com 422 na validacao do corpo
+    """
+    user_id = current_user.id
+    book_ids = {operation.book_id for operation in batch.operations}
+
+    titles = {}
+    owned = set()
+    if book_ids:
+        titles = dict(
+            (
+                await session.execute(
+                    select(Book.id, Book.title).where(Book.id.in_(book_ids))
+                )
+            ).all()
+        )
+        owned = set(
+            await session.scalars(
+                select(user_collection_table.c.book_id).where(
+                    user_collection_table.c.user_id == user_id,
+                    user_collection_table.c.book_id.in_(book_ids),
+                )
+            )
+        )
+
+    initial = set(owned)
+    results = []
+    for operation in batch.operations:
+        book_id = operation.book_id
+        title = titles.get(book_id)
+        if title is None:
+            status, detail = HTTPStatus.NOT_FOUND, 'Book not found'
+        elif operation.action == 'add' and book_id in owned:
+            status, detail = (
+                HTTPStatus.BAD_REQUEST,
+                'Book already on collection',
+            )
+        elif operation.action == 'add':
+            owned.add(book_id)
+            status, detail = (
+                HTTPStatus.OK,
+                f'Book {title} added to collection',
+            )
+        elif book_id not in owned:
+            status, detail = HTTPStatus.NOT_FOUND, 'Book not in collection'
+        else:
+            owned.discard(book_id)
+            status, detail = (
+                HTTPStatus.OK,
+                f'Book {title} removed from collection',
+            )
+
+        results.append({
+            'action': operation.action,
+            'book_id': book_id,
+            'status': status,
+            'detail': detail,
+        })
+
+    # so o saldo final vai para o banco, com um INSERT e um DELETE
+    added = owned - initial
+    removed = initial - owned
+
+    if added:
+        insert = insert_ignoring_conflicts(
+            user_collection_table, session.bind.dialect.name
+        )
+        await session.execute(
+            insert.values([
+                {'user_id': user_id, 'book_id': book_id}
+                for book_id in sorted(added)
+            ])
+        )
+
+    if removed:
+        await session.execute(
+            delete(user_collection_table).where(
+                user_collection_table.c.user_id == user_id,
+                user_collection_table.c.book_id.in_(removed),
+            )
+        )
+
+    if added or removed:
+        await session.commit()
+        pin_to_primary(response)
+        await response_cache.invalidate(
+            *(f'book:{book_id}' for book_id in added | removed), 'book_lists'
+        )
+
+    return {'results': results}
@@ -0,0 +1,78 @@
+from hmac import compare_digest
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from estante_digital.database import get_session, settings
+from estante_digital.metrics import pool_metrics
+from estante_digital.purge import select_purge_job
+from estante_digital.rankings import ranking_cache
+from estante_digital.response_cache import response_cache
+from estante_digital.security import user_cache
+
+
+def require_internal_token(x_internal_token: str | None = Header(None)):
+    """
+    as rotas internas expoem o estado dos workers e so respondem com o
+    header X-Internal-Token igual a INTERNAL_API_TOKEN; sem o token
+    configurado elas nao existem (404)
+    """
+    expected = settings.INTERNAL_API_TOKEN
+    if not expected:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND)
+
+    if x_internal_token is None or not compare_digest(
+        x_internal_token.encode(), expected.encode()
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.FORBIDDEN, detail='Not enough permissions'
+        )
+
+
+router = APIRouter(dependencies=[Depends(require_internal_token)])
+
+
+@router.get('/pool', status_code=HTTPStatus.OK)
+def get_pool_stats():
+    """
+    estado e metricas dos pools de conexao deste worker
+    conexoes em uso, overflow e histograma do tempo de espera
+    """
+    return {
+        'pools': {
+            name: metrics.snapshot() for name, metrics in pool_metrics.items()
+        }
+    }
+
+
+@router.get('/user-cache', status_code=HTTPStatus.OK)
+def get_user_cache_stats():
+    """hits e misses do cache de usuarios autenticados deste worker"""
+    return user_cache.stats()
+
+
+@router.get('/ranking-cache', status_code=HTTPStatus.OK)
+def get_ranking_cache_stats():
+    """hits e misses do cache dos rankings deste worker"""
+    return ranking_cache.stats()
+
+
+@router.get('/response-cache', status_code=HTTPStatus.OK)
+def get_response_cache_stats():
+    """hits, misses, hit ratio e ocupacao do cache de respostas"""
+    return response_cache.stats()
+
+
+@router.get('/purge-jobs/{job_id}', status_code=HTTPStatus.OK)
+async def get_purge_job(
+    job_id: str, session: AsyncSession = Depends(get_session)
+):
+    """estado de uma remocao de conta, iniciada por qualquer worker"""
+    job = (await session.execute(select_purge_job(job_id))).first()
+    if job is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Job not found'
+        )
+
+    return job._asdict()
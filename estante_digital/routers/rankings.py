@@ -0,0 +1,59 @@
+from http import HTTPStatus
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from estante_digital.models import Book, book_rankings_table
+from estante_digital.rankings import ranking_cache
+from estante_digital.reads import select_books
+from estante_digital.replicas import get_read_session
+from estante_digital.schemas import BookRanking, Principal
+from estante_digital.security import get_current_principal
+from estante_digital.serialization import book_item
+
+router = APIRouter()
+
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+@router.get('/{kind}', status_code=HTTPStatus.OK, response_model=BookRanking)
+async def get_ranking(
+    kind: Literal['popular', 'trending'],
+    session: ReadSession,
+    principal: CurrentPrincipal,
+):
+    """
+    retorna um ranking de livros: popular (mais colecionados) ou
+    trending (mais adicionados a colecoes nos ultimos dias)
+    vem da tabela recalculada por 'python -m estante_digital.rankings';
+    refreshed_at diz quando (null se ainda nao foi calculado)
+    o usuario deve estar logado
+    schema de retorno: kind, refreshed_at, books [position, score, ...]
+    """
+    cached = ranking_cache.get(kind)
+    if cached is not None:
+        return cached
+
+    ranking = book_rankings_table.c
+    rows = (
+        await session.execute(
+            select_books(ranking.position, ranking.score, ranking.refreshed_at)
+            .join(book_rankings_table, ranking.book_id == Book.id)
+            .where(ranking.kind == kind)
+            .order_by(ranking.position)
+        )
+    ).all()
+
+    response = BookRanking(
+        kind=kind,
+        refreshed_at=rows[0].refreshed_at if rows else None,
+        books=[
+            {**book_item(row), 'position': row.position, 'score': row.score}
+            for row in rows
+        ],
+    )
+    ranking_cache.set(kind, response)
+
+    return response
@@ -1,58 +1,88 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import and_, or_, select
-from sqlalchemy.orm import Session
-
-from estante_digital.database import get_session
-from estante_digital.models import User
-from estante_digital.schemas import Message, UserPublic, UserSchema
-from estante_digital.security import get_current_user, get_password_hash
-
-Session_ = Annotated[Session, Depends(get_session)]
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from estante_digital.database import (
+    get_session,
+    get_session_factory,
+    unique_violation,
+)
+from estante_digital.models import Book, User
+from estante_digital.purge import new_purge_job, purge_in_background
+from estante_digital.reads import select_collection, select_user
+from estante_digital.schemas import DeletionJob, UserPublic, UserSchema
+from estante_digital.security import (
+    get_current_user,
+    get_password_hash_async,
+    user_cache,
+    verify_password_async,
+)
+from estante_digital.serialization import json_response
+
+Session_ = Annotated[AsyncSession, Depends(get_session)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 router = APIRouter()
 
 
-@router.post('/', status_code=HTTPStatus.CREATED, response_model=UserPublic)
-def create_user(user: UserSchema, session: Session_):
-    db_user = session.scalar(
-        select(User).where(
-            or_(
-                User.username == user.username,
-                User.email == user.email,
-            )
-        )
+def select_user_with_collection(user_id: int):
+    return (
+        select(User)
+        .where(User.id == user_id)
+        .options(selectinload(User.collection).selectinload(Book.author))
     )
 
-    if db_user:
-        if db_user.username == user.username:
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail='Username already exists',
-            )
-        elif db_user.email == user.email:
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail='Email already exists',
-            )
 
-    db_user = User(
-        username=user.username,
-        password=get_password_hash(user.password),
-        email=user.email,
-    )
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+def raise_if_taken(error: IntegrityError):
+    column = unique_violation(error, User.__table__)
+    if column == 'username':
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Username already exists',
+        )
+    if column == 'email':
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Email already exists',
+        )
 
-    return db_user
+
+@router.post('/', status_code=HTTPStatus.CREATED, response_model=UserPublic)
+async def create_user(user: UserSchema, session: Session_):
+    # o hash e calculado antes de abrir a transacao
+    hashed_password = await get_password_hash_async(user.password)
+
+    try:
+        user_id = await session.scalar(
+            insert(User)
+            .values(
+                username=user.username,
+                password=hashed_password,
+                email=user.email,
+            )
+            .returning(User.id)
+        )
+        await session.commit()
+    except IntegrityError as error:
+        await session.rollback()
+        raise_if_taken(error)
+        raise
+
+    return {
+        'id': user_id,
+        'username': user.username,
+        'email': user.email,
+        'collection': [],
+    }
 
 
 @router.get('/{id}', status_code=HTTPStatus.OK, response_model=UserPublic)
-def get_user(
+async def get_user(
     id: int,
     session: Session_,
     current_user: CurrentUser,
@@ -62,13 +92,18 @@ def get_user(
             status_code=HTTPStatus.BAD_REQUEST, detail='Not enough permissions'
         )
 
-    user = session.scalar(select(User).where(User.id == current_user.id))
+    user = (await session.execute(select_user(id))).first()
+    collection = (
+        await session.execute(select_collection(id).order_by(Book.id))
+    ).all()
 
-    return user
+    return json_response(
+        UserPublic, {**user._asdict(), 'collection': collection}
+    )
 
 
 @router.put('/{id}', status_code=HTTPStatus.OK, response_model=UserPublic)
-def update_user(
+async def update_user(
     id: int,
     user: UserSchema,
     session: Session_,
@@ -79,51 +114,71 @@ def update_user(
             status_code=HTTPStatus.BAD_REQUEST, detail='Not enough permissions'
         )
 
-    db_user = session.scalar(
-        select(User).where(
-            and_(
-                or_(
-                    User.username == user.username,
-                    User.email == user.email,
-                ),
-                User.id != current_user.id,
-            )
+    user_id = current_user.id
+    stored_password = current_user.password
+    # o bcrypt roda sem transacao aberta: encerra a leitura que a
+    # autenticacao pode ter iniciado
+    if session.in_transaction():
+        await session.rollback()
+
+    values = {'username': user.username, 'email': user.email}
+    # trocar a senha invalida os tokens ja emitidos
+    if not await verify_password_async(user.password, stored_password):
+        values['password'] = await get_password_hash_async(user.password)
+        values['token_version'] = User.token_version + 1
+
+    try:
+        await session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    except IntegrityError as error:
+        await session.rollback()
+        raise_if_taken(error)
+        raise
+
+    # so depois do commit: uma requisicao concorrente que lesse o banco
+    # antes dele voltaria a guardar a versao antiga
+    user_cache.delete(user_id)
+
+    return await session.scalar(
+        select_user_with_collection(user_id).execution_options(
+            populate_existing=True
         )
     )
 
-    if db_user:
-        if db_user.username == user.username:
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail='Username already exists',
-            )
-        elif db_user.email == user.email:
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail='Email already exists',
-            )
-
-    current_user.username = user.username
-    current_user.password = get_password_hash(user.password)
-    current_user.email = user.email
-    session.commit()
-    session.refresh(current_user)
-
-    return current_user
 
-
-@router.delete('/{id}', status_code=HTTPStatus.OK, response_model=Message)
-def delete_user(
+@router.delete(
+    '/{id}', status_code=HTTPStatus.ACCEPTED, response_model=DeletionJob
+)
+async def delete_user(
     id: int,
     session: Session_,
     current_user: CurrentUser,
+    background_tasks: BackgroundTasks,
+    open_session=Depends(get_session_factory),
 ):
+    """
+    remove a conta: ela deixa de autenticar na hora e o catalogo que o
+    usuario cadastrou e apagado em segundo plano (estante_digital.purge)
+    o andamento fica em '/internal/purge-jobs/<job_id>'
+    """
     if current_user.id != id:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST, detail='Not enough permissions'
         )
 
-    session.delete(current_user)
-    session.commit()
+    user_id = current_user.id
+    current_user.deleted_at = func.now()
+    job_id = await new_purge_job(session, user_id)
+    await session.commit()
+    user_cache.delete(user_id)
+
+    background_tasks.add_task(
+        purge_in_background, open_session, job_id, user_id
+    )
 
-    return {'message': 'User deleted'}
+    return {'message': 'User deleted', 'job_id': job_id}
@@ -1,5 +1,9 @@
-from pydantic import BaseModel, ConfigDict, EmailStr
+from datetime import datetime
+from typing import Literal
 
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+
+from estante_digital.database import settings
 from estante_digital.utils import sanitize_input
 
 
@@ -8,6 +12,10 @@ class Message(BaseModel):
     message: str
 
 
+class DeletionJob(Message):
+    job_id: str
+
+
 # token
 class Token(BaseModel):
     access_token: str
@@ -15,7 +23,14 @@ class Token(BaseModel):
 
 
 class TokenData(BaseModel):
-    username: str | None = None
+    user_id: int | None = None
+    token_version: int | None = None
+    email: str | None = None  # tokens antigos, identificados pelo email
+
+
+class Principal(BaseModel):
+    id: int
+    token_version: int | None = None
 
 
 # helper book and author
@@ -42,12 +57,18 @@ class AuthorSchema(BaseModel):
 class AuthorPublic(BaseModel):
     id: int
     name: str
+    book_count: int
     books: list[BookPublicWithoutAuthor]
     model_config = ConfigDict(from_attributes=True)
 
 
+class AuthorSummary(AuthorPublicWithoutBooks):
+    book_count: int
+
+
 class AuthorList(BaseModel):
-    authors: list[AuthorPublicWithoutBooks]
+    authors: list[AuthorSummary]
+    next_cursor: str | None = None
 
 
 # book
@@ -65,12 +86,38 @@ class BookPublic(BaseModel):
     id: int
     title: str
     year: int
+    collector_count: int
     author: AuthorPublicWithoutBooks
     model_config = ConfigDict(from_attributes=True)
 
 
 class BookList(BaseModel):
     books: list[BookPublic]
+    next_cursor: str | None = None
+
+
+class RankedBook(BookPublic):
+    position: int
+    score: int
+
+
+class BookRanking(BaseModel):
+    kind: Literal['popular', 'trending']
+    refreshed_at: datetime | None
+    books: list[RankedBook]
+
+
+class ImportRejection(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    read: int
+    authors_created: int
+    books_created: int
+    errors: int
+    rejected: list[ImportRejection]
 
 
 # user
@@ -95,3 +142,27 @@ class UserPublic(BaseModel):
 
 class UserCollection(BaseModel):
     collection: list[BookPublic]
+    next_cursor: str | None = None
+
+
+class CollectionOperation(BaseModel):
+    action: Literal['add', 'remove']
+    book_id: int
+
+
+class CollectionBatch(BaseModel):
+    # o limite entra na validacao do corpo, antes de a rota rodar
+    operations: list[CollectionOperation] = Field(
+        max_length=settings.COLLECTION_BATCH_MAX
+    )
+
+
+class CollectionOperationResult(BaseModel):
+    action: Literal['add', 'remove']
+    book_id: int
+    status: int
+    detail: str
+
+
+class CollectionBatchResult(BaseModel):
+    results: list[CollectionOperationResult]
@@ -0,0 +1,118 @@
+import re
+
+from sqlalchemy import (
+    DDL,
+    Index,
+    event,
+    false,
+    func,
+    literal_column,
+    table,
+    text,
+)
+from sqlalchemy import column as sql_column
+
+# configuracao do full-text search do postgres; sem stemming, funciona
+# para titulos e nomes em qualquer idioma. precisa aparecer literal
+# (nao como parametro) para a consulta usar o indice de expressao
+SEARCH_CONFIG = text("'simple'")
+
+
+def search_terms(q: str):
+    return re.findall(r'\w+', q.lower())
+
+
+def fts_table_name(column):
+    return f'{column.table.name}_fts'
+
+
+def _tsvector(column):
+    return func.to_tsvector(SEARCH_CONFIG, column)
+
+
+def register_search_index(column):
+    """
+    cria o indice de busca textual da coluna junto com a tabela
+    postgres: indice GIN sobre to_tsvector(coluna)
+    sqlite: tabela FTS5 de conteudo externo mantida por triggers
+    """
+    table_name = column.table.name
+    name = column.name
+    fts = fts_table_name(column)
+
+    Index(
+        f'ix_{table_name}_{name}_fts',
+        _tsvector(column),
+        postgresql_using='gin',
+    ).ddl_if(dialect='postgresql')
+
+    for statement in sqlite_fts_ddl(table_name, name):
+        event.listen(
+            column.table,
+            'after_create',
+            DDL(statement).execute_if(dialect='sqlite'),
+        )
+
+    event.listen(
+        column.table,
+        'before_drop',
+        DDL(f'DROP TABLE IF EXISTS {fts}').execute_if(dialect='sqlite'),
+    )
+
+
+def sqlite_fts_ddl(table_name: str, name: str):
+    fts = f'{table_name}_fts'
+    delete = (
+        f'INSERT INTO {fts}({fts}, rowid, {name}) '
+        f"VALUES ('delete', old.id, old.{name});"
+    )
+    insert = f'INSERT INTO {fts}(rowid, {name}) VALUES (new.id, new.{name});'
+
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5('
+        f"{name}, content='{table_name}', content_rowid='id')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} '
+        f'BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} '
+        f'BEGIN {delete} END',
+        # so o UPDATE da coluna indexada: os triggers de versao alteram a
+        # mesma linha dentro do UPDATE, e reindexar ali corromperia o indice
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au '
+        f'AFTER UPDATE OF {name} ON {table_name} '
+        f'BEGIN {delete} {insert} END',
+    ]
+
+
+def apply_search(query, column, q: str, dialect: str):
+    """
+    filtra a consulta pelos termos de q (prefixo de cada palavra) e
+    ordena pela relevancia; sem indice de busca, cai para LIKE
+    """
+    terms = search_terms(q)
+    if not terms:
+        return query.where(false())
+
+    primary_key = column.table.c.id
+
+    if dialect == 'postgresql':
+        document = _tsvector(column)
+        tsquery = func.to_tsquery(
+            SEARCH_CONFIG, ' & '.join(f'{term}:*' for term in terms)
+        )
+        return query.where(document.op('@@')(tsquery)).order_by(
+            func.ts_rank(document, tsquery).desc(), primary_key
+        )
+
+    if dialect == 'sqlite':
+        fts_name = fts_table_name(column)
+        fts = table(fts_name, sql_column('rowid'))
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return (
+            query.join(fts, fts.c.rowid == primary_key)
+            .where(literal_column(fts_name).op('MATCH')(match))
+            .order_by(func.bm25(literal_column(fts_name)), primary_key)
+        )
+
+    for term in terms:
+        query = query.where(column.contains(term))
+    return query.order_by(primary_key)
@@ -1,17 +1,22 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from http import HTTPStatus
+from multiprocessing import get_context
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jwt import DecodeError, ExpiredSignatureError, decode, encode
 from passlib.context import CryptContext
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from zoneinfo import ZoneInfo
 
+from estante_digital.cache import TTLCache
 from estante_digital.database import get_session
 from estante_digital.models import User
-from estante_digital.schemas import TokenData
+from estante_digital.schemas import Principal, TokenData
 from estante_digital.settings import Settings
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
@@ -19,6 +24,11 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl='auth/token')
 
 settings = Settings()
 
+# usuarios autenticados, indexados pelo id
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL
+)
+
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -40,32 +50,179 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
-async def get_current_user(
-    session: Session = Depends(get_session),
-    token: str = Depends(oauth2_scheme),
-):
-    credentials_exception = HTTPException(
+class HashPool:
+    """
+    executa o bcrypt em um pool de processos, fora do event loop
+    limita a quantidade de operacoes pendentes: quando o pool esta
+    saturado responde 503 com Retry-After em vez de enfileirar
+    """
+
+    def __init__(
+        self, workers: int | None, max_pending: int, retry_after: int
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=get_context('spawn')
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail='Server busy, try again later',
+                headers={'Retry-After': str(self.retry_after)},
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+hash_pool = HashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
+
+
+async def get_password_hash_async(password: str):
+    return await hash_pool.run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await hash_pool.run(
+        verify_password, plain_password, hashed_password
+    )
+
+
+def _detached_copy(user: User):
+    """
+    copia apenas as colunas do usuario, sem ligacao com a sessao
+    pode ser reanexada em outra sessao com merge(load=False)
+    """
+    copy = User(
+        username=user.username, password=user.password, email=user.email
+    )
+    copy.id = user.id
+    copy.created_at = user.created_at
+    copy.token_version = user.token_version
+    copy.deleted_at = user.deleted_at
+    make_transient_to_detached(copy)
+
+    return copy
+
+
+def user_claims(user: User):
+    """claims do token: id do usuario e a versao atual dos tokens dele"""
+    return {'sub': str(user.id), 'ver': user.token_version}
+
+
+def credentials_exception():
+    return HTTPException(
         status_code=HTTPStatus.UNAUTHORIZED,
         detail='Could not validate credentials',
         headers={'WWW-Authenticate': 'Bearer'},
     )
 
+
+def decode_token(token: str):
+    """
+    valida o token e extrai os dados do usuario
+    tokens antigos (sub = email, sem 'ver') so sao aceitos enquanto
+    LEGACY_EMAIL_TOKENS estiver ligado
+    """
     try:
         payload = decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
-        username: str = payload.get('sub')
-        if not username:
-            raise credentials_exception
-        token_data = TokenData(username=username)
     except (DecodeError, ExpiredSignatureError):
-        raise credentials_exception
+        raise credentials_exception()
 
-    user = session.scalar(
-        select(User).where(User.email == token_data.username)
-    )
+    subject = payload.get('sub')
+    if not subject:
+        raise credentials_exception()
+
+    if 'ver' not in payload:
+        if not settings.LEGACY_EMAIL_TOKENS:
+            raise credentials_exception()
+        return TokenData(email=subject)
 
-    if user is None:
-        raise credentials_exception
+    try:
+        return TokenData(user_id=int(subject), token_version=payload['ver'])
+    except (TypeError, ValueError):
+        raise credentials_exception()
+
+
+async def _authenticate(session, token_data: TokenData, attach: bool):
+    """
+    usuario do token, do user_cache ou do banco; recusa tokens de uma
+    versao antiga (senha trocada) e contas removidas
+    attach reanexa a copia do cache a sessao, para a rota usar o objeto
+    """
+    if token_data.user_id is None:
+        user = await session.scalar(
+            select(User).where(User.email == token_data.email)
+        )
+        if user is None or user.deleted_at is not None:
+            raise credentials_exception()
+        return user
+
+    cached = user_cache.get(token_data.user_id)
+    if cached is None:
+        user = await session.get(User, token_data.user_id)
+    elif attach:
+        user = await session.merge(cached, load=False)
+    else:
+        user = cached
+
+    if (
+        user is None
+        or user.token_version != token_data.token_version
+        or user.deleted_at is not None
+    ):
+        raise credentials_exception()
+
+    if cached is None:
+        user_cache.set(user.id, _detached_copy(user))
 
     return user
+
+
+async def get_current_user(
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+):
+    return await _authenticate(session, decode_token(token), attach=True)
+
+
+async def get_current_principal(
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+):
+    """
+    identifica o usuario para rotas que so precisam saber quem esta
+    logado, sem trazer o usuario para a sessao
+    a versao do token e a remocao da conta sao conferidas na copia do
+    user_cache; so o miss consulta o banco. a troca de senha e a remocao
+    limpam o cache deste worker na hora, os outros veem a mudanca em ate
+    USER_CACHE_TTL segundos
+    """
+    user = await _authenticate(session, decode_token(token), attach=False)
+    return Principal(id=user.id, token_version=user.token_version)
@@ -0,0 +1,105 @@
+"""
+serializacao das respostas das rotas de leitura
+
+por padrao o corpo passa pelo schema de resposta (validacao com
+from_attributes e dump), como o FastAPI faria com o response_model.
+com FAST_JSON as rotas registradas em PLAIN montam dicts simples, na
+ordem dos campos do schema, direto das linhas (estante_digital.reads), e
+o pydantic-core serializa sem validar; o response_model continua nas
+rotas e o OpenAPI nao muda
+
+custo por item de cada caminho: python -m benchmarks.serialization
+"""
+
+from fastapi import Response
+from pydantic_core import to_json
+
+from estante_digital.database import settings
+from estante_digital.schemas import (
+    AuthorList,
+    AuthorPublic,
+    BookList,
+    BookPublic,
+    UserCollection,
+    UserPublic,
+)
+
+
+def book_item(book):
+    return {
+        'id': book.id,
+        'title': book.title,
+        'year': book.year,
+        'collector_count': book.collector_count,
+        'author': {'id': book.author.id, 'name': book.author.name},
+    }
+
+
+def author_item(author):
+    return {
+        'id': author.id,
+        'name': author.name,
+        'book_count': author.book_count,
+    }
+
+
+def author_detail(author: dict):
+    return {
+        'id': author['id'],
+        'name': author['name'],
+        'book_count': author['book_count'],
+        'books': [
+            {'id': book.id, 'title': book.title, 'year': book.year}
+            for book in author['books']
+        ],
+    }
+
+
+def user_detail(user: dict):
+    return {
+        'id': user['id'],
+        'username': user['username'],
+        'email': user['email'],
+        'collection': [book_item(book) for book in user['collection']],
+    }
+
+
+def page(key: str, item):
+    def plain(content):
+        return {
+            key: [item(entry) for entry in content[key]],
+            'next_cursor': content['next_cursor'],
+        }
+
+    return plain
+
+
+# schema de resposta -> dicts simples no mesmo formato
+PLAIN = {
+    BookPublic: book_item,
+    BookList: page('books', book_item),
+    AuthorPublic: author_detail,
+    AuthorList: page('authors', author_item),
+    UserPublic: user_detail,
+    UserCollection: page('collection', book_item),
+}
+
+
+def dump_json(model, content):
+    """content serializado no formato do schema model"""
+    if settings.FAST_JSON and model in PLAIN:
+        return to_json(PLAIN[model](content))
+
+    return (
+        model.model_validate(content, from_attributes=True)
+        .model_dump_json()
+        .encode()
+    )
+
+
+def json_response(model, content, headers=None):
+    return Response(
+        dump_json(model, content),
+        media_type='application/json',
+        headers=headers,
+    )
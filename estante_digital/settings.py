@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,6 +9,67 @@ class Settings(BaseSettings):
     )
 
     DATABASE_URL: str
+    # AsyncSession (psycopg async); desligado usa Session sincrona (SQLite)
+    DATABASE_ASYNC: bool = True
+    # pool de conexoes por worker (ignorado no SQLite)
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_STATEMENT_TIMEOUT: int = 0  # em ms, 0 desliga (postgres)
+    # replicas de leitura, ex: '["postgresql+psycopg://..."]'
+    DATABASE_REPLICA_URLS: list[str] = []
+    DATABASE_REPLICA_RETRY_SECONDS: int = 30
+    DATABASE_REPLICA_PIN_SECONDS: int = 5
+    # paginacao das listagens
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+    # operacoes por chamada de POST /collection/batch
+    COLLECTION_BATCH_MAX: int = 1000
+    # importacao em massa (POST /books/import e estante_digital.importer)
+    IMPORT_CHUNK_SIZE: int = 5000
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+    # rankings: tamanho, janela do trending e cache das respostas
+    RANKINGS_SIZE: int = 100
+    RANKINGS_TRENDING_DAYS: int = 7
+    RANKINGS_CACHE_TTL: int = 60
+    # Cache-Control das respostas com ETag: o cliente sempre revalida
+    ETAG_CACHE_CONTROL: str = 'private, no-cache'
+    # serializa as respostas de leitura sem validar pelo response_model
+    # (estante_digital.serialization)
+    FAST_JSON: bool = False
+    # listas (GET /books e /authors) montadas em JSON pelo postgres;
+    # ignorado nos outros bancos (estante_digital.json_lists)
+    DATABASE_JSON_LISTS: bool = False
+    # compressao das respostas (estante_digital.compression): corpos a
+    # partir de MINIMUM_SIZE bytes, nivel de 1 (rapido) a 9; a partir de
+    # THREADPOOL_MIN_SIZE bytes a compressao sai do event loop
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_LEVEL: int = 6
+    COMPRESSION_THREADPOOL_MIN_SIZE: int = 64 * 1024
+    # cache das respostas do catalogo (estante_digital.response_cache):
+    # memory (por worker), redis (compartilhado) ou none
+    RESPONSE_CACHE_BACKEND: Literal['memory', 'redis', 'none'] = 'memory'
+    RESPONSE_CACHE_URL: str = 'redis://localhost:6379/0'
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL: int = 30
+    # remocao de contas em segundo plano (estante_digital.purge)
+    PURGE_BATCH_SIZE: int = 1000
+    PURGE_JOB_TTL: int = 86400
+    # header X-Internal-Token exigido pelas rotas /internal; sem valor
+    # elas ficam desligadas
+    INTERNAL_API_TOKEN: str | None = None
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # aceita tokens emitidos antes do id no 'sub'; pode ser desligado
+    # depois de ACCESS_TOKEN_EXPIRE_MINUTES do deploy
+    LEGACY_EMAIL_TOKENS: bool = True
+
+    USER_CACHE_MAXSIZE: int = 1024
+    USER_CACHE_TTL: int = 60
+
+    PASSWORD_HASH_WORKERS: int | None = None
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_RETRY_AFTER: int = 1
@@ -25,6 +25,16 @@ if config.config_file_name is not None:
 # target_metadata = None
 target_metadata = table_registry.metadata
 
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # tabelas FTS5 do SQLite (e suas tabelas internas) sao criadas pelas
+    # migracoes e por estante_digital.search, nao pelos models
+    if type_ == 'table' and reflected and compare_to is None:
+        return '_fts' not in name
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +57,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -70,7 +81,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,53 @@
+"""add secondary indexes
+
+Revision ID: 5f1c3a9e7d24
+Revises: bdbe81bb11f9
+Create Date: 2026-10-18 11:02:17.530114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1c3a9e7d24'
+down_revision: Union[str, None] = 'bdbe81bb11f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tabela, nome do indice, colunas
+INDEXES = [
+    ('authors', 'ix_authors_created_by_id', ['created_by_id']),
+    ('books', 'ix_books_author_id_year', ['author_id', 'year']),
+    ('books', 'ix_books_created_by_id', ['created_by_id']),
+    ('books', 'ix_books_year', ['year']),
+    ('user_collection_table', 'ix_user_collection_table_book_id', ['book_id']),
+]
+
+
+def upgrade() -> None:
+    # no postgres os indices sao criados com CONCURRENTLY, sem travar
+    # escritas; isso exige rodar fora da transacao da migracao
+    with op.get_context().autocommit_block():
+        for table, name, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
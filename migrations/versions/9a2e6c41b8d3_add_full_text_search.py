@@ -0,0 +1,66 @@
+"""add full text search
+
+Revision ID: 9a2e6c41b8d3
+Revises: 5f1c3a9e7d24
+Create Date: 2026-10-18 11:47:52.006381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from estante_digital.search import SEARCH_CONFIG, sqlite_fts_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a2e6c41b8d3'
+down_revision: Union[str, None] = '5f1c3a9e7d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tabela, coluna pesquisavel
+SEARCHABLE = [('books', 'title'), ('authors', 'name')]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            for table, column in SEARCHABLE:
+                op.create_index(
+                    f'ix_{table}_{column}_fts',
+                    table,
+                    [sa.func.to_tsvector(SEARCH_CONFIG, sa.column(column))],
+                    postgresql_using='gin',
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+
+    elif dialect == 'sqlite':
+        for table, column in SEARCHABLE:
+            for statement in sqlite_fts_ddl(table, column):
+                op.execute(statement)
+            # indexa as linhas que ja existiam
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            for table, column in SEARCHABLE:
+                op.drop_index(
+                    f'ix_{table}_{column}_fts',
+                    table_name=table,
+                    postgresql_concurrently=True,
+                    if_exists=True,
+                )
+
+    elif dialect == 'sqlite':
+        for table, _ in SEARCHABLE:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
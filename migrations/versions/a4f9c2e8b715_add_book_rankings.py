@@ -0,0 +1,93 @@
+"""add book rankings
+
+Revision ID: a4f9c2e8b715
+Revises: e7b2d4c9a1f3
+Create Date: 2026-10-18 17:20:44.902716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from estante_digital.counters import COUNTERS, counter_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f9c2e8b715'
+down_revision: Union[str, None] = 'e7b2d4c9a1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def recreate_collection_triggers(dialect: str) -> None:
+    # no sqlite o batch_alter_table recria a tabela e perde os triggers
+    # dos contadores (estante_digital.counters)
+    for counted, foreign_key, target, counter in COUNTERS:
+        if counted != 'user_collection_table':
+            continue
+        for statement in counter_ddl(
+            dialect, counted, foreign_key, target, counter
+        ):
+            op.execute(statement)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    # linhas existentes ficam com uma data antiga, para nao entrarem
+    # todas no trending; as novas usam now()
+    op.add_column(
+        'user_collection_table',
+        sa.Column(
+            'added_at',
+            sa.DateTime(),
+            server_default=sa.text("'1970-01-01 00:00:00'"),
+            nullable=False,
+        ),
+    )
+    with op.batch_alter_table('user_collection_table') as batch_op:
+        batch_op.alter_column(
+            'added_at',
+            existing_type=sa.DateTime(),
+            server_default=sa.func.now(),
+        )
+    recreate_collection_triggers(dialect)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_collection_table_added_at',
+            'user_collection_table',
+            ['added_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    op.create_table(
+        'book_rankings',
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'position'),
+    )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    op.drop_table('book_rankings')
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_user_collection_table_added_at',
+            table_name='user_collection_table',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+    with op.batch_alter_table('user_collection_table') as batch_op:
+        batch_op.drop_column('added_at')
+    recreate_collection_triggers(dialect)
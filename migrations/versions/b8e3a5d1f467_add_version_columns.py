@@ -0,0 +1,79 @@
+"""add version columns
+
+Revision ID: b8e3a5d1f467
+Revises: f1d6b3a7c920
+Create Date: 2026-10-18 19:12:05.338190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from estante_digital.counters import COUNTERS, VERSIONS, counter_ddl, version_ddl
+from estante_digital.search import sqlite_fts_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e3a5d1f467'
+down_revision: Union[str, None] = 'f1d6b3a7c920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCHABLE = [('books', 'title'), ('authors', 'name')]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    # sem updated_at a ultima mudanca e a criacao; nulo evita um default
+    # nao constante, que o sqlite nao aceita no ADD COLUMN
+    for _, _, target, version, stamp in VERSIONS:
+        op.add_column(
+            target,
+            sa.Column(version, sa.Integer(), server_default='0', nullable=False),
+        )
+        op.add_column(target, sa.Column(stamp, sa.DateTime(), nullable=True))
+
+    for changed, foreign_key, target, version, stamp in VERSIONS:
+        for statement in version_ddl(
+            dialect, changed, foreign_key, target, version, stamp
+        ):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    for changed, _, _, version, _ in VERSIONS:
+        name = f'{changed}_{version}'
+        if dialect == 'postgresql':
+            op.execute(f'DROP TRIGGER IF EXISTS {name} ON {changed}')
+            op.execute(f'DROP FUNCTION IF EXISTS {name}()')
+        else:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {name}_{suffix}')
+
+    if dialect == 'sqlite':
+        # o batch recria as tabelas; os triggers que as referenciam saem
+        # antes e voltam depois
+        triggers = [f'{counted}_{counter}' for counted, _, _, counter in COUNTERS]
+        triggers += [f'{table}_fts' for table, _ in SEARCHABLE]
+        for name in triggers:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {name}_{suffix}')
+
+    for _, _, target, version, stamp in VERSIONS:
+        with op.batch_alter_table(target) as batch_op:
+            batch_op.drop_column(stamp)
+            batch_op.drop_column(version)
+
+    if dialect == 'sqlite':
+        for counted, foreign_key, target, counter in COUNTERS:
+            for statement in counter_ddl(
+                dialect, counted, foreign_key, target, counter
+            ):
+                op.execute(statement)
+        for table, column in SEARCHABLE:
+            for statement in sqlite_fts_ddl(table, column):
+                op.execute(statement)
@@ -0,0 +1,55 @@
+"""add keyset pagination index
+
+Revision ID: c3d8f5a1e602
+Revises: 9a2e6c41b8d3
+Create Date: 2026-10-18 14:21:48.902311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8f5a1e602'
+down_revision: Union[str, None] = '9a2e6c41b8d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (year, id) substitui o indice em year: atende o filtro por ano e a
+    # paginacao por cursor ordenada por (year, id)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_year_id',
+            'books',
+            ['year', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_books_year',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_year',
+            'books',
+            ['year'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_books_year_id',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,57 @@
+"""add row version triggers
+
+Revision ID: e5b9c7a2d418
+Revises: d2a7e9c4b361
+Create Date: 2026-10-18 21:38:12.604817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from estante_digital.counters import (
+    ROW_VERSIONS,
+    row_version_ddl,
+    row_version_name,
+)
+from estante_digital.search import sqlite_fts_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b9c7a2d418'
+down_revision: Union[str, None] = 'd2a7e9c4b361'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCHABLE = [('books', 'title'), ('authors', 'name')]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        # o trigger do indice passa a olhar so a coluna indexada; no
+        # UPDATE de qualquer coluna ele reindexaria de novo a linha que os
+        # triggers de versao alteram, com old ja atualizado
+        for table, column in SEARCHABLE:
+            op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_au')
+            for statement in sqlite_fts_ddl(table, column):
+                op.execute(statement)
+
+    for changed, columns, target, target_key, row_key in ROW_VERSIONS:
+        for statement in row_version_ddl(
+            dialect, changed, columns, target, target_key, row_key
+        ):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    for changed, _, target, _, _ in ROW_VERSIONS:
+        name = row_version_name(changed, target)
+        if dialect == 'postgresql':
+            op.execute(f'DROP TRIGGER IF EXISTS {name} ON {changed}')
+            op.execute(f'DROP FUNCTION IF EXISTS {name}()')
+        else:
+            op.execute(f'DROP TRIGGER IF EXISTS {name}_au')
@@ -0,0 +1,82 @@
+"""add denormalized counters
+
+Revision ID: e7b2d4c9a1f3
+Revises: c3d8f5a1e602
+Create Date: 2026-10-18 16:05:12.417093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from estante_digital.counters import COUNTERS, counter_ddl, reconcile_statements
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2d4c9a1f3'
+down_revision: Union[str, None] = 'c3d8f5a1e602'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tabela, nome do indice, colunas (ordenacao das listagens)
+INDEXES = [
+    ('authors', 'ix_authors_book_count_id', ['book_count', 'id']),
+    ('books', 'ix_books_collector_count_id', ['collector_count', 'id']),
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    for _, _, target, counter in COUNTERS:
+        op.add_column(
+            target,
+            sa.Column(counter, sa.Integer(), server_default='0', nullable=False),
+        )
+
+    # triggers antes do preenchimento: escritas concorrentes ja contam
+    for counted, foreign_key, target, counter in COUNTERS:
+        for statement in counter_ddl(
+            dialect, counted, foreign_key, target, counter
+        ):
+            op.execute(statement)
+
+    for _, statement in reconcile_statements():
+        op.execute(statement)
+
+    with op.get_context().autocommit_block():
+        for table, name, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    with op.get_context().autocommit_block():
+        for table, name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+
+    for counted, _, target, counter in COUNTERS:
+        name = f'{counted}_{counter}'
+        if dialect == 'postgresql':
+            op.execute(f'DROP TRIGGER IF EXISTS {name} ON {counted}')
+            op.execute(f'DROP FUNCTION IF EXISTS {name}()')
+        else:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {name}_{suffix}')
+
+        with op.batch_alter_table(target) as batch_op:
+            batch_op.drop_column(counter)
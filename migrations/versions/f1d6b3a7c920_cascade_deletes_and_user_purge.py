@@ -0,0 +1,92 @@
+"""cascade deletes and user purge
+
+Revision ID: f1d6b3a7c920
+Revises: a4f9c2e8b715
+Create Date: 2026-10-18 18:03:27.614258
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from estante_digital.counters import COUNTERS, counter_ddl
+from estante_digital.search import sqlite_fts_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1d6b3a7c920'
+down_revision: Union[str, None] = 'a4f9c2e8b715'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tabela, coluna, tabela referenciada; nomes padrao do postgres
+FOREIGN_KEYS = [
+    ('authors', 'created_by_id', 'users'),
+    ('books', 'author_id', 'authors'),
+    ('books', 'created_by_id', 'users'),
+    ('user_collection_table', 'book_id', 'books'),
+    ('user_collection_table', 'user_id', 'users'),
+]
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+SEARCHABLE = [('books', 'title'), ('authors', 'name')]
+
+
+def set_on_delete(ondelete: Union[str, None]) -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # NOT VALID evita varrer as tabelas com a trava do ALTER; a
+        # validacao seguinte so pede uma trava que nao bloqueia escritas
+        action = f' ON DELETE {ondelete}' if ondelete else ''
+        for table, column, referred in FOREIGN_KEYS:
+            name = f'{table}_{column}_fkey'
+            op.execute(
+                f'ALTER TABLE {table} DROP CONSTRAINT {name}, '
+                f'ADD CONSTRAINT {name} FOREIGN KEY ({column}) '
+                f'REFERENCES {referred} (id){action} NOT VALID'
+            )
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+        return
+
+    # no sqlite as tabelas sao recriadas; as fks sem nome sao encontradas
+    # pela naming convention. os triggers referenciam as tabelas e
+    # impediriam a troca, entao saem antes e voltam depois
+    triggers = [f'{counted}_{counter}' for counted, _, _, counter in COUNTERS]
+    triggers += [f'{table}_fts' for table, _ in SEARCHABLE]
+    for name in triggers:
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {name}_{suffix}')
+
+    for table in dict.fromkeys(table for table, _, _ in FOREIGN_KEYS):
+        with op.batch_alter_table(
+            table, naming_convention=NAMING_CONVENTION
+        ) as batch_op:
+            for fk_table, column, referred in FOREIGN_KEYS:
+                if fk_table != table:
+                    continue
+                name = f'{table}_{column}_fkey'
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(
+                    name, referred, [column], ['id'], ondelete=ondelete
+                )
+
+    for counted, foreign_key, target, counter in COUNTERS:
+        for statement in counter_ddl(
+            dialect, counted, foreign_key, target, counter
+        ):
+            op.execute(statement)
+    for table, column in SEARCHABLE:
+        for statement in sqlite_fts_ddl(table, column):
+            op.execute(statement)
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    set_on_delete('CASCADE')
+
+
+def downgrade() -> None:
+    set_on_delete(None)
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('deleted_at')
@@ -1,22 +1,50 @@
+import os
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import StaticPool, create_engine
+from sqlalchemy import StaticPool, create_engine, event, text
 from sqlalchemy.orm import Session
 
 from estante_digital.app import app
-from estante_digital.database import get_session
+from estante_digital.database import (
+    SyncSession,
+    enable_foreign_keys,
+    get_session,
+    get_session_factory,
+    settings,
+)
 from estante_digital.models import table_registry
-from estante_digital.security import get_password_hash
+from estante_digital.rankings import ranking_cache
+from estante_digital.replicas import get_read_session
+from estante_digital.response_cache import response_cache
+from estante_digital.security import get_password_hash, user_cache
 from tests.factories import AuthorFactory, BookFactory, UserFactory
 
 
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    user_cache.clear()
+    ranking_cache.clear()
+    response_cache.clear()
+    yield
+    user_cache.clear()
+    ranking_cache.clear()
+    response_cache.clear()
+
+
 @pytest.fixture()
 def client(session):
     def get_session_override():
-        return session
+        return SyncSession(session)
 
     with TestClient(app) as client:
         app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        # tarefas em segundo plano abrem outra sessao no mesmo banco
+        app.dependency_overrides[get_session_factory] = lambda: (
+            lambda: Session(session.bind)
+        )
         yield client
 
     app.dependency_overrides.clear()
@@ -29,6 +57,7 @@ def session():
         connect_args={'check_same_thread': False},
         poolclass=StaticPool,
     )
+    enable_foreign_keys(engine)
     table_registry.metadata.create_all(engine)
 
     with Session(engine) as session:
@@ -37,6 +66,106 @@ def session():
     table_registry.metadata.drop_all(engine)
 
 
+@pytest.fixture()
+def postgres_session():
+    """
+    sessao num postgres de verdade (POSTGRES_TEST_URL), para o SQL que so
+    ele executa; cada worker do xdist usa um schema proprio e, sem a
+    variavel, o teste e pulado
+    """
+    url = os.environ.get('POSTGRES_TEST_URL')
+    if not url:
+        pytest.skip('POSTGRES_TEST_URL is not set')
+
+    schema = f'test_{os.environ.get("PYTEST_XDIST_WORKER", "main")}'
+    admin = create_engine(url)
+    with admin.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {schema} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {schema}'))
+
+    engine = create_engine(
+        url, connect_args={'options': f'-c search_path={schema}'}
+    )
+    table_registry.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        yield session
+
+    engine.dispose()
+    with admin.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+    admin.dispose()
+
+
+@pytest.fixture()
+def postgres_client(postgres_session):
+    def get_session_override():
+        return SyncSession(postgres_session)
+
+    with TestClient(app) as client:
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        yield client
+
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def postgres_user(postgres_session):
+    password = 'testtest'
+    user = UserFactory(password=get_password_hash(password))
+
+    postgres_session.add(user)
+    postgres_session.commit()
+    postgres_session.refresh(user)
+
+    user.clean_password = password
+
+    return user
+
+
+@pytest.fixture()
+def postgres_token(postgres_client, postgres_user):
+    response = postgres_client.post(
+        '/auth/token',
+        data={
+            'username': postgres_user.email,
+            'password': postgres_user.clean_password,
+        },
+    )
+    return response.json()['access_token']
+
+
+@pytest.fixture()
+def count_queries(session):
+    """
+    conta os comandos SQL executados dentro do bloco:
+    with count_queries() as queries: ...; assert len(queries) == n
+    """
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(session.bind, 'before_cursor_execute', on_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(session.bind, 'before_cursor_execute', on_execute)
+
+    return counter
+
+
+@pytest.fixture()
+def internal_headers(monkeypatch):
+    """headers das rotas /internal, com o token configurado"""
+    monkeypatch.setattr(settings, 'INTERNAL_API_TOKEN', 'internal-token')
+    return {'X-Internal-Token': 'internal-token'}
+
+
 @pytest.fixture()
 def token(client, user):
     response = client.post(
@@ -95,12 +224,14 @@ def book(session, user, author):
     session.add(book)
     session.commit()
     session.refresh(book)
+    session.refresh(book, ['author'])
 
     return book
 
 
 @pytest.fixture()
 def user_with_collection(session, user, book):
+    session.refresh(user, ['collection'])
     user.collection.append(book)
     session.commit()
     session.refresh(user)
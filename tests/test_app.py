@@ -27,6 +27,10 @@ def test_book_and_author_created_by_a_user(
 
     session.add_all([author, book])
     session.commit()
+    # os relacionamentos sao lazy='raise': carregados explicitamente
+    session.refresh(user, ['authors_created', 'books_created'])
+    session.refresh(author, ['created_by'])
+    session.refresh(book, ['created_by'])
 
     assert author.created_by == user
     assert author in user.authors_created
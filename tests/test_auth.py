@@ -1,8 +1,13 @@
 from http import HTTPStatus
 
 from freezegun import freeze_time
+from jwt import decode
 
-from estante_digital.security import create_access_token
+from estante_digital.security import (
+    create_access_token,
+    hash_pool,
+    settings,
+)
 
 
 def test_get_token(client, user):
@@ -120,3 +125,126 @@ def test_token_without_valid_username(client):
 
     assert response.status_code == HTTPStatus.UNAUTHORIZED
     assert response.json()['detail'] == 'Could not validate credentials'
+
+
+def test_login_returns_503_when_hash_pool_is_saturated(
+    client, user, monkeypatch
+):
+    monkeypatch.setattr(hash_pool, 'max_pending', 0)
+
+    response = client.post(
+        '/auth/token',
+        data={'username': user.email, 'password': user.clean_password},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers['Retry-After'] == str(hash_pool.retry_after)
+
+
+def test_token_carries_user_id_and_version(client, user, token):
+    payload = decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+
+    assert payload['sub'] == str(user.id)
+    assert payload['ver'] == user.token_version
+
+
+def test_token_survives_email_change(client, user, token):
+    response = client.put(
+        f'/user/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'username': user.username,
+            'email': 'new@test.com',
+            'password': user.clean_password,
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.post(
+        '/auth/refresh_token',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_password_change_revokes_token(client, user, token):
+    response = client.put(
+        f'/user/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'username': user.username,
+            'email': user.email,
+            'password': 'newpassword',
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.post(
+        '/auth/refresh_token',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_legacy_email_token_still_accepted(client, user):
+    token = create_access_token({'sub': user.email})
+
+    response = client.post(
+        '/auth/refresh_token',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_legacy_email_token_rejected_after_window(client, user, monkeypatch):
+    monkeypatch.setattr(settings, 'LEGACY_EMAIL_TOKENS', False)
+    token = create_access_token({'sub': user.email})
+
+    response = client.post(
+        '/auth/refresh_token',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_read_routes_check_the_cached_user(client, user, token, count_queries):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/books', headers=headers)
+
+    with count_queries() as queries:
+        response = client.get('/books', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert not [query for query in queries if 'FROM users' in query]
+
+
+def test_password_change_revokes_token_on_read_routes(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/books', headers=headers).status_code == HTTPStatus.OK
+
+    client.put(
+        f'/user/{user.id}',
+        headers=headers,
+        json={
+            'username': user.username,
+            'email': user.email,
+            'password': 'newpassword',
+        },
+    )
+
+    response = client.get('/books', headers=headers)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_deleted_account_loses_read_access(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/collection', headers=headers).status_code == (
+        HTTPStatus.OK
+    )
+
+    client.delete(f'/user/{user.id}', headers=headers)
+
+    response = client.get('/collection', headers=headers)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
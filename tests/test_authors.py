@@ -5,7 +5,7 @@ from sqlalchemy.orm import Session
 
 from estante_digital.models import Author, User
 from estante_digital.schemas import Token
-from tests.factories import AuthorFactory
+from tests.factories import AuthorFactory, BookFactory
 
 
 def test_create_author(client: TestClient, token: Token):
@@ -59,6 +59,7 @@ def test_read_one_author(client: TestClient, token: Token, author: Author):
     assert response.json() == {
         'id': author.id,
         'name': author.name,
+        'book_count': 0,
         'books': [],
     }
 
@@ -70,3 +71,112 @@ def test_read_one_author_not_found(client: TestClient, token: Token):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json()['detail'] == 'Author not found'
+
+
+def test_full_text_search_authors(
+    client: TestClient, session: Session, token: Token, user: User
+):
+    for name in ['machado de assis', 'clarice lispector', 'jorge amado']:
+        author = AuthorFactory(name=name)
+        author.created_by = user
+        session.add(author)
+    session.commit()
+
+    response = client.get(
+        '/authors?q=lispec', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert [a['name'] for a in response.json()['authors']] == [
+        'clarice lispector'
+    ]
+
+
+def test_list_authors_paginates_by_name(
+    client: TestClient, session: Session, token: Token, user: User
+):
+    for name in ['jorge amado', 'clarice lispector', 'machado de assis']:
+        author = AuthorFactory(name=name)
+        author.created_by = user
+        session.add(author)
+    session.commit()
+
+    headers = {'Authorization': f'Bearer {token}'}
+    first = client.get('/authors?sort=name&limit=2', headers=headers).json()
+    second = client.get(
+        '/authors',
+        params={'sort': 'name', 'cursor': first['next_cursor']},
+        headers=headers,
+    ).json()
+
+    assert [a['name'] for a in first['authors']] == [
+        'clarice lispector',
+        'jorge amado',
+    ]
+    assert [a['name'] for a in second['authors']] == ['machado de assis']
+    assert second['next_cursor'] is None
+
+
+def test_list_authors_cursor_from_other_sort(
+    client: TestClient, session: Session, token: Token, user: User
+):
+    for _ in range(2):
+        author = AuthorFactory()
+        author.created_by = user
+        session.add(author)
+    session.commit()
+
+    headers = {'Authorization': f'Bearer {token}'}
+    cursor = client.get('/authors?limit=1', headers=headers).json()[
+        'next_cursor'
+    ]
+    response = client.get(
+        '/authors', params={'sort': 'name', 'cursor': cursor}, headers=headers
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_read_author_loads_books_in_one_query(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    author: Author,
+    count_queries,
+):
+    for _ in range(5):
+        book = BookFactory()
+        book.author = author
+        book.created_by_id = author.created_by_id
+        session.add(book)
+    session.commit()
+    url = f'/authors/{author.id}'
+    # a autenticacao le o usuario so no miss do user_cache
+    client.get('/collection', headers={'Authorization': f'Bearer {token}'})
+
+    with count_queries() as queries:
+        response = client.get(
+            url, headers={'Authorization': f'Bearer {token}'}
+        )
+
+    assert len(response.json()['books']) == 5  # noqa: PLR2004
+    assert len(queries) == 2  # noqa: PLR2004
+
+
+def test_read_author_not_modified_until_new_book(
+    client: TestClient, session: Session, token: Token, author: Author
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get(f'/authors/{author.id}', headers=headers).headers['etag']
+    conditional = {**headers, 'If-None-Match': etag}
+
+    unchanged = client.get(f'/authors/{author.id}', headers=conditional)
+    client.post(
+        '/books',
+        headers=headers,
+        json={'title': 'new', 'year': 2024, 'author_id': author.id},
+    )
+    changed = client.get(f'/authors/{author.id}', headers=conditional)
+
+    assert unchanged.status_code == HTTPStatus.NOT_MODIFIED
+    assert changed.status_code == HTTPStatus.OK
+    assert changed.json()['book_count'] == 1
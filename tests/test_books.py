@@ -1,9 +1,16 @@
+import asyncio
 from http import HTTPStatus
 
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from estante_digital.database import settings
+from estante_digital.importer import Importer
 from estante_digital.models import Author, Book, User
+from estante_digital.pagination import encode_cursor
+from estante_digital.response_cache import response_cache
 from estante_digital.schemas import Token
 from tests.factories import AuthorFactory, BookFactory
 
@@ -169,3 +176,320 @@ def test_get_one_book_not_found(client: TestClient, token: Token):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json()['detail'] == 'Book not found'
+
+
+def test_full_text_search_ranks_books(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    author: Author,
+    user: User,
+):
+    # o mais relevante (o termo duas vezes) e cadastrado depois
+    titles = ['o senhor dos aneis', 'aneis aneis de saturno', 'dom casmurro']
+    ids = {}
+    for title in titles:
+        book = BookFactory(title=title)
+        book.author = author
+        book.created_by = user
+        session.add(book)
+        session.flush()
+        ids[title] = book.id
+    session.commit()
+
+    response = client.get(
+        '/books?q=ANEIS', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert [b['id'] for b in response.json()['books']] == [
+        ids['aneis aneis de saturno'],
+        ids['o senhor dos aneis'],
+    ]
+
+
+def test_full_text_search_matches_word_prefixes(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    book: Book,
+):
+    book.title = 'memorias postumas de bras cubas'
+    session.commit()
+
+    response = client.get(
+        '/books?q=postum bras', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert [b['id'] for b in response.json()['books']] == [book.id]
+
+
+def test_full_text_search_without_terms_returns_nothing(
+    client: TestClient, token: Token, book: Book
+):
+    response = client.get(
+        '/books?q=%22%2A', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.json()['books'] == []
+
+
+def test_list_books_paginates_with_cursor(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    author: Author,
+    user: User,
+):
+    for year in [2001, 1999, 2001, 1990, 2010]:
+        book = BookFactory(year=year)
+        book.author = author
+        book.created_by = user
+        session.add(book)
+    session.commit()
+
+    headers = {'Authorization': f'Bearer {token}'}
+    years, cursor = [], None
+    while True:
+        params = {'sort': 'year', 'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        data = client.get('/books', params=params, headers=headers).json()
+        years += [b['year'] for b in data['books']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+
+    assert years == [1990, 1999, 2001, 2001, 2010]
+
+
+def test_list_books_enforces_page_size(  # noqa
+    client: TestClient,
+    session: Session,
+    token: Token,
+    author: Author,
+    user: User,
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, 'PAGE_SIZE_DEFAULT', 2)
+    monkeypatch.setattr(settings, 'PAGE_SIZE_MAX', 3)
+    for _ in range(5):
+        book = BookFactory()
+        book.author = author
+        book.created_by = user
+        session.add(book)
+    session.commit()
+
+    headers = {'Authorization': f'Bearer {token}'}
+    default = client.get('/books', headers=headers).json()
+    maximum = client.get('/books?limit=100', headers=headers).json()
+
+    assert len(default['books']) == 2  # noqa: PLR2004
+    assert len(maximum['books']) == 3  # noqa: PLR2004
+    assert maximum['next_cursor'] is not None
+
+
+def test_list_books_offset_compatibility(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    author: Author,
+    user: User,
+):
+    for _ in range(3):
+        book = BookFactory()
+        book.author = author
+        book.created_by = user
+        session.add(book)
+    session.commit()
+
+    response = client.get(
+        '/books?offset=1&limit=1', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert [b['id'] for b in response.json()['books']] == [2]
+
+
+@pytest.mark.parametrize(
+    'cursor',
+    [
+        'xxx',
+        encode_cursor({'by': ['id'], 'after': [{'a': 1}]}),
+        encode_cursor({'by': ['id'], 'after': [[1]]}),
+        encode_cursor({'by': ['id'], 'after': [True]}),
+        encode_cursor({'by': ['id'], 'after': ['1']}),
+        encode_cursor({'by': ['id'], 'after': [1.5]}),
+        encode_cursor({'offset': True}),
+        encode_cursor({'offset': -1}),
+    ],
+)
+def test_list_books_invalid_cursor(
+    client: TestClient, token: Token, book: Book, cursor: str
+):
+    response = client.get(
+        '/books',
+        params={'cursor': cursor},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json()['detail'] == 'Invalid cursor'
+
+
+def test_list_books_loads_authors_in_one_query(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user: User,
+    count_queries,
+):
+    for _ in range(5):
+        author = AuthorFactory()
+        author.created_by = user
+        book = BookFactory()
+        book.author = author
+        book.created_by = user
+        session.add_all([author, book])
+    session.commit()
+    # a autenticacao le o usuario so no miss do user_cache
+    client.get('/collection', headers={'Authorization': f'Bearer {token}'})
+
+    with count_queries() as queries:
+        response = client.get(
+            '/books', headers={'Authorization': f'Bearer {token}'}
+        )
+
+    assert len(response.json()['books']) == 5  # noqa: PLR2004
+    assert len(queries) == 1
+
+
+def test_import_books(client: TestClient, session: Session, token: Token):
+    content = 'title,year,author\nsagarana,1946,guimaraes rosa\nx,abc,y\n'
+
+    response = client.post(
+        '/books/import',
+        files={'file': ('books.csv', content, 'text/csv')},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'read': 2,
+        'authors_created': 1,
+        'books_created': 1,
+        'errors': 1,
+        'rejected': [{'line': 3, 'error': 'Invalid year'}],
+    }
+    assert session.scalar(select(Book.title)) == 'sagarana'
+
+
+def test_import_books_parses_off_the_event_loop(
+    client: TestClient, token: Token, monkeypatch
+):
+    loops = []
+    next_chunk = Importer.next_chunk
+
+    def recording_next_chunk(self, records):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return next_chunk(self, records)
+
+    monkeypatch.setattr(Importer, 'next_chunk', recording_next_chunk)
+    content = 'title,year,author\nsagarana,1946,guimaraes rosa\n'
+
+    response = client.post(
+        '/books/import',
+        files={'file': ('books.csv', content, 'text/csv')},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.json()['books_created'] == 1
+    # um lote e a chamada que encontra o fim do arquivo, ambas no threadpool
+    assert loops == [None, None]
+
+
+def test_create_book_query_count(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    author: Author,
+    count_queries,
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = {'title': 'novo', 'year': 2000, 'author_id': author.id}
+    # o primeiro POST carrega o usuario no cache; sem a instancia
+    # expirada do fixture na sessao, ele vem so do cache
+    client.post('/books', json={**payload, 'title': 'outro'}, headers=headers)
+    session.expunge_all()
+
+    with count_queries() as queries:
+        response = client.post('/books', json=payload, headers=headers)
+
+    # nome do autor e o INSERT ... RETURNING, sem SELECT de duplicidade
+    assert response.status_code == HTTPStatus.CREATED
+    assert len(queries) == 2  # noqa: PLR2004
+
+
+def test_list_books_sorted_by_collectors(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    author: Author,
+    user: User,
+):
+    books = []
+    for _ in range(3):
+        book = BookFactory()
+        book.author = author
+        book.created_by = user
+        session.add(book)
+        books.append(book)
+    session.commit()
+    ids = [book.id for book in books]
+
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post(f'/collection/add/{ids[1]}', headers=headers)
+
+    response = client.get('/books?sort=collectors', headers=headers)
+
+    assert [
+        (b['id'], b['collector_count']) for b in response.json()['books']
+    ] == [(ids[1], 1), (ids[2], 0), (ids[0], 0)]
+
+
+def test_get_one_book_not_modified(
+    client: TestClient, token: Token, book: Book, count_queries
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    first = client.get(f'/books/{book.id}', headers=headers)
+    etag = first.headers['etag']
+    response_cache.clear()  # o 304 vem da versao, nao do cache
+
+    with count_queries() as queries:
+        response = client.get(
+            f'/books/{book.id}', headers={**headers, 'If-None-Match': etag}
+        )
+
+    assert etag.startswith('W/')
+    assert 'last-modified' in first.headers
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['etag'] == etag
+    assert not response.content
+    assert len(queries) == 1  # so a versao
+
+
+def test_book_etag_changes_with_collectors(
+    client: TestClient, token: Token, book: Book
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get(f'/books/{book.id}', headers=headers).headers['etag']
+
+    client.post(f'/collection/add/{book.id}', headers=headers)
+    response = client.get(
+        f'/books/{book.id}', headers={**headers, 'If-None-Match': etag}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['etag'] != etag
+    assert response.json()['collector_count'] == 1
@@ -0,0 +1,46 @@
+from freezegun import freeze_time
+
+from estante_digital.cache import TTLCache
+
+
+def test_cache_hit_and_miss():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    assert cache.get('a') is None
+    cache.set('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 'a')
+    cache.set('b', 'b')
+    cache.get('a')
+    cache.set('c', 'c')
+
+    assert cache.get('a') == 'a'
+    assert cache.get('b') is None
+    assert cache.get('c') == 'c'
+
+
+def test_cache_entry_expires_after_ttl():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    with freeze_time('2024-01-01 12:00:00') as frozen:
+        cache.set('a', 1)
+        frozen.tick(59)
+        assert cache.get('a') == 1
+        frozen.tick(2)
+        assert cache.get('a') is None
+
+    assert cache.stats()['size'] == 0
+
+
+def test_cache_disabled_with_zero_maxsize():
+    cache = TTLCache(maxsize=0, ttl=60)
+    cache.set('a', 1)
+
+    assert cache.get('a') is None
@@ -1,17 +1,23 @@
 from http import HTTPStatus
 
 from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
 
-from estante_digital.models import Book, User
+from estante_digital.database import settings
+from estante_digital.models import Author, Book, User, user_collection_table
 from estante_digital.schemas import Token
+from tests.factories import AuthorFactory, BookFactory
 
 
 def test_read_collection(
     client: TestClient,
+    session: Session,
     token: Token,
     user_with_collection: User,
     book: Book,
 ):
+    session.refresh(book, ['author'])
     response = client.get(
         '/collection', headers={'Authorization': f'Bearer {token}'}
     )
@@ -54,6 +60,29 @@ def test_add_book_already_on_collection(
     assert response.json()['detail'] == 'Book already on collection'
 
 
+def test_add_book_already_on_collection_on_postgres(
+    postgres_session, postgres_client, postgres_token, postgres_user
+):
+    author = AuthorFactory()
+    author.created_by = postgres_user
+    book = BookFactory()
+    book.author = author
+    book.created_by = postgres_user
+    postgres_session.add(book)
+    postgres_session.commit()
+    headers = {'Authorization': f'Bearer {postgres_token}'}
+
+    first = postgres_client.post(f'/collection/add/{book.id}', headers=headers)
+    second = postgres_client.post(
+        f'/collection/add/{book.id}', headers=headers
+    )
+
+    # o ON CONFLICT DO NOTHING do psycopg devolve rowcount -1 nos dois
+    assert first.status_code == HTTPStatus.OK
+    assert second.status_code == HTTPStatus.BAD_REQUEST
+    assert second.json()['detail'] == 'Book already on collection'
+
+
 def test_add_unexisted_book_to_collection(client: TestClient, token: Token):
     response = client.post(
         '/collection/add/2',
@@ -131,3 +160,262 @@ def test_combined_actions_on_collection(
     r = response.json()
     assert response.status_code == HTTPStatus.OK
     assert r['message'] == f'Book {book.title} removed from collection'
+
+
+def test_read_collection_query_count_does_not_grow(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user: User,
+    count_queries,
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    counts = []
+    for _ in range(2):
+        for _ in range(3):
+            author = AuthorFactory()
+            author.created_by = user
+            book = BookFactory()
+            book.author = author
+            book.created_by = user
+            session.add_all([author, book])
+            session.flush()
+            client.post(f'/collection/add/{book.id}', headers=headers)
+
+        with count_queries() as queries:
+            client.get('/collection', headers=headers)
+        counts.append(len(queries))
+
+    # versao da colecao (ETag) e a pagina
+    assert counts == [2, 2]
+
+
+def _add_books(client, session, token, user, years):
+    headers = {'Authorization': f'Bearer {token}'}
+    author = AuthorFactory()
+    author.created_by = user
+    session.add(author)
+    for year in years:
+        book = BookFactory(year=year)
+        book.author = author
+        book.created_by = user
+        session.add(book)
+        session.commit()
+        client.post(f'/collection/add/{book.id}', headers=headers)
+
+    return author
+
+
+def test_read_collection_paginates_with_cursor(
+    client: TestClient, session: Session, token: Token, user: User
+):
+    _add_books(client, session, token, user, [2005, 1990, 2010, 1990])
+
+    headers = {'Authorization': f'Bearer {token}'}
+    first = client.get('/collection?sort=year&limit=3', headers=headers).json()
+    second = client.get(
+        '/collection',
+        params={'sort': 'year', 'limit': 3, 'cursor': first['next_cursor']},
+        headers=headers,
+    ).json()
+
+    assert [b['year'] for b in first['collection']] == [1990, 1990, 2005]
+    assert [b['year'] for b in second['collection']] == [2010]
+    assert second['next_cursor'] is None
+
+
+def test_read_collection_filters(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user: User,
+    other_user: User,
+):
+    author = _add_books(client, session, token, user, [2000, 2001])
+    _add_books(client, session, token, user, [2000])
+    # livros que so estao na colecao de outro usuario nao aparecem
+    book = BookFactory(year=2000)
+    book.author = author
+    book.created_by = other_user
+    session.add(book)
+    session.commit()
+
+    headers = {'Authorization': f'Bearer {token}'}
+    by_year = client.get('/collection?year=2000', headers=headers).json()
+    by_author = client.get(
+        f'/collection?author_id={author.id}&year=2000', headers=headers
+    ).json()
+
+    assert len(by_year['collection']) == 2  # noqa: PLR2004
+    assert len(by_author['collection']) == 1
+
+
+def test_add_and_remove_query_count_ignores_collection_size(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user: User,
+    count_queries,
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    author = _add_books(client, session, token, user, [2000] * 20)
+    book = BookFactory()
+    book.author = author
+    book.created_by = user
+    session.add(book)
+    session.commit()
+    book_id = book.id
+
+    with count_queries() as added:
+        client.post(f'/collection/add/{book_id}', headers=headers)
+    with count_queries() as removed:
+        client.delete(f'/collection/remove/{book_id}', headers=headers)
+
+    # busca o titulo e um unico INSERT / DELETE
+    assert len(added) == 2  # noqa: PLR2004
+    assert len(removed) == 2  # noqa: PLR2004
+
+
+def test_batch_collection(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user_with_collection: User,
+    book: Book,
+):
+    other = BookFactory()
+    other.author_id = book.author_id
+    other.created_by_id = book.created_by_id
+    session.add(other)
+    session.commit()
+
+    response = client.post(
+        '/collection/batch',
+        json={
+            'operations': [
+                {'action': 'add', 'book_id': other.id},
+                {'action': 'add', 'book_id': book.id},
+                {'action': 'remove', 'book_id': book.id},
+                {'action': 'remove', 'book_id': book.id},
+                {'action': 'add', 'book_id': 999},
+            ]
+        },
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [
+        (r['status'], r['detail']) for r in response.json()['results']
+    ] == [
+        (HTTPStatus.OK, f'Book {other.title} added to collection'),
+        (HTTPStatus.BAD_REQUEST, 'Book already on collection'),
+        (HTTPStatus.OK, f'Book {book.title} removed from collection'),
+        (HTTPStatus.NOT_FOUND, 'Book not in collection'),
+        (HTTPStatus.NOT_FOUND, 'Book not found'),
+    ]
+
+    collection = client.get(
+        '/collection', headers={'Authorization': f'Bearer {token}'}
+    ).json()['collection']
+    assert [b['id'] for b in collection] == [other.id]
+
+
+def test_batch_collection_limit(client: TestClient, token: Token):
+    operations = [{'action': 'add', 'book_id': 1}] * (
+        settings.COLLECTION_BATCH_MAX + 1
+    )
+
+    response = client.post(
+        '/collection/batch',
+        json={'operations': operations},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json()['detail'][0]['type'] == 'too_long'
+
+
+def test_read_collection_etag(client: TestClient, token: Token, book: Book):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get('/collection', headers=headers).headers['etag']
+    conditional = {**headers, 'If-None-Match': etag}
+
+    unchanged = client.get('/collection', headers=conditional)
+    other_query = client.get('/collection?sort=year', headers=conditional)
+    client.post(f'/collection/add/{book.id}', headers=headers)
+    changed = client.get('/collection', headers=conditional)
+
+    assert unchanged.status_code == HTTPStatus.NOT_MODIFIED
+    assert unchanged.headers['cache-control'] == 'private, no-cache'
+    assert other_query.status_code == HTTPStatus.OK
+    assert changed.status_code == HTTPStatus.OK
+    assert len(changed.json()['collection']) == 1
+
+
+def test_collection_etag_follows_the_collected_books(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    other_user: User,
+    book: Book,
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post(f'/collection/add/{book.id}', headers=headers)
+    etag = client.get('/collection', headers=headers).headers['etag']
+
+    # outro usuario coleciona o mesmo livro
+    session.execute(
+        insert(user_collection_table).values(
+            user_id=other_user.id, book_id=book.id
+        )
+    )
+    session.commit()
+    collected = client.get(
+        '/collection', headers={**headers, 'If-None-Match': etag}
+    )
+
+    session.execute(update(Author).values(name='outro nome'))
+    session.commit()
+    renamed = client.get(
+        '/collection',
+        headers={**headers, 'If-None-Match': collected.headers['etag']},
+    )
+
+    assert collected.status_code == HTTPStatus.OK
+    assert collected.json()['collection'][0]['collector_count'] == 2  # noqa: PLR2004
+    assert renamed.status_code == HTTPStatus.OK
+    assert renamed.json()['collection'][0]['author']['name'] == 'outro nome'
+
+
+def test_collection_etag_reads_only_the_page(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user: User,
+    count_queries,
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    _add_books(client, session, token, user, [2001, 2002])
+    first, second = session.scalars(select(Book.id).order_by(Book.id))
+    etag = client.get('/collection?limit=1', headers=headers).headers['etag']
+    conditional = {**headers, 'If-None-Match': etag}
+
+    # o livro fora da pagina muda: a pagina continua a mesma
+    session.execute(
+        update(Book).where(Book.id == second).values(title='fora da pagina')
+    )
+    session.commit()
+    with count_queries() as queries:
+        outside = client.get('/collection?limit=1', headers=conditional)
+
+    session.execute(
+        update(Book).where(Book.id == first).values(title='outro titulo')
+    )
+    session.commit()
+    inside = client.get('/collection?limit=1', headers=conditional)
+
+    assert outside.status_code == HTTPStatus.NOT_MODIFIED
+    # nada agrega a colecao inteira
+    assert not any('sum(' in query.lower() for query in queries)
+    assert inside.status_code == HTTPStatus.OK
+    assert inside.json()['collection'][0]['title'] == 'outro titulo'
@@ -0,0 +1,182 @@
+import asyncio
+import gzip
+from http import HTTPStatus
+
+import pytest
+
+from estante_digital import compression as compression_module
+from estante_digital.compression import ENCODINGS, compress, negotiate
+from estante_digital.database import settings
+from estante_digital.response_cache import (
+    body_digest,
+    decode_entry,
+    encode_entry,
+    response_cache,
+)
+
+
+@pytest.fixture()
+def _small_threshold(monkeypatch):
+    monkeypatch.setattr(settings, 'COMPRESSION_MINIMUM_SIZE', 10)
+
+
+@pytest.mark.parametrize(
+    ('accept_encoding', 'expected'),
+    [
+        (None, None),
+        ('identity', None),
+        ('gzip', 'gzip'),
+        ('deflate, gzip;q=0.5', 'gzip'),
+        ('gzip;q=0', None),
+        ('*', next(iter(ENCODINGS))),
+        ('*, gzip;q=0', next(iter(ENCODINGS)) if len(ENCODINGS) > 1 else None),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding) == expected
+
+
+def test_gzip_is_deterministic():
+    body = b'{"books": []}' * 10
+
+    assert compress(body, 'gzip') == compress(body, 'gzip')
+    assert gzip.decompress(compress(body, 'gzip')) == body
+
+
+@pytest.mark.usefixtures('_small_threshold')
+def test_large_responses_are_compressed(client, token, book):
+    response = client.get(
+        '/collection/',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Accept-Encoding': 'gzip',
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert response.json() == {'collection': [], 'next_cursor': None}
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'content-encoding' not in response.headers
+    assert response.json() == {'message': 'Olá Mundo!'}
+
+
+@pytest.mark.usefixtures('_small_threshold')
+def test_identity_is_not_compressed(client, token, book):
+    response = client.get(
+        '/collection/',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Accept-Encoding': 'identity',
+        },
+    )
+
+    assert 'content-encoding' not in response.headers
+
+
+@pytest.mark.usefixtures('_small_threshold')
+def test_cached_responses_keep_the_compressed_body(
+    client, token, book, monkeypatch
+):
+    calls = []
+
+    def counting_compress(body, encoding):
+        calls.append(encoding)
+        return compress(body, encoding)
+
+    monkeypatch.setattr(compression_module, 'compress', counting_compress)
+    headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip'}
+
+    first = client.get(f'/books/{book.id}', headers=headers)
+    second = client.get(f'/books/{book.id}', headers=headers)
+
+    assert first.headers['content-encoding'] == 'gzip'
+    assert second.headers['content-encoding'] == 'gzip'
+    assert second.json() == first.json()
+    assert calls == ['gzip']  # so na primeira
+    assert response_cache.stats()['entries'] == 2  # noqa: PLR2004
+
+
+@pytest.mark.usefixtures('_small_threshold')
+def test_compressed_entries_are_invalidated_with_the_response(
+    client, token, book
+):
+    headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip'}
+    client.get(f'/books/{book.id}', headers=headers)
+    assert response_cache.stats()['entries'] == 2  # noqa: PLR2004
+
+    client.post(f'/collection/add/{book.id}', headers=headers)
+    assert response_cache.stats()['entries'] == 0
+
+    response = client.get(f'/books/{book.id}', headers=headers)
+    assert response.json()['collector_count'] == 1
+
+
+@pytest.mark.usefixtures('_small_threshold')
+def test_compressed_variants_follow_the_body(client, token, book):
+    headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip'}
+    first = client.get(f'/books/{book.id}', headers=headers)
+    assert first.json()['title'] == book.title
+
+    # a entrada muda sem a invalidacao levar a variante comprimida junto
+    # (outro worker, corrida com uma leitura antiga)
+    key = f'GET /books/{book.id}?'
+    body, entry_headers, tags, _ = decode_entry(
+        response_cache.backend.get(key)
+    )
+    body = body.replace(book.title.encode(), b'outro titulo')
+    response_cache.backend.set(
+        key,
+        encode_entry(body, entry_headers, tags, body_digest(body)),
+        30,
+        tags,
+    )
+
+    second = client.get(f'/books/{book.id}', headers=headers)
+
+    assert second.headers['content-encoding'] == 'gzip'
+    assert second.json()['title'] == 'outro titulo'
+
+
+def _on_the_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@pytest.mark.usefixtures('_small_threshold')
+@pytest.mark.parametrize('path', ['/collection/', '/books/{id}'])
+@pytest.mark.parametrize(
+    ('threadpool_min_size', 'on_the_loop'), [(10, False), (10**9, True)]
+)
+def test_large_bodies_are_compressed_off_the_event_loop(  # noqa: PLR0913, PLR0917
+    client, token, book, monkeypatch, path, threadpool_min_size, on_the_loop
+):
+    monkeypatch.setattr(
+        settings, 'COMPRESSION_THREADPOOL_MIN_SIZE', threadpool_min_size
+    )
+    calls = []
+
+    def recording_compress(body, encoding):
+        calls.append(_on_the_event_loop())
+        return compress(body, encoding)
+
+    monkeypatch.setattr(compression_module, 'compress', recording_compress)
+
+    response = client.get(
+        path.format(id=book.id),
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Accept-Encoding': 'gzip',
+        },
+    )
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert calls == [on_the_loop]
@@ -0,0 +1,66 @@
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from estante_digital.counters import reconcile_counters
+from estante_digital.models import Author, Book, User
+from tests.factories import BookFactory
+
+
+def test_counters_follow_books_and_collections(
+    session: Session, user: User, other_user: User, book: Book
+):
+    other = BookFactory()
+    other.author_id = book.author_id
+    other.created_by_id = user.id
+    session.add(other)
+    session.commit()
+    session.refresh(user, ['collection'])
+    session.refresh(other_user, ['collection'])
+    user.collection.append(book)
+    other_user.collection.append(book)
+    session.commit()
+
+    collectors = select(Book.collector_count).where(Book.id == book.id)
+    assert session.scalar(select(Author.book_count)) == 2  # noqa: PLR2004
+    assert session.scalar(collectors) == 2  # noqa: PLR2004
+
+    session.refresh(user, ['collection'])
+    user.collection.remove(book)
+    session.delete(other)
+    session.commit()
+
+    assert session.scalar(select(Author.book_count)) == 1
+    assert session.scalar(collectors) == 1
+
+
+def test_versions_follow_row_updates(session: Session, book: Book):
+    def versions():
+        return session.execute(
+            select(Book.version, Author.version).join(Book.author)
+        ).one()
+
+    book_version, author_version = versions()
+
+    session.execute(update(Book).values(title='novo titulo'))
+    session.commit()
+    # o livro aparece na lista de livros do autor
+    assert versions() == (book_version + 1, author_version + 1)
+
+    session.execute(update(Author).values(name='novo nome'))
+    session.commit()
+    # o nome do autor aparece no livro
+    assert versions() == (book_version + 2, author_version + 2)
+
+    session.execute(update(Book).values(title='novo titulo'))
+    session.commit()
+    assert versions() == (book_version + 2, author_version + 2)
+
+
+def test_reconcile_counters_fixes_drift(session: Session, book: Book):
+    session.execute(update(Author).values(book_count=10))
+    session.commit()
+
+    fixed = reconcile_counters(session)
+
+    assert fixed == {'authors.book_count': 1, 'books.collector_count': 0}
+    assert session.scalar(select(Author.book_count)) == 1
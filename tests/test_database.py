@@ -0,0 +1,89 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import NullPool, create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from estante_digital import database
+from estante_digital.app import app
+from estante_digital.database import enable_foreign_keys, session_for
+from estante_digital.models import table_registry
+
+
+@pytest.fixture()
+def async_client(tmp_path, monkeypatch):
+    """
+    app com o engine async de producao (DATABASE_ASYNC), sobre aiosqlite;
+    get_session e get_read_session rodam sem override
+    """
+    path = tmp_path / 'async.db'
+    sync_engine = create_engine(f'sqlite:///{path}')
+    table_registry.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    # cada loop do TestClient abre as proprias conexoes
+    engine = enable_foreign_keys(
+        create_async_engine(f'sqlite+aiosqlite:///{path}', poolclass=NullPool)
+    )
+    monkeypatch.setattr(database, 'engine', engine)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_session_for_async_engine():
+    engine = create_async_engine('sqlite+aiosqlite://')
+
+    assert isinstance(session_for(engine), AsyncSession)
+
+
+def test_routes_with_async_engine(async_client, internal_headers):
+    async_client.post(
+        '/user/',
+        json={'username': 'a', 'email': 'a@a.com', 'password': 'secret'},
+    )
+    token = async_client.post(
+        '/auth/token', data={'username': 'a@a.com', 'password': 'secret'}
+    ).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    author = async_client.post(
+        '/authors/', json={'name': 'machado'}, headers=headers
+    ).json()
+    book_id = async_client.post(
+        '/books/',
+        json={'title': 'dom', 'year': 1899, 'author_id': author['id']},
+        headers=headers,
+    ).json()['id']
+    added = async_client.post(f'/collection/add/{book_id}', headers=headers)
+    collection = async_client.get('/collection/', headers=headers)
+    detail = async_client.get(f'/books/{book_id}', headers=headers)
+
+    imported = async_client.post(
+        '/books/import',
+        files={'file': ('b.csv', 'title,year,author\nsagarana,1946,rosa\n')},
+        headers=headers,
+    )
+
+    assert added.status_code == HTTPStatus.OK
+    assert [b['id'] for b in collection.json()['collection']] == [book_id]
+    assert detail.json()['collector_count'] == 1
+    assert imported.json()['books_created'] == 1
+
+    updated = async_client.put(
+        '/user/1',
+        json={'username': 'b', 'email': 'a@a.com', 'password': 'secret'},
+        headers=headers,
+    )
+    deleted = async_client.delete('/user/1', headers=headers)
+
+    # a limpeza roda num engine sincrono no mesmo banco
+    job = async_client.get(
+        f'/internal/purge-jobs/{deleted.json()["job_id"]}',
+        headers=internal_headers,
+    )
+
+    assert updated.json()['username'] == 'b'
+    assert deleted.status_code == HTTPStatus.ACCEPTED
+    assert job.json()['status'] == 'done'
@@ -0,0 +1,94 @@
+import json
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from estante_digital import importer
+from estante_digital.importer import Importer, read_records
+from estante_digital.models import Author, Book, User
+
+
+def test_import_creates_authors_and_books(session: Session, user: User):
+    lines = [
+        'title,year,author\n',
+        'Dom  Casmurro,1899,Machado de Assis\n',
+        'Quincas Borba,1891,machado de assis\n',
+        ',,Clarice Lispector\n',
+    ]
+    progress = []
+
+    summary = Importer(
+        session, user.id, chunk_size=2, on_progress=progress.append
+    ).run(read_records(lines, 'csv'))
+
+    books = session.scalars(select(Book).order_by(Book.id)).all()
+    authors = session.scalars(select(Author.name).order_by(Author.id)).all()
+    assert [(b.title, b.year) for b in books] == [
+        ('dom casmurro', 1899),
+        ('quincas borba', 1891),
+    ]
+    assert authors == ['machado de assis', 'clarice lispector']
+    assert len({b.author_id for b in books}) == 1
+    assert summary.as_dict() == {
+        'read': 3,
+        'authors_created': 2,
+        'books_created': 2,
+        'errors': 0,
+    }
+    assert len(progress) == 2  # noqa: PLR2004
+
+
+def test_import_rejects_invalid_and_duplicated_records(
+    session: Session, user: User, book: Book
+):
+    lines = [
+        json.dumps({'title': book.title, 'year': 2000, 'author': 'x'}),
+        json.dumps({'title': 'novo', 'year': 'abc', 'author': 'x'}),
+        json.dumps({'title': 'novo', 'year': 2000}),
+        '{not json',
+        json.dumps({'title': 'novo', 'year': 2000, 'author': 'x'}),
+        json.dumps({'title': 'NOVO', 'year': 2001, 'author': 'y'}),
+    ]
+    errors = []
+
+    summary = Importer(
+        session, user.id, on_error=lambda *args: errors.append(args)
+    ).run(read_records(lines, 'jsonl'))
+
+    assert [(number, message) for number, _, message in errors] == [
+        (2, 'Invalid year'),
+        (3, 'Author is required'),
+        (4, 'Invalid record'),
+        (6, 'Book already exists'),
+        (1, 'Book already exists'),
+    ]
+    assert summary.books_created == 1
+
+
+def test_import_cli(session: Session, user: User, tmp_path, monkeypatch):
+    source = tmp_path / 'books.jsonl'
+    source.write_text(
+        json.dumps({'title': 'a', 'year': 1, 'author': 'b'})
+        + '\n'
+        + json.dumps({'title': 'a', 'year': 1, 'author': 'b'})
+        + '\n'
+    )
+    errors = tmp_path / 'errors.jsonl'
+    monkeypatch.setattr(importer, 'create_engine', lambda url: session.bind)
+
+    importer.main([
+        str(source),
+        '--user',
+        user.email,
+        '--errors',
+        str(errors),
+    ])
+
+    assert session.scalar(select(Book.title)) == 'a'
+    assert [json.loads(line) for line in errors.read_text().splitlines()] == [
+        {
+            'line': 2,
+            'record': {'title': 'a', 'year': 1, 'author': 'b'},
+            'error': 'Book already exists',
+        }
+    ]
@@ -0,0 +1,37 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_pool_stats(client: TestClient, internal_headers):
+    response = client.get('/internal/pool', headers=internal_headers)
+
+    assert response.status_code == HTTPStatus.OK
+    primary = response.json()['pools']['primary']
+    assert 'checkouts' in primary
+    assert 'wait_time' in primary
+
+
+def test_user_cache_stats(client: TestClient, token, internal_headers):
+    response = client.get('/internal/user-cache', headers=internal_headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert set(response.json()) >= {'hits', 'misses', 'size'}
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Internal-Token': 'wrong'}])
+def test_internal_routes_require_the_token(
+    client: TestClient, internal_headers, headers
+):
+    response = client.get('/internal/pool', headers=headers)
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+def test_internal_routes_disabled_without_token(client: TestClient):
+    response = client.get(
+        '/internal/response-cache', headers={'X-Internal-Token': ''}
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,181 @@
+import asyncio
+import json
+from collections import namedtuple
+from http import HTTPStatus
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from estante_digital.database import SyncSession, settings
+from estante_digital.json_lists import json_page, json_page_query, page_body
+from estante_digital.models import Book
+from estante_digital.pagination import decode_cursor
+from estante_digital.reads import book_json, select_books
+from estante_digital.response_cache import response_cache
+from tests.factories import AuthorFactory, BookFactory
+
+Page = namedtuple('Page', ['items', 'rows', 'last'])
+
+
+class PageSession:
+    """devolve a linha agregada que o postgres devolveria"""
+
+    def __init__(self, page):
+        self.page = page
+
+    async def execute(self, statement):
+        return self
+
+    def one(self):
+        return self.page
+
+
+def test_json_page_query_is_built_by_postgres():
+    statement, size, _ = json_page_query(
+        select_books().where(Book.year == 2024),  # noqa: PLR2004
+        book_json(),
+        [Book.year, Book.id],
+        None,
+        10,
+    )
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert size == 10  # noqa: PLR2004
+    assert 'json_agg(numbered.item ORDER BY numbered.position)' in sql
+    # a posicao vem do mesmo ORDER BY da pagina, nao da ordem de leitura
+    assert 'row_number() OVER (ORDER BY books.year, books.id)' in sql
+    assert 'row_number() OVER (ORDER BY page.ordinal)' in sql
+    assert 'json_build_object' in sql
+    assert 'ORDER BY books.year, books.id' in sql
+    assert 'LIMIT' in sql
+
+
+def test_json_page_builds_cursor_from_last_row():
+    session = PageSession(Page('[{"id": 1}, {"id": 2}]', 3, '[[2024, 2]]'))
+
+    items, cursor = asyncio.run(
+        json_page(
+            session, select_books(), book_json(), [Book.year, Book.id], None, 2
+        )
+    )
+
+    assert items == '[{"id": 1}, {"id": 2}]'
+    assert decode_cursor(cursor) == {'by': ['year', 'id'], 'after': [2024, 2]}
+
+
+def test_json_page_last_page_has_no_cursor():
+    session = PageSession(Page(None, 0, None))
+
+    items, cursor = asyncio.run(
+        json_page(session, select_books(), book_json(), [Book.id], None, 2)
+    )
+
+    assert items == '[]'
+    assert cursor is None
+
+
+def test_page_body():
+    body = page_body('books', '[{"id" : 1}]', None)
+
+    assert json.loads(body) == {'books': [{'id': 1}], 'next_cursor': None}
+
+
+def test_json_lists_fall_back_to_python_on_sqlite(
+    client, token, book, monkeypatch
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    expected = client.get('/books/', headers=headers)
+
+    monkeypatch.setattr(settings, 'DATABASE_JSON_LISTS', True)
+    response_cache.clear()
+    response = client.get('/books/', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.content == expected.content
+
+
+@pytest.fixture()
+def _postgres_catalog(postgres_session, postgres_user):
+    """livros com ids fora da ordem dos anos"""
+    author = AuthorFactory()
+    author.created_by = postgres_user
+    for year in [2003, 2001, 2004, 2002, 2001]:
+        book = BookFactory(year=year)
+        book.author = author
+        book.created_by = postgres_user
+        postgres_session.add(book)
+    postgres_session.commit()
+
+
+def by_year(session):
+    return session.scalars(select(Book.id).order_by(Book.year, Book.id)).all()
+
+
+@pytest.mark.usefixtures('_postgres_catalog')
+def test_json_pages_follow_the_page_order_on_postgres(postgres_session):
+    session = SyncSession(postgres_session)
+    ids, cursor = [], None
+
+    while True:
+        items, cursor = asyncio.run(
+            json_page(
+                session,
+                select_books(),
+                book_json(),
+                [Book.year, Book.id],
+                cursor,
+                2,
+            )
+        )
+        ids += [item['id'] for item in json.loads(items)]
+        if cursor is None:
+            break
+
+    assert ids == by_year(postgres_session)
+
+
+@pytest.mark.usefixtures('_postgres_catalog')
+def test_json_page_with_offset_on_postgres(postgres_session):
+    items, cursor = asyncio.run(
+        json_page(
+            SyncSession(postgres_session),
+            select_books(),
+            book_json(),
+            [Book.year, Book.id],
+            None,
+            2,
+            2,
+        )
+    )
+
+    # a numeracao da pagina recomeca em 1 depois do offset
+    assert [item['id'] for item in json.loads(items)] == (
+        by_year(postgres_session)[2:4]
+    )
+    assert decode_cursor(cursor) == {'offset': 4}
+
+
+@pytest.mark.parametrize(
+    'url',
+    [
+        '/books/?sort=year&limit=2',
+        '/books/?sort=year&limit=2&offset=2',
+        '/books/?q=book&limit=3',
+        '/authors/',
+    ],
+)
+@pytest.mark.usefixtures('_postgres_catalog')
+def test_json_lists_match_the_python_path_on_postgres(
+    postgres_client, postgres_token, monkeypatch, url
+):
+    headers = {'Authorization': f'Bearer {postgres_token}'}
+    expected = postgres_client.get(url, headers=headers)
+
+    monkeypatch.setattr(settings, 'DATABASE_JSON_LISTS', True)
+    response_cache.clear()
+    response = postgres_client.get(url, headers=headers)
+
+    # o postgres formata o JSON com outros espacos; a ordem das listas vale
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == expected.json()
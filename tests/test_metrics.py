@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from estante_digital.metrics import Histogram, PoolMetrics, TimedQueuePool
+
+
+def test_histogram_buckets():
+    histogram = Histogram()
+    histogram.observe(0.5)
+    histogram.observe(30)
+    histogram.observe(20000)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot['buckets']['1'] == 1
+    assert snapshot['buckets']['50'] == 1
+    assert snapshot['buckets']['+Inf'] == 1
+    assert snapshot['max_ms'] == 20000  # noqa: PLR2004
+
+
+def test_pool_metrics_track_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "pool.db"}',
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    metrics = PoolMetrics(engine)
+
+    with engine.connect():
+        snapshot = metrics.snapshot()
+        assert snapshot['checked_out'] == 1
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['checked_out'] == 0
+    assert snapshot['connects'] == 1
+    assert snapshot['checkouts'] == 1
+    assert snapshot['checkins'] == 1
+    assert snapshot['timeouts'] == 1
+    assert snapshot['wait_time']['count'] == 2  # noqa: PLR2004
+
+
+def test_pool_metrics_survive_dispose(tmp_path):
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "pool.db"}', poolclass=TimedQueuePool
+    )
+    metrics = PoolMetrics(engine)
+    engine.dispose()
+
+    with engine.connect():
+        pass
+
+    assert metrics.snapshot()['checkouts'] == 1
+    assert metrics.snapshot()['wait_time']['count'] == 1
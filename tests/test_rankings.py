@@ -0,0 +1,152 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from estante_digital.models import (
+    Book,
+    User,
+    book_rankings_table,
+    user_collection_table,
+)
+from estante_digital.rankings import refresh_rankings, utcnow
+from estante_digital.schemas import Token
+from tests.factories import AuthorFactory, BookFactory
+
+
+def test_get_ranking_before_refresh(client: TestClient, token: Token):
+    response = client.get(
+        '/rankings/popular', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'kind': 'popular',
+        'refreshed_at': None,
+        'books': [],
+    }
+
+
+def test_refresh_rankings(
+    session: Session, user: User, other_user: User, book: Book
+):
+    other, third = BookFactory(), BookFactory()
+    for extra in (other, third):
+        extra.author_id = book.author_id
+        extra.created_by_id = user.id
+        session.add(extra)
+    session.commit()
+
+    now = utcnow()
+    long_ago = now - timedelta(days=30)
+    session.execute(
+        insert(user_collection_table),
+        [
+            # book: o mais colecionado, mas fora da janela do trending
+            {'user_id': user.id, 'book_id': book.id, 'added_at': long_ago},
+            {
+                'user_id': other_user.id,
+                'book_id': book.id,
+                'added_at': long_ago,
+            },
+            {'user_id': user.id, 'book_id': other.id, 'added_at': now},
+            {'user_id': user.id, 'book_id': third.id, 'added_at': now},
+        ],
+    )
+    session.commit()
+
+    sizes = refresh_rankings(session)
+
+    assert sizes == {'popular': 3, 'trending': 2}
+    rows = session.execute(
+        select(
+            book_rankings_table.c.kind,
+            book_rankings_table.c.position,
+            book_rankings_table.c.book_id,
+            book_rankings_table.c.score,
+        ).order_by(book_rankings_table.c.kind, book_rankings_table.c.position)
+    ).all()
+    # empates no score sao desfeitos pelo id do livro
+    assert rows == [
+        ('popular', 1, book.id, 2),
+        ('popular', 2, other.id, 1),
+        ('popular', 3, third.id, 1),
+        ('trending', 1, other.id, 1),
+        ('trending', 2, third.id, 1),
+    ]
+
+
+def test_refresh_rankings_on_postgres(postgres_session, postgres_user):
+    books = [BookFactory(), BookFactory()]
+    for book in books:
+        book.author = AuthorFactory()
+        book.author.created_by = postgres_user
+        book.created_by = postgres_user
+        postgres_session.add(book)
+    postgres_session.commit()
+    postgres_session.execute(
+        insert(user_collection_table),
+        [{'user_id': postgres_user.id, 'book_id': book.id} for book in books],
+    )
+    postgres_session.commit()
+
+    sizes = refresh_rankings(postgres_session)
+
+    # o INSERT ... SELECT no psycopg so conta com preserve_rowcount
+    assert sizes == {'popular': 2, 'trending': 2}
+
+
+def test_get_ranking(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user_with_collection: User,
+    book: Book,
+):
+    refresh_rankings(session)
+    session.refresh(book, ['author'])
+
+    response = client.get(
+        '/rankings/trending', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    resp = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert resp['refreshed_at'] is not None
+    assert resp['books'] == [
+        {
+            'id': book.id,
+            'title': book.title,
+            'year': book.year,
+            'collector_count': 1,
+            'author': {'id': book.author.id, 'name': book.author.name},
+            'position': 1,
+            'score': 1,
+        }
+    ]
+
+
+def test_get_ranking_is_cached_until_expiry(
+    client: TestClient,
+    session: Session,
+    token: Token,
+    user_with_collection: User,
+):
+    refresh_rankings(session)
+    headers = {'Authorization': f'Bearer {token}'}
+    first = client.get('/rankings/popular', headers=headers).json()
+
+    session.execute(update(Book).values(collector_count=5))
+    refresh_rankings(session)
+
+    assert client.get('/rankings/popular', headers=headers).json() == first
+
+
+def test_get_ranking_unknown_kind(client: TestClient, token: Token):
+    response = client.get(
+        '/rankings/oldest', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,142 @@
+from http import HTTPStatus
+from time import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from estante_digital import replicas
+from estante_digital.app import app
+from estante_digital.models import table_registry
+from estante_digital.replicas import (
+    PRIMARY_PIN_COOKIE,
+    ReplicaSet,
+    get_read_session,
+)
+from estante_digital.response_cache import MemoryBackend, response_cache
+from tests.factories import AuthorFactory, UserFactory
+
+
+def make_replica(path, author_name):
+    engine = create_engine(f'sqlite:///{path}')
+    table_registry.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        author = AuthorFactory(name=author_name)
+        author.created_by = UserFactory()
+        session.add(author)
+        session.commit()
+
+    return engine
+
+
+@pytest.fixture()
+def replica_client(client, tmp_path, monkeypatch):
+    engines = [
+        make_replica(tmp_path / 'a.db', 'replica a'),
+        make_replica(tmp_path / 'b.db', 'replica b'),
+    ]
+    monkeypatch.setattr(replicas, 'replica_set', ReplicaSet(engines, 30))
+    # cada leitura precisa chegar ao banco
+    monkeypatch.setattr(response_cache, 'backend', None)
+    app.dependency_overrides.pop(get_read_session)
+
+    return client
+
+
+def read_author_names(client, token):
+    response = client.get(
+        '/authors', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == HTTPStatus.OK
+    return [author['name'] for author in response.json()['authors']]
+
+
+def test_reads_are_round_robin_across_replicas(replica_client, token):
+    first = read_author_names(replica_client, token)
+    second = read_author_names(replica_client, token)
+    third = read_author_names(replica_client, token)
+
+    assert {first[0], second[0]} == {'replica a', 'replica b'}
+    assert third == first
+
+
+def test_unhealthy_replica_is_skipped(
+    replica_client, token, tmp_path, monkeypatch
+):
+    broken = create_engine(f'sqlite:///{tmp_path}/missing/dir/x.db')
+    healthy = make_replica(tmp_path / 'c.db', 'replica c')
+    replica_set = ReplicaSet([broken, healthy], 30)
+    monkeypatch.setattr(replicas, 'replica_set', replica_set)
+
+    for _ in range(3):
+        assert read_author_names(replica_client, token) == ['replica c']
+
+    assert replica_set.candidates() == [healthy]
+
+
+def test_falls_back_to_primary_when_all_replicas_are_down(
+    replica_client, token, author, tmp_path, monkeypatch
+):
+    broken = create_engine(f'sqlite:///{tmp_path}/missing/dir/x.db')
+    monkeypatch.setattr(replicas, 'replica_set', ReplicaSet([broken], 30))
+
+    assert read_author_names(replica_client, token) == [author.name]
+
+
+def test_reads_pinned_to_primary_after_write(replica_client, token, book):
+    response = replica_client.post(
+        f'/collection/add/{book.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = replica_client.get(
+        '/collection', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert [b['id'] for b in response.json()['collection']] == [book.id]
+
+
+def test_pin_travels_with_the_client(replica_client, token, author, book):
+    headers = {'Authorization': f'Bearer {token}'}
+    author_name = author.name
+    response = replica_client.post(
+        f'/collection/add/{book.id}', headers=headers
+    )
+    assert PRIMARY_PIN_COOKIE in response.cookies
+
+    pinned = read_author_names(replica_client, token)
+    replica_client.cookies.clear()
+    unpinned = read_author_names(replica_client, token)
+
+    assert pinned == [author_name]
+    assert unpinned[0] in {'replica a', 'replica b'}
+
+
+def test_forged_pin_is_ignored(replica_client, token, author):
+    replica_client.cookies.set(PRIMARY_PIN_COOKIE, str(int(time()) + 3600))
+
+    assert read_author_names(replica_client, token)[0] in {
+        'replica a',
+        'replica b',
+    }
+
+
+def test_replica_reads_are_not_cached_right_after_a_write(
+    replica_client, token, monkeypatch
+):
+    monkeypatch.setattr(response_cache, 'backend', MemoryBackend(1 << 20))
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # sem escrita recente, a resposta da replica vai para o cache
+    read_author_names(replica_client, token)
+    assert response_cache.stats()['entries'] == 1
+
+    replica_client.post('/authors', headers=headers, json={'name': 'x'})
+    # outro cliente, sem o pin, le de uma replica que pode estar
+    # atrasada em relacao a escrita
+    replica_client.cookies.clear()
+    read_author_names(replica_client, token)
+
+    assert response_cache.stats()['entries'] == 0
@@ -0,0 +1,326 @@
+import socketserver
+import threading
+from fnmatch import fnmatch
+from http import HTTPStatus
+from time import time
+
+import pytest
+from freezegun import freeze_time
+from sqlalchemy import update
+
+from estante_digital.models import Book
+from estante_digital.replicas import PRIMARY_PIN_COOKIE
+from estante_digital.response_cache import (
+    MemoryBackend,
+    RedisBackend,
+    response_cache,
+)
+from tests.factories import BookFactory
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """o suficiente do protocolo do Redis para o RedisBackend"""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b'$-1\r\n')
+        elif isinstance(value, int):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, list):
+            self.wfile.write(b'*%d\r\n' % len(value))
+            for item in value:
+                self.reply(item)
+        elif value == 'OK':
+            self.wfile.write(b'+OK\r\n')
+        else:
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(value), value))
+
+    def handle(self):
+        data = self.server.data
+        while (args := self.read_command()) is not None:
+            command, *args = args
+            match command.upper():
+                case b'GET':
+                    self.reply(data.get(args[0]))
+                case b'SET':
+                    data[args[0]] = args[1]
+                    self.reply('OK')
+                case b'SADD':
+                    data.setdefault(args[0], set()).update(args[1:])
+                    self.reply(1)
+                case b'SMEMBERS':
+                    self.reply(sorted(data.get(args[0], set())))
+                case b'DEL':
+                    removed = [data.pop(key, None) for key in args]
+                    self.reply(sum(value is not None for value in removed))
+                case b'KEYS':
+                    pattern = args[0].decode()
+                    self.reply([
+                        key for key in data if fnmatch(key.decode(), pattern)
+                    ])
+                case b'PEXPIRE':
+                    self.reply(1)
+                case b'EXISTS':
+                    self.reply(sum(key in data for key in args))
+                case _:
+                    self.wfile.write(b'-ERR unknown command\r\n')
+
+
+@pytest.fixture()
+def resp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), RespHandler)
+    server.daemon_threads = True
+    server.data = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_memory_backend_is_bounded_by_bytes():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set('a', b'aaaa', 60, [])
+    backend.set('b', b'bbbb', 60, [])
+    backend.get('a')
+    backend.set('c', b'cccc', 60, [])
+
+    assert backend.get('a') == b'aaaa'
+    assert backend.get('b') is None
+    assert backend.get('c') == b'cccc'
+    assert backend.stats()['bytes'] == 8  # noqa: PLR2004
+
+
+def test_memory_backend_skips_entries_larger_than_the_limit():
+    backend = MemoryBackend(max_bytes=4)
+    backend.set('a', b'aaaaa', 60, [])
+
+    assert backend.get('a') is None
+    assert backend.stats()['bytes'] == 0
+
+
+def test_memory_backend_entry_expires_after_ttl():
+    backend = MemoryBackend(max_bytes=100)
+
+    with freeze_time('2024-01-01 12:00:00') as frozen:
+        backend.set('a', b'a', 60, ['tag'])
+        frozen.tick(61)
+        assert backend.get('a') is None
+
+    assert backend.stats() == {'entries': 0, 'bytes': 0, 'max_bytes': 100}
+
+
+def test_memory_backend_invalidates_by_tag():
+    backend = MemoryBackend(max_bytes=100)
+    backend.set('a', b'a', 60, ['books', 'book:1'])
+    backend.set('b', b'b', 60, ['books'])
+    backend.set('c', b'c', 60, ['authors'])
+
+    backend.invalidate(['book:1'])
+    assert backend.get('a') is None
+    assert backend.get('b') == b'b'
+
+    backend.invalidate(['books'])
+    assert backend.get('b') is None
+    assert backend.get('c') == b'c'
+
+
+def test_memory_backend_holds_invalidated_tags():
+    backend = MemoryBackend(max_bytes=100)
+
+    with freeze_time('2024-01-01 12:00:00') as frozen:
+        backend.invalidate(['books'], hold=5)
+        assert backend.held(['authors', 'books'])
+        assert not backend.held(['authors'])
+        frozen.tick(6)
+        assert not backend.held(['books'])
+
+
+def test_memory_backend_invalidation_is_per_worker():
+    # cada worker tem o proprio backend memory: a invalidacao de um nao
+    # chega aos outros, que servem a entrada antiga ate o TTL
+    worker, other_worker = MemoryBackend(100), MemoryBackend(100)
+    worker.set('a', b'a', 60, ['books'])
+    other_worker.set('a', b'a', 60, ['books'])
+
+    worker.invalidate(['books'], hold=5)
+
+    assert worker.get('a') is None
+    assert other_worker.get('a') == b'a'
+    assert not other_worker.held(['books'])
+
+
+def test_redis_backend_against_stand_in(resp_server):
+    host, port = resp_server.server_address
+    backend = RedisBackend(f'redis://{host}:{port}/0')
+
+    assert backend.get('a') is None
+    backend.set('a', b'body\r\nwith lines', 60, ['books'])
+    backend.set('b', b'b', 60, ['authors'])
+    assert backend.get('a') == b'body\r\nwith lines'
+
+    backend.invalidate(['books'], hold=5)
+    assert backend.get('a') is None
+    assert backend.get('b') == b'b'
+    assert backend.held(['books'])
+    assert not backend.held(['authors'])
+
+    backend.clear()
+    assert not resp_server.data
+
+
+def test_unreachable_redis_backend_is_a_miss(client, token, book, monkeypatch):
+    backend = RedisBackend('redis://127.0.0.1:1/0', timeout=0.1)
+    monkeypatch.setattr(response_cache, 'backend', backend)
+
+    response = client.get(
+        f'/books/{book.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response_cache.stats()['errors'] == 2  # noqa: PLR2004
+
+
+def test_catalog_reads_are_served_from_cache(
+    client, token, book, count_queries
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    first = client.get('/books/?sort=id&limit=5', headers=headers)
+
+    with count_queries() as queries:
+        second = client.get('/books/?limit=5&sort=id', headers=headers)
+        detail = client.get(f'/books/{book.id}', headers=headers)
+        cached_detail = client.get(
+            f'/books/{book.id}',
+            headers={**headers, 'If-None-Match': detail.headers['etag']},
+        )
+
+    assert second.content == first.content
+    assert second.json()['books'][0]['title'] == book.title
+    assert cached_detail.status_code == HTTPStatus.NOT_MODIFIED
+    assert len(queries) == 1  # so o detalhe, uma vez
+    assert response_cache.stats()['hits'] == 2  # noqa: PLR2004
+
+
+def test_create_book_invalidates_book_and_author_reads(client, token, author):
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/books/', headers=headers).json()['books'] == []
+    assert (
+        client.get(f'/authors/{author.id}', headers=headers).json()['books']
+        == []
+    )
+
+    client.post(
+        '/books',
+        headers=headers,
+        json={'title': 'novo', 'year': 2024, 'author_id': author.id},
+    )
+    client.cookies.clear()  # sem o pin, a leitura passa pelo cache
+
+    books = client.get('/books/', headers=headers).json()['books']
+    author_books = client.get(f'/authors/{author.id}', headers=headers).json()[
+        'books'
+    ]
+    assert [book['title'] for book in books] == ['novo']
+    assert [book['title'] for book in author_books] == ['novo']
+
+
+def test_create_author_invalidates_author_lists(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/authors/', headers=headers).json()['authors'] == []
+
+    client.post('/authors', headers=headers, json={'name': 'novo'})
+    client.cookies.clear()  # sem o pin, a leitura passa pelo cache
+
+    authors = client.get('/authors/', headers=headers).json()['authors']
+    assert [author['name'] for author in authors] == ['novo']
+
+
+def test_collection_change_invalidates_book_detail(client, token, book):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get(f'/books/{book.id}', headers=headers)
+
+    client.post(f'/collection/add/{book.id}', headers=headers)
+    client.cookies.clear()  # sem o pin, a leitura passa pelo cache
+    response = client.get(f'/books/{book.id}', headers=headers)
+
+    assert response.json()['collector_count'] == 1
+
+
+@pytest.mark.parametrize(
+    ('method', 'path', 'payload'),
+    [
+        ('post', '/collection/add/{id}', None),
+        ('post', '/collection/batch', {'action': 'add'}),
+    ],
+)
+def test_collection_change_invalidates_book_lists(  # noqa: PLR0913, PLR0917
+    client, session, token, user, book, method, path, payload
+):
+    other = BookFactory()
+    other.author_id = book.author_id
+    other.created_by_id = user.id
+    session.add(other)
+    session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    url = '/books/?sort=collectors'
+    before = client.get(url, headers=headers).json()['books']
+
+    json = None
+    if payload is not None:
+        json = {'operations': [{**payload, 'book_id': other.id}]}
+    client.request(
+        method, path.format(id=other.id), headers=headers, json=json
+    )
+    client.cookies.clear()  # sem o pin, a leitura passa pelo cache
+    after = client.get(url, headers=headers).json()['books']
+
+    assert [item['collector_count'] for item in before] == [0, 0]
+    assert [(item['id'], item['collector_count']) for item in after] == [
+        (other.id, 1),
+        (book.id, 0),
+    ]
+
+
+def test_pinned_client_skips_the_cache(client, session, token, book):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get(f'/books/{book.id}', headers=headers)
+    # escrita que este worker nao invalidou (ex: feita em outro worker,
+    # com o backend memory)
+    session.execute(update(Book).values(title='novo titulo'))
+    session.commit()
+
+    cached = client.get(f'/books/{book.id}', headers=headers)
+    client.cookies.set(PRIMARY_PIN_COOKIE, str(int(time()) + 2))
+    pinned = client.get(f'/books/{book.id}', headers=headers)
+
+    assert cached.json()['title'] != 'novo titulo'
+    assert pinned.json()['title'] == 'novo titulo'
+
+
+def test_response_cache_stats(client, token, author, internal_headers):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/authors/', headers=headers)
+    client.get('/authors/', headers=headers)
+
+    stats = client.get(
+        '/internal/response-cache', headers=internal_headers
+    ).json()
+
+    assert stats['backend'] == 'memory'
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_ratio'] == 0.5  # noqa: PLR2004
+    assert stats['entries'] == 1
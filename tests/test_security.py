@@ -1,6 +1,15 @@
+import asyncio
+from http import HTTPStatus
+
 from jwt import decode
 
-from estante_digital.security import create_access_token, settings
+from estante_digital.security import (
+    create_access_token,
+    get_password_hash_async,
+    settings,
+    user_cache,
+    verify_password_async,
+)
 
 
 def test_jwt():
@@ -11,3 +20,59 @@ def test_jwt():
 
     assert decoded['test'] == data['test']
     assert decoded['exp']  # Testa se o valor de exp foi adicionado ao token
+
+
+def test_password_hash_runs_in_process_pool():
+    async def hash_and_verify():
+        hashed = await get_password_hash_async('secret')
+        return (
+            await verify_password_async('secret', hashed),
+            await verify_password_async('wrong', hashed),
+        )
+
+    assert asyncio.run(hash_and_verify()) == (True, False)
+
+
+def test_current_user_is_cached_between_requests(client, user, token):
+    for _ in range(3):
+        response = client.get(
+            f'/user/{user.id}', headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == HTTPStatus.OK
+
+    stats = user_cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 2  # noqa: PLR2004
+
+
+def test_user_cache_dropped_on_update(client, user, token):
+    client.get(
+        f'/user/{user.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert user_cache.get(user.id) is not None
+
+    client.put(
+        f'/user/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'username': 'test1',
+            'email': 'test1@test.com',
+            'password': '123456',
+        },
+    )
+
+    assert user_cache.get(user.id) is None
+
+
+def test_user_cache_dropped_on_delete(client, user, token):
+    user_id = user.id
+    client.delete(
+        f'/user/{user_id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert user_cache.get(user_id) is None
+
+    response = client.get(
+        f'/user/{user_id}', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
@@ -0,0 +1,62 @@
+from http import HTTPStatus
+
+import pytest
+
+from estante_digital.database import settings
+from estante_digital.response_cache import response_cache
+from tests.factories import BookFactory
+
+ROUTES = [
+    '/books/',
+    '/books/{book_id}',
+    '/authors/',
+    '/authors/{author_id}',
+    '/collection/',
+    '/user/{user_id}',
+]
+
+
+@pytest.fixture()
+def catalog(session, user_with_collection, author):
+    books = BookFactory.create_batch(3)
+    for book in books:
+        book.created_by = user_with_collection
+        book.author = author
+    session.add_all(books)
+    session.commit()
+
+    return {
+        'book_id': books[0].id,
+        'author_id': author.id,
+        'user_id': user_with_collection.id,
+    }
+
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_fast_json_matches_response_model(
+    client, token, catalog, monkeypatch, route
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    url = route.format(**catalog)
+    expected = client.get(url, headers=headers)
+
+    monkeypatch.setattr(settings, 'FAST_JSON', True)
+    response_cache.clear()
+    response = client.get(url, headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/json'
+    assert response.content == expected.content
+
+
+def test_fast_json_keeps_openapi_schema(client, monkeypatch):
+    expected = client.get('/openapi.json').json()
+    monkeypatch.setattr(settings, 'FAST_JSON', True)
+
+    schema = client.get('/openapi.json').json()
+    ok = schema['paths']['/books/']['get']['responses']['200']
+
+    assert schema == expected
+    assert ok['content']['application/json']['schema'] == {
+        '$ref': '#/components/schemas/BookList'
+    }
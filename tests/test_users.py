@@ -1,9 +1,22 @@
+import asyncio
+from datetime import datetime
 from http import HTTPStatus
 
 from fastapi.testclient import TestClient
-
-from estante_digital.models import User
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from estante_digital import purge
+from estante_digital.models import (
+    Book,
+    User,
+    purge_jobs_table,
+    user_collection_table,
+)
+from estante_digital.routers import users
 from estante_digital.schemas import Token, UserPublic
+from estante_digital.security import user_cache
+from tests.factories import AuthorFactory, BookFactory
 
 
 def test_create_user(client: TestClient):
@@ -48,7 +61,10 @@ def test_create_user_with_taken_email(client: TestClient, user: User):
     assert response.json()['detail'] == 'Email already exists'
 
 
-def test_read_user(client: TestClient, user: User, token: Token):
+def test_read_user(
+    client: TestClient, session: Session, user: User, token: Token
+):
+    session.refresh(user, ['collection'])
     user_schema = UserPublic.model_validate(user).model_dump()
     response = client.get(
         f'/user/{user.id}',
@@ -84,6 +100,60 @@ def test_update_user(client: TestClient, user: User, token: Token):
     assert response.json()['username'] == 'test1'
 
 
+def test_update_user_hashes_outside_a_transaction(
+    client: TestClient, session: Session, user: User, token: Token, monkeypatch
+):
+    in_transaction = []
+    hash_password = users.get_password_hash_async
+
+    async def recording_hash(password):
+        in_transaction.append(session.in_transaction())
+        return await hash_password(password)
+
+    monkeypatch.setattr(users, 'get_password_hash_async', recording_hash)
+    response = client.put(
+        f'/user/{user.id}',
+        json={
+            'username': user.username,
+            'email': user.email,
+            'password': 'newpassword',
+        },
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert in_transaction == [False]
+
+
+def test_update_user_invalidates_the_cache_after_commit(
+    client: TestClient, user: User, token: Token, monkeypatch
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/collection', headers=headers)
+    stale = user_cache.get(user.id)
+    hash_password = users.get_password_hash_async
+
+    async def refilling_hash(password):
+        # uma requisicao concorrente que autentica antes do commit
+        user_cache.set(user.id, stale)
+        return await hash_password(password)
+
+    monkeypatch.setattr(users, 'get_password_hash_async', refilling_hash)
+    client.put(
+        f'/user/{user.id}',
+        json={
+            'username': user.username,
+            'email': user.email,
+            'password': 'newpassword',
+        },
+        headers=headers,
+    )
+
+    response = client.get('/collection', headers=headers)
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
 def test_update_user_with_wrong_id(
     client: TestClient, other_user: User, token: Token
 ):
@@ -151,15 +221,135 @@ def test_update_user_with_invalid_email(
     assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
 
 
-def test_delete_user(client: TestClient, user: User, token: Token):
+def test_delete_user(  # noqa: PLR0913, PLR0917
+    client: TestClient,
+    session: Session,
+    user_with_collection: User,
+    other_user: User,
+    book: Book,
+    token: Token,
+    internal_headers,
+):
+    other_book = BookFactory()
+    other_book.author_id = book.author_id
+    other_book.created_by_id = other_user.id
+    session.add(other_book)
+    session.commit()
+    session.execute(
+        insert(user_collection_table).values(
+            user_id=other_user.id, book_id=other_book.id
+        )
+    )
+    session.commit()
+
+    user_id = user_with_collection.id
     response = client.delete(
-        f'/user/{user.id}',
+        f'/user/{user_id}',
         headers={'Authorization': f'Bearer {token}'},
     )
 
-    assert response.status_code == HTTPStatus.OK
+    assert response.status_code == HTTPStatus.ACCEPTED
     assert response.json()['message'] == 'User deleted'
 
+    job = client.get(
+        f'/internal/purge-jobs/{response.json()["job_id"]}',
+        headers=internal_headers,
+    )
+    assert job.json() == {
+        'status': 'done',
+        'user_id': user_id,
+        'deleted': {'collection': 1, 'books': 2, 'authors': 1},
+    }
+    # o livro do outro usuario era de um autor cadastrado pela conta
+    assert session.scalar(select(func.count()).select_from(Book)) == 0
+    assert session.scalar(select(func.count(User.id))) == 1
+    assert (
+        session.scalar(select(func.count()).select_from(user_collection_table))
+        == 0
+    )
+
+
+def test_purge_runs_off_the_event_loop(
+    client: TestClient, user: User, token: Token, monkeypatch
+):
+    loops = []
+    purge_user = purge.purge_user
+
+    def recording_purge(session, user_id):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return purge_user(session, user_id)
+
+    monkeypatch.setattr(purge, 'purge_user', recording_purge)
+    response = client.delete(
+        f'/user/{user.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert loops == [None]
+
+
+def test_purge_job_is_shared_by_the_workers(
+    client: TestClient, session: Session, user: User, token: Token
+):
+    user_id = user.id
+    response = client.delete(
+        f'/user/{user_id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    # o estado fica no banco, nao na memoria do worker que recebeu o DELETE
+    job = session.execute(
+        select(purge_jobs_table.c.status, purge_jobs_table.c.user_id).where(
+            purge_jobs_table.c.id == response.json()['job_id']
+        )
+    ).one()
+    assert tuple(job) == ('done', user_id)
+
+
+def test_old_purge_jobs_are_deleted(
+    client: TestClient, session: Session, user: User, token: Token
+):
+    session.execute(
+        insert(purge_jobs_table).values(
+            id='old',
+            user_id=0,
+            status='done',
+            created_at=datetime(2000, 1, 1),
+        )
+    )
+    session.commit()
+
+    client.delete(
+        f'/user/{user.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    ids = session.scalars(select(purge_jobs_table.c.id)).all()
+    assert 'old' not in ids
+    assert len(ids) == 1
+
+
+def test_deleted_user_cannot_authenticate(
+    client: TestClient, session: Session, user: User, token: Token
+):
+    # conta marcada, com a limpeza ainda pendente
+    session.execute(
+        update(User).where(User.id == user.id).values(deleted_at=func.now())
+    )
+    session.commit()
+
+    login = client.post(
+        '/auth/token',
+        data={'username': user.email, 'password': user.clean_password},
+    )
+    refresh = client.post(
+        '/auth/refresh_token', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert login.status_code == HTTPStatus.BAD_REQUEST
+    assert refresh.status_code == HTTPStatus.UNAUTHORIZED
+
 
 def test_delete_user_with_wrong_id(
     client: TestClient, other_user: User, token: Token
@@ -171,3 +361,31 @@ def test_delete_user_with_wrong_id(
 
     assert response.status_code == HTTPStatus.BAD_REQUEST
     assert response.json()['detail'] == 'Not enough permissions'
+
+
+def test_read_user_query_count_does_not_grow(
+    client: TestClient,
+    session: Session,
+    user: User,
+    token: Token,
+    count_queries,
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    counts = []
+    for _ in range(2):
+        for _ in range(3):
+            author = AuthorFactory()
+            author.created_by = user
+            book = BookFactory()
+            book.author = author
+            book.created_by = user
+            session.add_all([author, book])
+            session.flush()
+            client.post(f'/collection/add/{book.id}', headers=headers)
+
+        client.get(f'/user/{user.id}', headers=headers)
+        with count_queries() as queries:
+            client.get(f'/user/{user.id}', headers=headers)
+        counts.append(len(queries))
+
+    assert counts[0] == counts[1]